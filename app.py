@@ -1,5 +1,19 @@
 import streamlit as st
+import json
 import math
+import os
+import time
+import uuid
+
+from zhina_calc import metrics
+from zhina_calc.arithmetic import MAX_DECIMAL_PRECISION, MODES
+from zhina_calc.engine import evaluate
+from zhina_calc.errors import ExpressionError, TooExpensive
+from zhina_calc.explain import explain
+from zhina_calc.formatting import format_result, iter_digits
+from zhina_calc.runtime import Engine
+from zhina_calc.state import CalculatorState
+from zhina_calc.workspace import Workspace, split_definition
 
 # --- 1. Core Calculator Logic (Unchanged) ---
 
@@ -7,9 +21,8 @@ class ZhinaScientificCalculator:
     """Core mathematical logic for the Zhina Scientific Calculator."""
     # ... (All methods are the same: add, subtract, multiply, divide, power, sqrt, log, memory_add/recall/clear)
     # ... (Retaining the original methods for brevity in the re-check)
-    def __init__(self):
-        if 'memory' not in st.session_state:
-            st.session_state.memory = 0
+    # Stateless: the memory register lives in the session's CalculatorState,
+    # so a single instance is shared by every session (see get_calculator()).
 
     def add(self, a, b): return a + b
     def subtract(self, a, b): return a - b
@@ -26,1001 +39,677 @@ class ZhinaScientificCalculator:
             return None
         return math.sqrt(x)
     
-    # ... (other scientific functions omitted for brevity in the re-check)
+    # sin, cos, tan, log, factorial and gamma are engine builtins
+    # (zhina_calc.scientific); the keypad reaches them through calculate(),
+    # see FUNCTION_KEYS.
 
+    # Memory keys act on the session's active register; saves are queued, not written inline.
     def memory_add(self, value):
-        st.session_state.memory += value
+        st.session_state.calc_state.memory += value
+        save_registers()
     def memory_recall(self):
-        return st.session_state.memory
+        return st.session_state.calc_state.memory
     def memory_clear(self):
-        st.session_state.memory = 0
+        st.session_state.calc_state.memory = 0
+        save_registers()
         
-# --- 2. Calculation Function (Using eval() for simplicity, but acknowledge the risk) ---
+# --- 2. Calculation Function (zhina_calc engine, no eval()) ---
+
+RESULT_CACHE_SIZE = 1024
+# Parsed/optimized expressions shared by all sessions (zhina_calc.engine.CompileCache)
+COMPILE_CACHE_SIZE = 4096
+# Worker processes for heavy expressions; 0 (the default) evaluates everything inline.
+EVAL_WORKERS = int(os.environ.get('ZHINA_EVAL_WORKERS', '0'))
+
+@st.cache_resource
+def get_engine():
+    """One engine (result and compile caches + optional process pool) per server process."""
+    engine = Engine(cache_size=RESULT_CACHE_SIZE, workers=EVAL_WORKERS,
+                    compile_cache_size=COMPILE_CACHE_SIZE)
+    metrics.REGISTRY.add_collector(engine.stats)
+    return engine
+
+
+# SQLite file behind the calculation history; set ZHINA_HISTORY_DB='' to keep history in memory only.
+HISTORY_DB = os.environ.get('ZHINA_HISTORY_DB', 'zhina_history.sqlite3')
+# Saved history older than this many days is deleted by the store's writer.
+HISTORY_RETENTION_DAYS = float(os.environ.get('ZHINA_HISTORY_DAYS', '30'))
+
+@st.cache_resource
+def get_history_store():
+    """The on-disk history (zhina_calc.history_db) shared by every session, or None."""
+    if not HISTORY_DB:
+        return None
+    from zhina_calc.history_db import HistoryStore  # loads sqlite3 on first use
+    store = HistoryStore(HISTORY_DB, retention_days=HISTORY_RETENTION_DAYS)
+    metrics.REGISTRY.add_collector(lambda: {f'history_{k}': v for k, v in store.stats().items()})
+    return store
+
+
+def record_history(expression, result):
+    """Keeps a finished calculation in the session's ring buffer and queues it for disk."""
+    st.session_state.calc_state.history.append(expression, str(result))
+    store = get_history_store()
+    if store is not None:
+        store.append(st.session_state.history_session, expression, result)
+
+
+# SQLite file behind the memory registers; set ZHINA_MEMORY_DB='' to keep them per session only.
+MEMORY_DB = os.environ.get('ZHINA_MEMORY_DB', 'zhina_memory.sqlite3')
+
+@st.cache_resource
+def get_register_store():
+    """Saved memory registers (zhina_calc.registers_db) shared by every session, or None."""
+    if not MEMORY_DB:
+        return None
+    from zhina_calc.registers_db import RegisterStore  # loads sqlite3 on first use
+    store = RegisterStore(MEMORY_DB)
+    metrics.REGISTRY.add_collector(lambda: {f'registers_{k}': v for k, v in store.stats().items()})
+    return store
+
+
+def save_registers():
+    """Queues the session's registers for the background writer (only under a ?profile=)."""
+    store = get_register_store()
+    if store is not None and st.session_state.memory_profile is not None:
+        store.save(st.session_state.memory_profile, st.session_state.calc_state.registers)
+
+
+@st.cache_resource
+def get_calculator():
+    """The calculator helpers hold no state, so one instance serves every session."""
+    return ZhinaScientificCalculator()
+
 
 def calculate(full_expression):
     """
-    ATTENTION: This function uses eval() for simplicity. 
-    REPLACE THIS with a safer library (like NumExpr) for production use.
+    Evaluates the expression with the zhina_calc engine.
+    Only whitelisted operators/functions are accepted ('^' means '**').
+    Results (including "Error") are served from an LRU cache when the same
+    expression was evaluated before; see get_engine().stats().
+    Evaluation runs under zhina_calc.sandbox.DEFAULT_BUDGET, so huge powers
+    come back as "Error" instead of stalling the script thread.
+    With ZHINA_EVAL_WORKERS set, heavy expressions run in the shared process pool.
     """
-    # Simple string substitutions to handle basic scientific notation if needed
-    full_expression = full_expression.replace('^', '**')
-
-    try:
-        # **The Vulnerable Line - Use with Caution**
-        result = eval(full_expression) 
-        return str(result)
-    except Exception as e:
-        return "Error"
+    with metrics.timer('calculate'):
+        return get_engine().calculate(full_expression)
 
 
 # --- 3. Streamlit Application Interface (Refined) ---
 
-# Initialize state variables
-if 'current_input' not in st.session_state:
-    st.session_state.current_input = '0'
-if 'expression' not in st.session_state:
-    st.session_state.expression = ''
-if 'calc' not in st.session_state:
-    st.session_state.calc = ZhinaScientificCalculator()
+# Initialize state: display, pending expression, memory, mode and the running
+# chain all live in one compact object (see zhina_calc.state)
+if 'calc_state' not in st.session_state:
+    st.session_state.calc_state = CalculatorState()
+    # Registers belong to the session unless the URL names a profile (?profile=<name>); only
+    # then are they saved, and read back once here. MR never goes to disk. Sessions sharing
+    # a profile share one saved set: the last save wins.
+    st.session_state.memory_profile = st.query_params.get('profile') or None
+    # Key of this session's rows in the history database: the profile's, so they can be paged
+    # and searched again in a later session, or a fresh one (kept until retention prunes it).
+    st.session_state.history_session = (f'profile:{st.session_state.memory_profile}'
+                                         if st.session_state.memory_profile is not None else uuid.uuid4().hex)
+    if st.session_state.memory_profile is not None and get_register_store() is not None:
+        saved = get_register_store().load(st.session_state.memory_profile)
+        if saved is not None:
+            st.session_state.calc_state.registers = saved
+
+
+# Keypad label -> engine function applied to the current input
+FUNCTION_KEYS = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan', 'log': 'log',
+    'n!': 'factorial', 'Γ': 'gamma',
+}
+
+# Metric label for each handle_button branch; every other key is a digit or '.'
+BUTTON_BRANCHES = {
+    'C': 'clear', '=': 'equals',
+    '+': 'operator', '-': 'operator', '*': 'operator', '/': 'operator',
+    'MR': 'memory', 'M+': 'memory', 'MC': 'memory',
+    'sqrt': 'sqrt', 'π': 'constant',
+    **dict.fromkeys(FUNCTION_KEYS, 'function'),
+}
 
 
 def handle_button(key):
-    """Updates the input based on the button pressed."""
-    
-    # --- Clear/Equals ---
-    if key == 'C':
-        st.session_state.current_input = '0'
-        st.session_state.expression = ''
-        return
-    
-    if key == '=':
-        full_expression = st.session_state.expression + st.session_state.current_input
-        result_str = calculate(full_expression)
-        
-        # Update display
-        if result_str == "Error":
-             st.session_state.expression = ''
-        else:
-             st.session_state.expression = full_expression + '='
-        
-        st.session_state.current_input = result_str
-        return
-
-    # --- Operators ---
-    if key in ['+', '-', '*', '/']:
-        # Append current number and operator to the expression
-        st.session_state.expression += st.session_state.current_input + key
-        st.session_state.current_input = '0'
-        return
-
-    # --- Memory Keys ---
-    if key == 'MR':
-        st.session_state.current_input = str(st.session_state.calc.memory_recall())
-        return
-    if key == 'M+':
-        try:
-            # Only add the current number input, not the whole expression result
-            st.session_state.calc.memory_add(float(st.session_state.current_input))
-            st.toast(f"Added {st.session_state.current_input} to Memory ({st.session_state.calc.memory_recall():.4f})")
-        except ValueError:
-             st.toast("Invalid value for M+")
-        return
-    if key == 'MC':
-        st.session_state.calc.memory_clear()
-        st.toast("Memory Cleared!")
-        return
-
-    # --- Scientific Functions (Directly call the method) ---
-    if key == 'sqrt':
-        try:
-            current_value = float(st.session_state.current_input)
-            result = st.session_state.calc.square_root(current_value)
-            
-            if result is not None:
-                st.session_state.current_input = str(result)
-                st.session_state.expression = f"sqrt({current_value})=" # Show function in expression
-        except ValueError:
-            st.session_state.current_input = "Error"
-        return
-
-    # --- Standard Keys (0-9, .) ---
-    if st.session_state.current_input == '0' or st.session_state.current_input == "Error":
-        # Clear '0' or 'Error' when a new digit is pressed
-        if key == '.':
-             st.session_state.current_input = '0.'
-        else:
-            st.session_state.current_input = key
-    elif key == '.' and '.' in st.session_state.current_input:
-        pass # Only one decimal point allowed
-    else:
-        st.session_state.current_input += key
-
-
-def main():
-    st.set_page_config(page_title="Zhina Calculator", layout="centered")
-    
-    # ... (The custom CSS styling remains the same)
-    st.markdown("""
-        <style>
-        /* General Streamlit tweaks for a calculator feel */
-        .stButton>button {
-            width: 100%;
-            height: 70px; /* Large buttons */
-            font-size: 24px;
-            margin: 2px 0;
-            border-radius: 8px;
-            box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
-            font-weight: bold;
-        }
-        /* Style for the display area */
-        .expression-display {
-            text-align: right;
-            font-size: 16px;
-            color: #888;
-            height: 20px;
-        }
-        .input-display {
-            text-align: right;
-            font-size: 48px;
-            margin-bottom: 10px;
-            height: 60px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    st.title("🧮 Zhina Scientific Calculator")
-    
-    # --- Display Area ---
-    st.markdown(f'<div class="expression-display">{st.session_state.expression}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="input-display">{st.session_state.current_input}</div>', unsafe_allow_html=True)
-
-    # Define the button layout
-    r1 = ['MC', 'MR', 'M+', 'sqrt']
-    r2 = ['C', '/', '*', '-'] 
-    r3 = ['7', '8', '9', '+']
-    r4 = ['4', '5', '6']
-    r5 = ['1', '2', '3']
-    r6 = ['0', '.', '=']
-
-    # --- Button Grid ---
-    
-    # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
-    for row_keys in [r1, r2, r3, r4, r5]:
-        col1, col2, col3, col4 = st.columns(4)
-        cols = [col1, col2, col3, col4]
-        for i, key in enumerate(row_keys):
-            cols[i].button(key, key=key, on_click=handle_button, args=(key,))
-            
-    # Final Row (R6) - '0', '.', '='
-    col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
-    col1.button('0', key='0', on_click=handle_button, args=('0',))
-    col2.button('.', key='.', on_click=handle_button, args=('.',))
-    col4.button('=', key='=', on_click=handle_button, args=('=',)) 
-    
-    # Display Memory Status
-    st.markdown("---")
-    st.info(f"Memory (MR/M+): **{st.session_state.calc.memory_recall():.4f}**")
-
-if __name__ == '__main__':
-    main()
-import streamlit as st
-import math
-
-# --- 1. Core Calculator Logic (Unchanged) ---
-
-class ZhinaScientificCalculator:
-    """Core mathematical logic for the Zhina Scientific Calculator."""
-    # ... (All methods are the same: add, subtract, multiply, divide, power, sqrt, log, memory_add/recall/clear)
-    # ... (Retaining the original methods for brevity in the re-check)
-    def __init__(self):
-        if 'memory' not in st.session_state:
-            st.session_state.memory = 0
-
-    def add(self, a, b): return a + b
-    def subtract(self, a, b): return a - b
-    def multiply(self, a, b): return a * b
-    def divide(self, a, b):
-        if b == 0:
-            st.error("Error: Cannot divide by zero.")
-            return None
-        return a / b
-
-    def square_root(self, x):
-        if x < 0:
-            st.error("Error: Cannot take the square root of a negative number.")
-            return None
-        return math.sqrt(x)
-    
-    # ... (other scientific functions omitted for brevity in the re-check)
-
-    def memory_add(self, value):
-        st.session_state.memory += value
-    def memory_recall(self):
-        return st.session_state.memory
-    def memory_clear(self):
-        st.session_state.memory = 0
-        
-# --- 2. Calculation Function (Using eval() for simplicity, but acknowledge the risk) ---
-
-def calculate(full_expression):
-    """
-    ATTENTION: This function uses eval() for simplicity. 
-    REPLACE THIS with a safer library (like NumExpr) for production use.
-    """
-    # Simple string substitutions to handle basic scientific notation if needed
-    full_expression = full_expression.replace('^', '**')
-
-    try:
-        # **The Vulnerable Line - Use with Caution**
-        result = eval(full_expression) 
-        return str(result)
-    except Exception as e:
-        return "Error"
-
-
-# --- 3. Streamlit Application Interface (Refined) ---
-
-# Initialize state variables
-if 'current_input' not in st.session_state:
-    st.session_state.current_input = '0'
-if 'expression' not in st.session_state:
-    st.session_state.expression = ''
-if 'calc' not in st.session_state:
-    st.session_state.calc = ZhinaScientificCalculator()
+    """Button callback; timed per branch when ZHINA_METRICS is set."""
+    with metrics.timer('handle_button', branch=BUTTON_BRANCHES.get(key, 'digit')):
+        _handle_button(key)
+    if key in FULL_RERUN_KEYS:
+        st.session_state.full_rerun = True
 
 
-def handle_button(key):
+def _handle_button(key):
     """Updates the input based on the button pressed."""
+    state = st.session_state.calc_state
     
     # --- Clear/Equals ---
     if key == 'C':
-        st.session_state.current_input = '0'
-        st.session_state.expression = ''
+        state.clear()
         return
     
     if key == '=':
-        full_expression = st.session_state.expression + st.session_state.current_input
-        result_str = calculate(full_expression)
+        full_expression = state.expression + state.current_input
+        # O(1): the chain already holds everything before current_input
+        result_str = state.chain.result_str(state.current_input)
+        state.chain.reset()
+        record_history(full_expression, result_str)
         
         # Update display
         if result_str == "Error":
-             st.session_state.expression = ''
+             state.expression = ''
+             # Budget rejections carry a reason worth showing (see zhina_calc.sandbox)
+             if isinstance(getattr(result_str, 'error', None), TooExpensive):
+                 st.toast(str(result_str.error))
         else:
-             st.session_state.expression = full_expression + '='
+             state.expression = full_expression + '='
         
-        st.session_state.current_input = result_str
+        state.current_input = result_str
         return
 
     # --- Operators ---
     if key in ['+', '-', '*', '/']:
+        # A finished calculation ("...=") starts a new chain from its result
+        if state.expression.endswith('='):
+            state.expression = ''
         # Append current number and operator to the expression
-        st.session_state.expression += st.session_state.current_input + key
-        st.session_state.current_input = '0'
+        state.expression += state.current_input + key
+        state.chain.push(state.current_input, key)
+        state.current_input = '0'
         return
 
     # --- Memory Keys ---
     if key == 'MR':
-        st.session_state.current_input = str(st.session_state.calc.memory_recall())
+        value = get_calculator().memory_recall()
+        # Registers hold floats; a whole number reads as one ("0", not "0.0").
+        state.current_input = format_result(int(value) if value.is_integer() and abs(value) < 2**53 else value)
         return
     if key == 'M+':
         try:
             # Only add the current number input, not the whole expression result
-            st.session_state.calc.memory_add(float(st.session_state.current_input))
-            st.toast(f"Added {st.session_state.current_input} to Memory ({st.session_state.calc.memory_recall():.4f})")
+            get_calculator().memory_add(float(state.chain.arithmetic.parse(state.current_input)))
+            st.toast(f"Added {state.current_input} to Memory ({get_calculator().memory_recall():.4f})")
         except ValueError:
              st.toast("Invalid value for M+")
         return
     if key == 'MC':
-        st.session_state.calc.memory_clear()
+        get_calculator().memory_clear()
         st.toast("Memory Cleared!")
         return
 
     # --- Scientific Functions (Directly call the method) ---
     if key == 'sqrt':
         try:
-            current_value = float(st.session_state.current_input)
-            result = st.session_state.calc.square_root(current_value)
+            current_value = float(state.chain.arithmetic.parse(state.current_input))
+            result = get_calculator().square_root(current_value)
             
             if result is not None:
-                st.session_state.current_input = str(result)
-                st.session_state.expression = f"sqrt({current_value})=" # Show function in expression
+                state.current_input = str(result)
+                state.expression = f"sqrt({current_value})=" # Show function in expression
+                state.chain.reset()
         except ValueError:
-            st.session_state.current_input = "Error"
+            state.current_input = "Error"
         return
 
-    # --- Standard Keys (0-9, .) ---
-    if st.session_state.current_input == '0' or st.session_state.current_input == "Error":
-        # Clear '0' or 'Error' when a new digit is pressed
-        if key == '.':
-             st.session_state.current_input = '0.'
-        else:
-            st.session_state.current_input = key
-    elif key == '.' and '.' in st.session_state.current_input:
-        pass # Only one decimal point allowed
-    else:
-        st.session_state.current_input += key
-
-
-def main():
-    st.set_page_config(page_title="Zhina Calculator", layout="centered")
-    
-    # ... (The custom CSS styling remains the same)
-    st.markdown("""
-        <style>
-        /* General Streamlit tweaks for a calculator feel */
-        .stButton>button {
-            width: 100%;
-            height: 70px; /* Large buttons */
-            font-size: 24px;
-            margin: 2px 0;
-            border-radius: 8px;
-            box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
-            font-weight: bold;
-        }
-        /* Style for the display area */
-        .expression-display {
-            text-align: right;
-            font-size: 16px;
-            color: #888;
-            height: 20px;
-        }
-        .input-display {
-            text-align: right;
-            font-size: 48px;
-            margin-bottom: 10px;
-            height: 60px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    st.title("🧮 Zhina Scientific Calculator")
-    
-    # --- Display Area ---
-    st.markdown(f'<div class="expression-display">{st.session_state.expression}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="input-display">{st.session_state.current_input}</div>', unsafe_allow_html=True)
-
-    # Define the button layout
-    r1 = ['MC', 'MR', 'M+', 'sqrt']
-    r2 = ['C', '/', '*', '-'] 
-    r3 = ['7', '8', '9', '+']
-    r4 = ['4', '5', '6']
-    r5 = ['1', '2', '3']
-    r6 = ['0', '.', '=']
-
-    # --- Button Grid ---
-    
-    # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
-    for row_keys in [r1, r2, r3, r4, r5]:
-        col1, col2, col3, col4 = st.columns(4)
-        cols = [col1, col2, col3, col4]
-        for i, key in enumerate(row_keys):
-            cols[i].button(key, key=key, on_click=handle_button, args=(key,))
-            
-    # Final Row (R6) - '0', '.', '='
-    col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
-    col1.button('0', key='0', on_click=handle_button, args=('0',))
-import streamlit as st
-import math
-
-# --- 1. Core Calculator Logic (Unchanged) ---
-
-class ZhinaScientificCalculator:
-    """Core mathematical logic for the Zhina Scientific Calculator."""
-    # ... (All methods are the same: add, subtract, multiply, divide, power, sqrt, log, memory_add/recall/clear)
-    # ... (Retaining the original methods for brevity in the re-check)
-    def __init__(self):
-        if 'memory' not in st.session_state:
-            st.session_state.memory = 0
-
-    def add(self, a, b): return a + b
-    def subtract(self, a, b): return a - b
-    def multiply(self, a, b): return a * b
-    def divide(self, a, b):
-        if b == 0:
-            st.error("Error: Cannot divide by zero.")
-            return None
-        return a / b
-
-    def square_root(self, x):
-        if x < 0:
-            st.error("Error: Cannot take the square root of a negative number.")
-            return None
-        return math.sqrt(x)
-    
-    # ... (other scientific functions omitted for brevity in the re-check)
-
-    def memory_add(self, value):
-        st.session_state.memory += value
-    def memory_recall(self):
-        return st.session_state.memory
-    def memory_clear(self):
-        st.session_state.memory = 0
-        
-# --- 2. Calculation Function (Using eval() for simplicity, but acknowledge the risk) ---
-
-def calculate(full_expression):
-    """
-    ATTENTION: This function uses eval() for simplicity. 
-    REPLACE THIS with a safer library (like NumExpr) for production use.
-    """
-    # Simple string substitutions to handle basic scientific notation if needed
-    full_expression = full_expression.replace('^', '**')
-
-    try:
-        # **The Vulnerable Line - Use with Caution**
-        result = eval(full_expression) 
-        return str(result)
-    except Exception as e:
-        return "Error"
-
-
-# --- 3. Streamlit Application Interface (Refined) ---
-
-# Initialize state variables
-if 'current_input' not in st.session_state:
-    st.session_state.current_input = '0'
-if 'expression' not in st.session_state:
-    st.session_state.expression = ''
-if 'calc' not in st.session_state:
-    st.session_state.calc = ZhinaScientificCalculator()
-
-
-def handle_button(key):
-    """Updates the input based on the button pressed."""
-    
-    # --- Clear/Equals ---
-    if key == 'C':
-        st.session_state.current_input = '0'
-        st.session_state.expression = ''
-        return
-    
-    if key == '=':
-        full_expression = st.session_state.expression + st.session_state.current_input
-        result_str = calculate(full_expression)
-        
-        # Update display
+    if key in FUNCTION_KEYS:
+        call = f"{FUNCTION_KEYS[key]}({state.current_input})"
+        result_str = calculate(call)
         if result_str == "Error":
-             st.session_state.expression = ''
+            state.expression = ''
+            if isinstance(getattr(result_str, 'error', None), TooExpensive):
+                st.toast(str(result_str.error))
         else:
-             st.session_state.expression = full_expression + '='
-        
-        st.session_state.current_input = result_str
+            state.expression = call + '='
+        state.current_input = result_str
+        state.chain.reset()
         return
 
-    # --- Operators ---
-    if key in ['+', '-', '*', '/']:
-        # Append current number and operator to the expression
-        st.session_state.expression += st.session_state.current_input + key
-        st.session_state.current_input = '0'
-        return
-
-    # --- Memory Keys ---
-    if key == 'MR':
-        st.session_state.current_input = str(st.session_state.calc.memory_recall())
-        return
-    if key == 'M+':
-        try:
-            # Only add the current number input, not the whole expression result
-            st.session_state.calc.memory_add(float(st.session_state.current_input))
-            st.toast(f"Added {st.session_state.current_input} to Memory ({st.session_state.calc.memory_recall():.4f})")
-        except ValueError:
-             st.toast("Invalid value for M+")
-        return
-    if key == 'MC':
-        st.session_state.calc.memory_clear()
-        st.toast("Memory Cleared!")
-        return
-
-    # --- Scientific Functions (Directly call the method) ---
-    if key == 'sqrt':
-        try:
-            current_value = float(st.session_state.current_input)
-            result = st.session_state.calc.square_root(current_value)
-            
-            if result is not None:
-                st.session_state.current_input = str(result)
-                st.session_state.expression = f"sqrt({current_value})=" # Show function in expression
-        except ValueError:
-            st.session_state.current_input = "Error"
+    if key == 'π':
+        state.current_input = repr(math.pi)
         return
 
     # --- Standard Keys (0-9, .) ---
-    if st.session_state.current_input == '0' or st.session_state.current_input == "Error":
+    if state.current_input == '0' or state.current_input == "Error":
         # Clear '0' or 'Error' when a new digit is pressed
         if key == '.':
-             st.session_state.current_input = '0.'
+             state.current_input = '0.'
         else:
-            st.session_state.current_input = key
-    elif key == '.' and '.' in st.session_state.current_input:
+            state.current_input = key
+    elif key == '.' and '.' in state.current_input:
         pass # Only one decimal point allowed
     else:
-        st.session_state.current_input += key
-
-
-def main():
-    st.set_page_config(page_title="Zhina Calculator", layout="centered")
-    
-    # ... (The custom CSS styling remains the same)
-    st.markdown("""
-        <style>
-        /* General Streamlit tweaks for a calculator feel */
-        .stButton>button {
-            width: 100%;
-            height: 70px; /* Large buttons */
-            font-size: 24px;
-            margin: 2px 0;
-            border-radius: 8px;
-            box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
-            font-weight: bold;
-        }
-        /* Style for the display area */
-        .expression-display {
-            text-align: right;
-            font-size: 16px;
-            color: #888;
-            height: 20px;
-        }
-        .input-display {
-            text-align: right;
-            font-size: 48px;
-            margin-bottom: 10px;
-            height: 60px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    st.title("🧮 Zhina Scientific Calculator")
-    
-    # --- Display Area ---
-    st.markdown(f'<div class="expression-display">{st.session_state.expression}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="input-display">{st.session_state.current_input}</div>', unsafe_allow_html=True)
-
-    # Define the button layout
-    r1 = ['MC', 'MR', 'M+', 'sqrt']
-    r2 = ['C', '/', '*', '-'] 
-    r3 = ['7', '8', '9', '+']
-    r4 = ['4', '5', '6']
-    r5 = ['1', '2', '3']
-    r6 = ['0', '.', '=']
-
-    # --- Button Grid ---
-    
-    # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
-    for row_keys in [r1, r2, r3, r4, r5]:
-        col1, col2, col3, col4 = st.columns(4)
-        cols = [col1, col2, col3, col4]
-        for i, key in enumerate(row_keys):
-            cols[i].button(key, key=key, on_click=handle_button, args=(key,))
+        state.current_input += key
+
+
+# Keys that finish a calculation or touch memory: they rerun the whole page so
+# everything outside the keypad fragment (e.g. the memory status or the digits
+# export) is refreshed
+FULL_RERUN_KEYS = {'=', 'MC', 'MR', 'M+', *FUNCTION_KEYS}
+
+
+@st.fragment
+def calculator_panel():
+    """Display and keypad. A key press reruns only this fragment, except for
+    FULL_RERUN_KEYS, which ask for a full script run."""
+    if st.session_state.pop('full_rerun', False):
+        st.rerun()
+    metrics.inc('rerun', scope='fragment')
+    state = st.session_state.calc_state
+
+    with metrics.timer('main', phase='display'):
+        # --- Display Area ---
+        st.markdown(f'<div class="expression-display">{state.expression}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="input-display">{state.current_input}</div>', unsafe_allow_html=True)
+        preview = state.chain.preview(state.current_input)
+        if preview is not None:
+            st.markdown(f'<div class="preview-display">= {preview}</div>', unsafe_allow_html=True)
+
+    with metrics.timer('main', phase='keypad'):
+        # Define the button layout
+        r1 = ['MC', 'MR', 'M+', 'sqrt']
+        sci1 = ['sin', 'cos', 'tan', 'log']
+        sci2 = ['n!', 'Γ', 'π']
+        r2 = ['C', '/', '*', '-'] 
+        r3 = ['7', '8', '9', '+']
+        r4 = ['4', '5', '6']
+        r5 = ['1', '2', '3']
+        r6 = ['0', '.', '=']
+
+        # --- Button Grid ---
+    
+        # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
+        for row_keys in [r1, sci1, sci2, r2, r3, r4, r5]:
+            col1, col2, col3, col4 = st.columns(4)
+            cols = [col1, col2, col3, col4]
+            for i, key in enumerate(row_keys):
+                cols[i].button(key, key=key, on_click=handle_button, args=(key,))
             
-    # Final Row (R6) - '0', '.', '='
-    col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
-    col1.button('0', key='0', on_click=handle_button, args=('0',))
-    col2.button('.', key='.', on_click=handle_button, args=('.',))
-    col4.button('=', key='=', on_click=handle_button, args=('=',)) 
-    
-    # Display Memory Status
-    st.markdown("---")
-    st.info(f"Memory (MR/M+): **{st.session_state.calc.memory_recall():.4f}**")
-
-if __name__ == '__main__':
-    main()
-import streamlit as st
-import math
-
-# --- 1. Core Calculator Logic (Unchanged) ---
-
-class ZhinaScientificCalculator:
-    """Core mathematical logic for the Zhina Scientific Calculator."""
-    # ... (All methods are the same: add, subtract, multiply, divide, power, sqrt, log, memory_add/recall/clear)
-    # ... (Retaining the original methods for brevity in the re-check)
-    def __init__(self):
-        if 'memory' not in st.session_state:
-            st.session_state.memory = 0
-
-    def add(self, a, b): return a + b
-    def subtract(self, a, b): return a - b
-    def multiply(self, a, b): return a * b
-    def divide(self, a, b):
-        if b == 0:
-            st.error("Error: Cannot divide by zero.")
-            return None
-        return a / b
-
-    def square_root(self, x):
-        if x < 0:
-            st.error("Error: Cannot take the square root of a negative number.")
-            return None
-        return math.sqrt(x)
-    
-    # ... (other scientific functions omitted for brevity in the re-check)
+        # Final Row (R6) - '0', '.', '='
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
+        col1.button('0', key='0', on_click=handle_button, args=('0',))
+        col2.button('.', key='.', on_click=handle_button, args=('.',))
+        col4.button('=', key='=', on_click=handle_button, args=('=',)) 
 
-    def memory_add(self, value):
-        st.session_state.memory += value
-    def memory_recall(self):
-        return st.session_state.memory
-    def memory_clear(self):
-        st.session_state.memory = 0
-        
-# --- 2. Calculation Function (Using eval() for simplicity, but acknowledge the risk) ---
-
-def calculate(full_expression):
-    """
-    ATTENTION: This function uses eval() for simplicity. 
-    REPLACE THIS with a safer library (like NumExpr) for production use.
-    """
-    # Simple string substitutions to handle basic scientific notation if needed
-    full_expression = full_expression.replace('^', '**')
 
+def all_digits(expression):
+    """Every digit of an integer result (for export), or None for any other result."""
     try:
-        # **The Vulnerable Line - Use with Caution**
-        result = eval(full_expression) 
-        return str(result)
-    except Exception as e:
-        return "Error"
-
-
-# --- 3. Streamlit Application Interface (Refined) ---
-
-# Initialize state variables
-if 'current_input' not in st.session_state:
-    st.session_state.current_input = '0'
-if 'expression' not in st.session_state:
-    st.session_state.expression = ''
-if 'calc' not in st.session_state:
-    st.session_state.calc = ZhinaScientificCalculator()
-
-
-def handle_button(key):
-    """Updates the input based on the button pressed."""
-    
-    # --- Clear/Equals ---
-    if key == 'C':
-        st.session_state.current_input = '0'
-        st.session_state.expression = ''
-        return
-    
-    if key == '=':
-        full_expression = st.session_state.expression + st.session_state.current_input
-        result_str = calculate(full_expression)
-        
-        # Update display
-        if result_str == "Error":
-             st.session_state.expression = ''
-        else:
-             st.session_state.expression = full_expression + '='
-        
-        st.session_state.current_input = result_str
-        return
-
-    # --- Operators ---
-    if key in ['+', '-', '*', '/']:
-        # Append current number and operator to the expression
-        st.session_state.expression += st.session_state.current_input + key
-        st.session_state.current_input = '0'
-        return
-
-    # --- Memory Keys ---
-    if key == 'MR':
-        st.session_state.current_input = str(st.session_state.calc.memory_recall())
-        return
-    if key == 'M+':
+        value = evaluate(expression.replace('^', '**'))
+    except Exception:
+        return None
+    if type(value) is not int:
+        return None
+    return ''.join(iter_digits(value))
+
+
+def digits_export():
+    """Offers the full digits when the display shows a result in scientific notation."""
+    state = st.session_state.calc_state
+    if not (state.expression.endswith('=') and 'e+' in state.current_input):
+        return
+    with st.expander("All digits"):
+        if st.button("Prepare download", key='prepare_digits'):
+            digits = all_digits(state.expression[:-1])
+            if digits is None:
+                st.caption("Only integer results have more digits to show.")
+            else:
+                st.download_button(f"Download {len(digits.lstrip('-')):,} digits", digits,
+                                   file_name="result.txt", on_click='ignore')
+
+
+def math_helper():
+    """Step-by-step solution for the expression on the display (zhina_calc.explain)."""
+    state = st.session_state.calc_state
+    if state.expression.endswith('='):
+        expression = state.expression[:-1]
+    else:
+        expression = state.expression + state.current_input
+    if not expression or expression == state.current_input:
+        return  # a bare number has nothing to explain
+    with st.expander("Math Helper: step by step"):
         try:
-            # Only add the current number input, not the whole expression result
-            st.session_state.calc.memory_add(float(st.session_state.current_input))
-            st.toast(f"Added {st.session_state.current_input} to Memory ({st.session_state.calc.memory_recall():.4f})")
-        except ValueError:
-             st.toast("Invalid value for M+")
-        return
-    if key == 'MC':
-        st.session_state.calc.memory_clear()
-        st.toast("Memory Cleared!")
-        return
-
-    # --- Scientific Functions (Directly call the method) ---
-    if key == 'sqrt':
+            steps = explain(expression, arithmetic=state.chain.arithmetic)
+        except TooExpensive as e:
+            st.caption(str(e))
+            return
+        st.markdown('\n'.join(f"{i}. `{step.text}`" for i, step in enumerate(steps, 1)))
+
+
+def _sync_workspace():
+    """Applies the edited definitions: removed names are dropped, new or changed lines redefined."""
+    workspace = st.session_state.workspace
+    old = st.session_state.workspace_lines
+    lines, errors = {}, []
+    for line in st.session_state.workspace_text.splitlines():
+        if line.strip():
+            try:
+                lines[split_definition(line)[0]] = line.strip()
+            except ExpressionError as e:
+                errors.append(f"{line.strip()}: {e}")
+    accepted = {}
+    recomputed = []
+    for name in old.keys() - lines.keys():
+        recomputed += workspace.remove(name)
+    for name, line in lines.items():
+        if old.get(name) == line:
+            accepted[name] = line
+            continue
         try:
-            current_value = float(st.session_state.current_input)
-            result = st.session_state.calc.square_root(current_value)
-            
-            if result is not None:
-                st.session_state.current_input = str(result)
-                st.session_state.expression = f"sqrt({current_value})=" # Show function in expression
-        except ValueError:
-            st.session_state.current_input = "Error"
-        return
-
-    # --- Standard Keys (0-9, .) ---
-    if st.session_state.current_input == '0' or st.session_state.current_input == "Error":
-        # Clear '0' or 'Error' when a new digit is pressed
-        if key == '.':
-             st.session_state.current_input = '0.'
+            recomputed += workspace.define(line)
+            accepted[name] = line
+        except ExpressionError as e:
+            errors.append(f"{line}: {e}")
+            if name in old:
+                accepted[name] = old[name]  # the previous definition stays in force
+    st.session_state.workspace_lines = accepted
+    st.session_state.workspace_report = (recomputed, errors)
+
+
+def variables_panel():
+    """Variables and user functions, recomputed through their dependency graph (zhina_calc.workspace)."""
+    if 'workspace' not in st.session_state:
+        st.session_state.workspace = Workspace()
+        st.session_state.workspace_lines = {}
+    workspace = st.session_state.workspace
+    with st.expander("Variables and functions"):
+        st.text_area("One definition per line", key='workspace_text', on_change=_sync_workspace,
+                     placeholder="rate = 0.07\nf(x) = x * (1 + rate)\ntotal = f(100) + f(50)")
+        recomputed, errors = st.session_state.pop('workspace_report', ((), ()))
+        for error in errors:
+            st.error(error)
+        if len(workspace):
+            st.dataframe([{'name': name, 'definition': definition,
+                           'value': format_result(value) if error is None and value is not None else '',
+                           'error': str(error or '')}
+                          for name, definition, value, error in workspace.cells()], hide_index=True)
+        if recomputed:
+            st.caption(f"Recomputed {len(recomputed)} of {len(workspace)} cells: {', '.join(recomputed)}")
+        expression = st.text_input("Evaluate with these definitions", key='workspace_expression',
+                                   placeholder="total * 2")
+        if expression.strip():
+            try:
+                st.markdown(f"`{expression.strip()} = {format_result(workspace.evaluate(expression))}`")
+            except (ExpressionError, ArithmeticError, ValueError, TypeError) as e:
+                st.error(f"Cannot evaluate: {e}")
+
+
+def solver():
+    """Solve mode: real roots of an equation in one variable (zhina_calc.solve)."""
+    with st.expander("Solve an equation"):
+        equation = st.text_input("Equation in one variable", placeholder="x^3 - 2*x = 5", key='solve_equation')
+        col1, col2 = st.columns(2)
+        lo = col1.number_input("From", value=-100.0, key='solve_lo')
+        hi = col2.number_input("To", value=100.0, key='solve_hi')
+        if not equation.strip():
+            return
+        from zhina_calc.solve import solve  # loads NumPy on first use
+        start = time.perf_counter()
+        try:
+            with metrics.timer('solve'):
+                result = solve(equation, lo, hi)
+        except Exception as e:
+            st.error(f"Cannot solve: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if result.roots:
+            st.markdown('\n'.join(f"- `{result.variable} = {root:.12g}`" for root in result.roots))
         else:
-            st.session_state.current_input = key
-    elif key == '.' and '.' in st.session_state.current_input:
-        pass # Only one decimal point allowed
-    else:
-        st.session_state.current_input += key
+            st.info(f"No real roots between {lo:g} and {hi:g}.")
+        st.caption(f"{len(result.roots)} root(s) from {result.brackets} sign changes, "
+                   f"{result.evaluations} Brent steps, {elapsed_ms:.1f} ms")
 
 
-def main():
-    st.set_page_config(page_title="Zhina Calculator", layout="centered")
-    
-    # ... (The custom CSS styling remains the same)
-    st.markdown("""
-        <style>
-        /* General Streamlit tweaks for a calculator feel */
-        .stButton>button {
-            width: 100%;
-            height: 70px; /* Large buttons */
-            font-size: 24px;
-            margin: 2px 0;
-            border-radius: 8px;
-            box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
-            font-weight: bold;
-        }
-        /* Style for the display area */
-        .expression-display {
-            text-align: right;
-            font-size: 16px;
-            color: #888;
-            height: 20px;
-        }
-        .input-display {
-            text-align: right;
-            font-size: 48px;
-            margin-bottom: 10px;
-            height: 60px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    st.title("🧮 Zhina Scientific Calculator")
-    
-    # --- Display Area ---
-    st.markdown(f'<div class="expression-display">{st.session_state.expression}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="input-display">{st.session_state.current_input}</div>', unsafe_allow_html=True)
-
-    # Define the button layout
-    r1 = ['MC', 'MR', 'M+', 'sqrt']
-    r2 = ['C', '/', '*', '-'] 
-    r3 = ['7', '8', '9', '+']
-    r4 = ['4', '5', '6']
-    r5 = ['1', '2', '3']
-    r6 = ['0', '.', '=']
-
-    # --- Button Grid ---
-    
-    # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
-    for row_keys in [r1, r2, r3, r4, r5]:
-        col1, col2, col3, col4 = st.columns(4)
-        cols = [col1, col2, col3, col4]
-        for i, key in enumerate(row_keys):
-            cols[i].button(key, key=key, on_click=handle_button, args=(key,))
-            
-    # Final Row (R6) - '0', '.', '='
-    col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
-    col1.button('0', key='0', on_click=handle_button, args=('0',))
-    col2.button('.', key='.', on_click=handle_button, args=('.',))
-    col4.button('=', key='=', on_click=handle_button, args=('=',)) 
-    
-    # Display Memory Status
-    st.markdown("---")
-    st.info(f"Memory (MR/M+): **{st.session_state.calc.memory_recall():.4f}**")
+def _select_register():
+    st.session_state.calc_state.registers.select(st.session_state.memory_register)
+    save_registers()
 
-if __name__ == '__main__':
-    main()
-import streamlit as st
-import math
-
-# --- 1. Core Calculator Logic (Unchanged) ---
-
-class ZhinaScientificCalculator:
-    """Core mathematical logic for the Zhina Scientific Calculator."""
-    # ... (All methods are the same: add, subtract, multiply, divide, power, sqrt, log, memory_add/recall/clear)
-    # ... (Retaining the original methods for brevity in the re-check)
-    def __init__(self):
-        if 'memory' not in st.session_state:
-            st.session_state.memory = 0
-
-    def add(self, a, b): return a + b
-    def subtract(self, a, b): return a - b
-    def multiply(self, a, b): return a * b
-    def divide(self, a, b):
-        if b == 0:
-            st.error("Error: Cannot divide by zero.")
-            return None
-        return a / b
-
-    def square_root(self, x):
-        if x < 0:
-            st.error("Error: Cannot take the square root of a negative number.")
-            return None
-        return math.sqrt(x)
-    
-    # ... (other scientific functions omitted for brevity in the re-check)
-
-    def memory_add(self, value):
-        st.session_state.memory += value
-    def memory_recall(self):
-        return st.session_state.memory
-    def memory_clear(self):
-        st.session_state.memory = 0
-        
-# --- 2. Calculation Function (Using eval() for simplicity, but acknowledge the risk) ---
-
-def calculate(full_expression):
-    """
-    ATTENTION: This function uses eval() for simplicity. 
-    REPLACE THIS with a safer library (like NumExpr) for production use.
-    """
-    # Simple string substitutions to handle basic scientific notation if needed
-    full_expression = full_expression.replace('^', '**')
 
+def _define_register():
+    registers = st.session_state.calc_state.registers
+    name = st.session_state.memory_new_name.strip()
     try:
-        # **The Vulnerable Line - Use with Caution**
-        result = eval(full_expression) 
-        return str(result)
-    except Exception as e:
-        return "Error"
-
-
-# --- 3. Streamlit Application Interface (Refined) ---
-
-# Initialize state variables
-if 'current_input' not in st.session_state:
-    st.session_state.current_input = '0'
-if 'expression' not in st.session_state:
-    st.session_state.expression = ''
-if 'calc' not in st.session_state:
-    st.session_state.calc = ZhinaScientificCalculator()
-
-
-def handle_button(key):
-    """Updates the input based on the button pressed."""
-    
-    # --- Clear/Equals ---
-    if key == 'C':
-        st.session_state.current_input = '0'
-        st.session_state.expression = ''
-        return
-    
-    if key == '=':
-        full_expression = st.session_state.expression + st.session_state.current_input
-        result_str = calculate(full_expression)
-        
-        # Update display
-        if result_str == "Error":
-             st.session_state.expression = ''
-        else:
-             st.session_state.expression = full_expression + '='
-        
-        st.session_state.current_input = result_str
-        return
-
-    # --- Operators ---
-    if key in ['+', '-', '*', '/']:
-        # Append current number and operator to the expression
-        st.session_state.expression += st.session_state.current_input + key
-        st.session_state.current_input = '0'
-        return
-
-    # --- Memory Keys ---
-    if key == 'MR':
-        st.session_state.current_input = str(st.session_state.calc.memory_recall())
-        return
-    if key == 'M+':
+        registers.define(name)
+    except ValueError as e:
+        st.session_state.memory_error = str(e)
+        return
+    registers.select(name)
+    st.session_state.memory_new_name = ''
+    save_registers()
+
+
+def memory_registers():
+    """Picks the register MR/M+/MC use and lists the others (zhina_calc.registers)."""
+    registers = st.session_state.calc_state.registers
+    with st.expander("Memory registers"):
+        names = registers.names()
+        st.session_state.memory_register = registers.active
+        st.selectbox("Active register", names, key='memory_register', on_change=_select_register)
+        used = [{'register': name, 'value': value} for name, value in registers.items() if value]
+        if used:
+            st.dataframe(used, hide_index=True)
+        col1, col2 = st.columns([3, 1])
+        col1.text_input("New register name", key='memory_new_name', placeholder="rate")
+        col2.button("Add", key='memory_define', on_click=_define_register)
+        error = st.session_state.pop('memory_error', None)
+        if error:
+            st.error(error)
+        if get_register_store() is not None:
+            profile = st.session_state.memory_profile
+            st.caption(f"Saved as profile {profile!r}; other sessions with this profile share it."
+                       if profile is not None else
+                       "Registers last for this session; add ?profile=<name> to the URL to keep them.")
+
+
+HISTORY_PAGE_SIZE = 20
+
+
+def _history_older(cursor):
+    st.session_state.history_cursors.append(cursor)
+
+
+def _history_newest():
+    st.session_state.history_cursors = []
+
+
+def history_panel():
+    """Recent results from the session's ring buffer; older ones are paged from disk."""
+    state = st.session_state.calc_state
+    with st.expander(f"History ({len(state.history)} recent)"):
+        if state.history:
+            st.markdown('\n'.join(f"- `{item.expression} = {item.result}`" for item in state.history))
+        store = get_history_store()
+        if store is None:
+            return
+        prefix = st.text_input("Search saved history by expression prefix", key='history_prefix',
+                               on_change=_history_newest)
+        cursors = st.session_state.setdefault('history_cursors', [])
+        cursor = cursors[-1] if cursors else None
         try:
-            # Only add the current number input, not the whole expression result
-            st.session_state.calc.memory_add(float(st.session_state.current_input))
-            st.toast(f"Added {st.session_state.current_input} to Memory ({st.session_state.calc.memory_recall():.4f})")
-        except ValueError:
-             st.toast("Invalid value for M+")
-        return
-    if key == 'MC':
-        st.session_state.calc.memory_clear()
-        st.toast("Memory Cleared!")
-        return
-
-    # --- Scientific Functions (Directly call the method) ---
-    if key == 'sqrt':
-        try:
-            current_value = float(st.session_state.current_input)
-            result = st.session_state.calc.square_root(current_value)
-            
-            if result is not None:
-                st.session_state.current_input = str(result)
-                st.session_state.expression = f"sqrt({current_value})=" # Show function in expression
-        except ValueError:
-            st.session_state.current_input = "Error"
-        return
-
-    # --- Standard Keys (0-9, .) ---
-    if st.session_state.current_input == '0' or st.session_state.current_input == "Error":
-        # Clear '0' or 'Error' when a new digit is pressed
-        if key == '.':
-             st.session_state.current_input = '0.'
+            if prefix:
+                page = store.search(st.session_state.history_session, prefix, cursor, HISTORY_PAGE_SIZE)
+            else:
+                page = store.page(st.session_state.history_session, cursor, HISTORY_PAGE_SIZE)
+        except Exception as e:
+            st.error(f"Cannot read history: {e}")
+            return
+        if page.entries:
+            st.dataframe([entry._asdict() for entry in page.entries],
+                         column_order=('id', 'expression', 'result'), hide_index=True)
         else:
-            st.session_state.current_input = key
-    elif key == '.' and '.' in st.session_state.current_input:
-        pass # Only one decimal point allowed
-    else:
-        st.session_state.current_input += key
+            st.caption("Nothing saved yet." if not prefix else f"No saved expressions start with {prefix!r}.")
+        col1, col2 = st.columns(2)
+        col1.button("Newest", key='history_newest', on_click=_history_newest, disabled=not cursors)
+        col2.button("Older", key='history_older', on_click=_history_older, args=(page.cursor,),
+                    disabled=page.cursor is None)
+
+
+def plotter():
+    """Plot mode: f(x) sampled server-side and downsampled with LTTB (zhina_calc.plot)."""
+    with st.expander("Plot f(x)"):
+        expression = st.text_input("f(x)", placeholder="sin(x)/x", key='plot_expression')
+        col1, col2 = st.columns(2)
+        lo = col1.number_input("From", value=-10.0, key='plot_lo')
+        hi = col2.number_input("To", value=10.0, key='plot_hi')
+        if not expression.strip():
+            return
+        from zhina_calc.plot import plot  # loads NumPy on first use
+        try:
+            with metrics.timer('plot'):
+                result = plot(expression, lo, hi)
+        except Exception as e:
+            st.error(f"Cannot plot: {e}")
+            return
+        st.line_chart({'x': result.x, 'f(x)': result.y}, x='x', y='f(x)')
+        st.caption(f"{result.sampled:,} samples ({result.tiles_computed} tiles computed, "
+                   f"{result.tiles_cached} cached, {result.tiles_derived} from other zoom levels): evaluation {result.evaluate_ms:.1f} ms, "
+                   f"LTTB to {len(result.x):,} points {result.downsample_ms:.1f} ms")
+
+
+def _read_file(file):
+    file.seek(0)
+    return file.read()
+
+
+# CSV outputs up to this size stay in memory; larger ones spill to disk.
+CSV_SPOOL_BYTES = 4 << 20
+
+
+def csv_columns():
+    """Applies an expression to every row of an uploaded CSV, chunk by chunk (zhina_calc.columns)."""
+    with st.expander("CSV columns"):
+        upload = st.file_uploader("CSV file with a header row", type=['csv', 'txt'], key='csv_upload')
+        col1, col2 = st.columns([3, 1])
+        expression = col1.text_input("Expression over the columns", placeholder="price * qty * (1 - discount)",
+                                     key='csv_expression')
+        column = col2.text_input("New column", value='result', key='csv_column').strip() or 'result'
+        if upload is None or not expression.strip():
+            return
+        if st.button("Evaluate", key='csv_evaluate'):
+            import io
+            import tempfile
+            from zhina_calc.columns import evaluate_csv  # loads NumPy on first use
+            previous = st.session_state.pop('csv_output', None)
+            if previous is not None:
+                previous[0].close()
+            bar = st.progress(0.0)
+            size = max(upload.size, 1)
+            upload.seek(0)
+            source = io.TextIOWrapper(upload, encoding='utf-8', newline='')
+            # An unnamed file: it goes away when closed, or with the session
+            # that holds it, so nothing is left behind in the temp directory.
+            out = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_BYTES)
+            text = io.TextIOWrapper(out, encoding='utf-8', newline='')
+            report = None
+            try:
+                with metrics.timer('csv'):
+                    report = evaluate_csv(source, text, expression, column=column,
+                                          progress=lambda rows: bar.progress(min(upload.tell() / size, 1.0)))
+            except Exception as e:
+                st.error(f"Cannot evaluate: {e}")
+            finally:
+                source.detach()
+                text.detach()  # flushes into `out` and leaves it open
+                bar.empty()
+            if report is None:
+                out.close()
+                return
+            file_name = f"{os.path.splitext(upload.name)[0]}_{column}.csv"
+            st.session_state.csv_output = (out, file_name, report)
+        output = st.session_state.get('csv_output')
+        if output is None:
+            return
+        out, file_name, report = output
+        st.download_button("Download CSV", lambda: _read_file(out), file_name=file_name, mime='text/csv',
+                           key='csv_download', on_click='ignore')
+        rate = report.rows / report.seconds if report.seconds else 0.0
+        st.caption(f"{report.rows:,} rows in {report.chunks} chunk(s), {report.seconds:.2f} s "
+                   f"({rate:,.0f} rows/s); {report.errors:,} row(s) without a value")
+
+
+MODE_LABELS = {'standard': 'Standard', 'fraction': 'Exact fraction', 'decimal': 'Decimal'}
+
+
+def number_mode_picker():
+    """Number mode for keypad arithmetic (see zhina_calc.arithmetic)."""
+    state = st.session_state.calc_state
+    mode = st.radio("Numbers", MODES, index=MODES.index(state.mode), format_func=MODE_LABELS.get,
+                    horizontal=True, key='mode_select')
+    precision = state.precision
+    if mode == 'decimal':
+        precision = int(st.number_input("Significant digits", min_value=1, max_value=MAX_DECIMAL_PRECISION,
+                                        value=state.precision, step=1, key='precision_select'))
+    if (mode, precision) != (state.mode, state.precision):
+        state.set_mode(mode, precision)
 
 
 def main():
-    st.set_page_config(page_title="Zhina Calculator", layout="centered")
-    
-    # ... (The custom CSS styling remains the same)
-    st.markdown("""
-        <style>
-        /* General Streamlit tweaks for a calculator feel */
-        .stButton>button {
-            width: 100%;
-            height: 70px; /* Large buttons */
-            font-size: 24px;
-            margin: 2px 0;
-            border-radius: 8px;
-            box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
-            font-weight: bold;
-        }
-        /* Style for the display area */
-        .expression-display {
-            text-align: right;
-            font-size: 16px;
-            color: #888;
-            height: 20px;
-        }
-        .input-display {
-            text-align: right;
-            font-size: 48px;
-            margin-bottom: 10px;
-            height: 60px;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    st.title("🧮 Zhina Scientific Calculator")
-    
-    # --- Display Area ---
-    st.markdown(f'<div class="expression-display">{st.session_state.expression}</div>', unsafe_allow_html=True)
-    st.markdown(f'<div class="input-display">{st.session_state.current_input}</div>', unsafe_allow_html=True)
-
-    # Define the button layout
-    r1 = ['MC', 'MR', 'M+', 'sqrt']
-    r2 = ['C', '/', '*', '-'] 
-    r3 = ['7', '8', '9', '+']
-    r4 = ['4', '5', '6']
-    r5 = ['1', '2', '3']
-    r6 = ['0', '.', '=']
-
-    # --- Button Grid ---
-    
-    # ... (The button layout logic is the same: R1, R2, R3, R4, R5, R6)
-    for row_keys in [r1, r2, r3, r4, r5]:
-        col1, col2, col3, col4 = st.columns(4)
-        cols = [col1, col2, col3, col4]
-        for i, key in enumerate(row_keys):
-            cols[i].button(key, key=key, on_click=handle_button, args=(key,))
-            
-    # Final Row (R6) - '0', '.', '='
-    col1, col2, col3, col4 = st.columns([2, 1, 1, 1]) 
-    col1.button('0', key='0', on_click=handle_button, args=('0',))
-    col2.button('.', key='.', on_click=handle_button, args=('.',))
-    col4.button('=', key='=', on_click=handle_button, args=('=',)) 
-    
-    # Display Memory Status
-    st.markdown("---")
-    st.info(f"Memory (MR/M+): **{st.session_state.calc.memory_recall():.4f}**")
-
-if __name__ == '__main__':
-    main()
-    col2.button('.', key='.', on_click=handle_button, args=('.',))
-    col4.button('=', key='=', on_click=handle_button, args=('=',)) 
-    
-    # Display Memory Status
-    st.markdown("---")
-    st.info(f"Memory (MR/M+): **{st.session_state.calc.memory_recall():.4f}**")
+    metrics.inc('rerun', scope='app')
+    with metrics.timer('main', phase='style'):
+        st.set_page_config(page_title="Zhina Calculator", layout="centered")
+    
+        # ... (The custom CSS styling remains the same)
+        st.markdown("""
+            <style>
+            /* General Streamlit tweaks for a calculator feel */
+            .stButton>button {
+                width: 100%;
+                height: 70px; /* Large buttons */
+                font-size: 24px;
+                margin: 2px 0;
+                border-radius: 8px;
+                box-shadow: 2px 2px 5px rgba(0, 0, 0, 0.2);
+                font-weight: bold;
+            }
+            /* Style for the display area */
+            .expression-display {
+                text-align: right;
+                font-size: 16px;
+                color: #888;
+                height: 20px;
+            }
+            .input-display {
+                text-align: right;
+                font-size: 48px;
+                margin-bottom: 10px;
+                height: 60px;
+            }
+            .preview-display {
+                text-align: right;
+                font-size: 18px;
+                color: #888;
+            }
+            </style>
+        """, unsafe_allow_html=True)
+    
+        st.title("🧮 Zhina Scientific Calculator")
+
+    with metrics.timer('main', phase='mode'):
+        number_mode_picker()
+
+    calculator_panel()
+
+    with metrics.timer('main', phase='memory_status'):
+        # Display Memory Status
+        st.markdown("---")
+        st.info(f"Memory {st.session_state.calc_state.registers.active} (MR/M+): "
+                f"**{get_calculator().memory_recall():.4f}**")
+        memory_registers()
+
+    history_panel()
+    math_helper()
+    variables_panel()
+    solver()
+    plotter()
+    csv_columns()
+    digits_export()
+
+    # Metrics export (only when ZHINA_METRICS is set)
+    if metrics.REGISTRY.enabled:
+        with st.sidebar.expander("Metrics"):
+            st.download_button("Prometheus text", metrics.REGISTRY.prometheus_text(), file_name="metrics.txt")
+            st.download_button("JSON snapshot", json.dumps(metrics.REGISTRY.snapshot(), indent=2),
+                               file_name="metrics.json")
+            st.json(metrics.REGISTRY.snapshot())
 
 if __name__ == '__main__':
     main()
-
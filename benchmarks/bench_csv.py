@@ -0,0 +1,83 @@
+"""
+Throughput and memory of CSV column evaluation on a large file.
+
+Writes a ROWS-row orders file (price, qty, discount) to a temporary
+directory, streams it through evaluate_csv() with price * qty * (1 - discount)
+and reports rows/s and the peak resident memory of the process. The peak
+should stay near the chunk size's worth of rows, whatever ROWS is. The
+'csv' layer of suite.py times the same evaluation on SUITE_ROWS rows.
+
+Run from the repository root:  python benchmarks/bench_csv.py [ROWS]
+"""
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.columns import DEFAULT_CHUNK_ROWS, evaluate_csv  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+ROWS = 10_000_000
+SUITE_ROWS = 200_000
+EXPRESSION = 'price * qty * (1 - discount)'
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def write_orders(path, rows):
+    rng = random.Random(0)
+    with open(path, 'w') as f:
+        f.write('price,qty,discount\n')
+        block = 100_000
+        for start in range(0, rows, block):
+            f.write(''.join(f"{rng.randrange(100, 100_000) / 100},{rng.randrange(1, 50)},"
+                            f"{rng.randrange(0, 30) / 100}\n"
+                            for _ in range(min(block, rows - start))))
+
+
+def evaluate_file(source_path, out_path):
+    with open(source_path, newline='') as source, open(out_path, 'w', newline='') as out:
+        return evaluate_csv(source, out, EXPRESSION)
+
+
+def suite_cases():
+    """evaluate_csv() over a SUITE_ROWS-row file, keyed for suite.py."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'orders.csv')
+        write_orders(source_path, SUITE_ROWS)
+        return {'csv.evaluate': measure(lambda: evaluate_file(source_path, os.path.join(tmp, 'out.csv')),
+                                        repeat=5)}
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'orders.csv')
+        out_path = os.path.join(tmp, 'out.csv')
+        start = time.perf_counter()
+        write_orders(source_path, rows)
+        size_mb = os.path.getsize(source_path) / 1e6
+        print(f"input: {rows:,} rows, {size_mb:,.0f} MB (written in {time.perf_counter() - start:.1f} s)")
+        baseline = peak_rss_mb()
+        reports = []
+        seconds = measure(lambda: reports.append(evaluate_file(source_path, out_path)),
+                          repeat=1, min_seconds=0)['median_us'] / 1e6
+        report = reports[0]
+        print(f"evaluate_csv: {report.rows:,} rows in {report.chunks} chunks of {DEFAULT_CHUNK_ROWS:,}, "
+              f"{seconds:.1f} s ({report.rows / seconds:,.0f} rows/s, "
+              f"{size_mb / seconds:.1f} MB/s), {report.errors} errors")
+        print(f"peak RSS: {peak_rss_mb():.0f} MB (before evaluation {baseline:.0f} MB), "
+              f"output {os.path.getsize(out_path) / 1e6:,.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
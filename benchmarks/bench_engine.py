@@ -0,0 +1,61 @@
+"""
+Compares the zhina_calc engine with the old eval() path of calculate().
+
+The corpus is made of the strings handle_button('=') builds, i.e.
+`expression + current_input` chains such as "12+7.5*3-4/2".
+
+Run from the repository root:  python benchmarks/bench_engine.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.engine import compile_cached, compile_expression  # noqa: E402
+
+
+def button_chain(rng, operands):
+    """Builds the string handle_button('=') would evaluate after `operands` numbers."""
+    parts = []
+    for i in range(operands):
+        number = str(rng.randint(1, 999))
+        if rng.random() < 0.3:
+            number += '.' + str(rng.randint(0, 99))
+        parts.append(number)
+        if i < operands - 1:
+            parts.append(rng.choice('+-*/'))
+    return ''.join(parts)
+
+
+def old_calculate(full_expression):
+    return eval(full_expression.replace('^', '**'))
+
+
+def per_call_us(func, corpus, repeat=5):
+    number = max(1, 20000 // len(corpus))
+    timer = timeit.Timer(lambda: [func(s) for s in corpus])
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * len(corpus)) * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'operands':>8} {'eval()':>10} {'cold':>10} {'cached':>10} {'compiled':>10} {'speedup':>8}")
+    for operands in (2, 5, 10, 25):
+        corpus = [button_chain(rng, operands) for _ in range(200)]
+        compiled = [compile_expression(s) for s in corpus]
+        for s in corpus:
+            compile_cached(s)
+
+        eval_us = per_call_us(old_calculate, corpus)
+        cold_us = per_call_us(lambda s: compile_expression(s).evaluate(), corpus)
+        cached_us = per_call_us(lambda s: compile_cached(s).evaluate(), corpus)
+        reuse_us = per_call_us(lambda c: c.evaluate(), compiled)
+        print(f"{operands:>8} {eval_us:>9.2f}u {cold_us:>9.2f}u {cached_us:>9.2f}u "
+              f"{reuse_us:>9.2f}u {eval_us / cached_us:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Compares result formatting for huge integers.
+
+    str()           CPython's int -> str (quadratic; needs the digit limit lifted)
+    format_result   the display string: 15 significant digits, scientific notation
+    iter_digits     every digit, for export
+
+Run from the repository root:  python benchmarks/bench_format.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.formatting import format_result, iter_digits  # noqa: E402
+
+
+def seconds(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    sys.set_int_max_str_digits(0)
+    print(f"{'digits':>10} {'str()':>10} {'format_result':>14} {'iter_digits':>12}")
+    for digits in (1_000, 10_000, 100_000, 300_000, 1_000_000):
+        n = 7 ** int(digits / 0.845098)  # log10(7) = 0.845098
+        str_s = seconds(lambda: str(n))
+        format_s = seconds(lambda: format_result(n))
+        digits_s = seconds(lambda: sum(len(chunk) for chunk in iter_digits(n)))
+        print(f"{digits:>10,} {str_s * 1000:>9.2f}m {format_s * 1000:>13.3f}m {digits_s * 1000:>11.2f}m")
+
+
+if __name__ == '__main__':
+    main()
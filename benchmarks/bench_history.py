@@ -0,0 +1,85 @@
+"""
+Cost of the calculation history on and off the click path.
+
+append() is what the '=' key pays; the writer's batched inserts happen on its
+own thread. Reads are timed against a database of ROWS entries spread over
+SESSIONS sessions: the newest page, a page deep into the history (following
+cursors), and prefix searches. suite.py runs the same cases as its
+'history' layer, on SUITE_ROWS entries.
+
+Run from the repository root:  python benchmarks/bench_history.py
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.history import HistoryRing  # noqa: E402
+from zhina_calc.history_db import HistoryStore  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+ROWS = 500_000
+SUITE_ROWS = 100_000
+SESSIONS = 50
+CHUNK = 50_000  # what the writer's queue holds, so no entry is dropped
+PREFIXES = ('1', '123', '1234*5')
+
+
+def run(rows):
+    """Click-path, writer and read timings over `rows` entries, plus the store's stats()."""
+    rng = random.Random(0)
+    ring = HistoryRing()
+    results = {'history.ring_append': measure(lambda: ring.append('12+34', '46'))}
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, 'history.sqlite3'))
+        sessions = [f'session-{i}' for i in range(SESSIONS)]
+        entries = iter([(rng.choice(sessions), f'{rng.randrange(10_000)}*{rng.randrange(100)}', '0')
+                        for _ in range(rows)])
+
+        def fill_chunk():
+            for entry in itertools.islice(entries, CHUNK):
+                store.append(*entry)
+            store.flush()
+        results['history.fill_chunk'] = measure(fill_chunk, repeat=rows // CHUNK, min_seconds=0)
+
+        session = sessions[0]
+        results['history.page_newest'] = measure(lambda: store.page(session))
+        cursor = None
+        for _ in range(200):
+            cursor = store.page(session, cursor).cursor
+        results['history.page_200_back'] = measure(lambda: store.page(session, cursor))
+        for prefix in PREFIXES:
+            results[f'history.search.{prefix}'] = measure(lambda prefix=prefix: store.search(session, prefix))
+        # A short window, so the queue never fills and no append is dropped.
+        results['history.store_append'] = measure(lambda: store.append('click', '12+34', '46'),
+                                                  min_seconds=0.005)
+        store.flush()
+        stats = store.stats()
+        store.close()
+    return results, stats
+
+
+def suite_cases():
+    """run() on SUITE_ROWS entries, keyed for suite.py."""
+    return run(SUITE_ROWS)[0]
+
+
+def main():
+    cases, stats = run(ROWS)
+    print(f"HistoryRing.append         {cases['history.ring_append']['median_us']:8.2f} us")
+    print(f"HistoryStore.append        {cases['history.store_append']['median_us']:8.2f} us (click path)")
+    print(f"writer throughput          {CHUNK / cases['history.fill_chunk']['median_us'] * 1e6:8.0f} rows/s "
+          f"in {stats['batches']} batches, {stats['dropped']} dropped")
+    print(f"page (newest)              {cases['history.page_newest']['median_us']:8.1f} us")
+    print(f"page (200 pages back)      {cases['history.page_200_back']['median_us']:8.1f} us")
+    for prefix in PREFIXES:
+        print(f"search {prefix!r:<19} {cases[f'history.search.{prefix}']['median_us']:8.1f} us")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
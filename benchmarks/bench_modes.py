@@ -0,0 +1,94 @@
+"""
+Compares the standard (float), exact fraction and decimal number modes.
+
+Each case types a keypad chain into a RunningChain the way handle_button()
+does and reports the cost per operator key. 'mixed' alternates + - * / over
+small decimals; 'harmonic' adds 1/2 + 1/3 + 1/4 ..., the worst case for
+fractions because the denominator is the lcm of everything typed so far. The
+unguarded row shows what that chain costs without the max_bits cap; the
+'last 100' column is the per-key cost at the end of the chain, where it is
+highest. A guarded chain stops at TooExpensive and ignores later keys.
+The guarded chains of SUITE_CASES are the 'modes' layer of suite.py.
+
+Run from the repository root:  python benchmarks/bench_modes.py
+"""
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.arithmetic import FLOAT, DecimalArithmetic, FractionArithmetic  # noqa: E402
+from zhina_calc.incremental import RunningChain  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+ARITHMETICS = {
+    'float': FLOAT,
+    'fraction': FractionArithmetic(),
+    'decimal(28)': DecimalArithmetic(28),
+    'decimal(200)': DecimalArithmetic(200),
+    'fraction, unguarded': FractionArithmetic(max_bits=10**9),
+}
+
+
+def mixed(length):
+    return [(f"{i % 97 + 1}.{i % 7}", '+-*/'[i % 4]) for i in range(length)]
+
+
+def harmonic(length):
+    keys = []
+    for i in range(2, length + 2):
+        keys += [('1', '/'), (str(i), '+')]
+    return keys
+
+
+CASES = (('mixed', mixed, (100, 1000)), ('harmonic', harmonic, (100, 3000, 20000)))
+SUITE_CASES = (('mixed', mixed, 1000), ('harmonic', harmonic, 3000))
+
+
+def type_keys(chain, keys):
+    for operand, op in keys:
+        chain.push(operand, op)
+    chain.result_str('1')
+    return chain
+
+
+def time_chain(arithmetic, keys, tail=100, repeat=7):
+    """measure() of typing the whole chain, of typing its last `tail` keys onto
+    the chain typed up to there, and the chain's error (if any) at the end."""
+    head = RunningChain(arithmetic)
+    for operand, op in keys[:-tail]:
+        head.push(operand, op)
+    whole = measure(lambda: type_keys(RunningChain(arithmetic), keys), repeat=repeat)
+    last = measure(lambda: type_keys(copy.copy(head), keys[-tail:]), repeat=repeat)
+    return whole, last, type_keys(RunningChain(arithmetic), keys).error
+
+
+def suite_cases():
+    """Whole-chain timings in every guarded mode, keyed for suite.py."""
+    results = {}
+    for name, build, length in SUITE_CASES:
+        keys = build(length)
+        for label, arithmetic in ARITHMETICS.items():
+            if not label.endswith('unguarded'):
+                results[f'modes.{name}[{length}].{label}'] = time_chain(arithmetic, keys)[0]
+    return results
+
+
+def main():
+    print(f"{'chain':<16} {'mode':<22} {'us/key':>10} {'last 100':>10}  note")
+    for name, build, lengths in CASES:
+        for length in lengths:
+            keys = build(length)
+            for label, arithmetic in ARITHMETICS.items():
+                if label.endswith('unguarded') and name != 'harmonic':
+                    continue
+                whole, last, error = time_chain(arithmetic, keys, repeat=3)
+                note = f"stopped: {error}" if error is not None else ''
+                print(f"{f'{name}[{length}]':<16} {label:<22} {whole['median_us'] / len(keys):>10.2f} "
+                      f"{last['median_us'] / 100:>10.2f}  {note}")
+
+
+if __name__ == '__main__':
+    main()
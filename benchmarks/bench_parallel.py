@@ -0,0 +1,89 @@
+"""
+Scaling of shared-memory parallel evaluation (zhina_calc.parallel).
+
+Fills two SIZE-element float64 inputs in shared memory and times one
+ParallelEvaluator.evaluate() of EXPRESSION for 1, 2, 4, ... workers up to the
+number of CPUs (or the counts given with --workers). Workers are started
+before timing, results are written into the same output blocks every run
+(out=), and each count reports the median of --repeat runs. suite.py's
+'parallel' layer times the same evaluation on SUITE_SIZE elements.
+
+Memory: about 8 bytes per element for each input and for the result, plus
+one byte for the error mask (2.5 GB at the default 10^8 elements).
+
+Run from the repository root:  python benchmarks/bench_parallel.py [--size 100000000]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from zhina_calc.parallel import ParallelEvaluator  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+SIZE = 100_000_000
+SUITE_SIZE = 4_000_000
+EXPRESSION = 'x * x + 2 * x * y - sqrt(y)'
+
+
+def worker_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def fill(array, rng, lo, hi, block=1 << 22):
+    for start in range(0, len(array), block):
+        array[start:start + block] = rng.uniform(lo, hi, min(block, len(array) - start))
+
+
+def time_workers(workers, size, rng, repeat):
+    """measure() of one evaluate() over `size` elements on `workers` processes."""
+    with ParallelEvaluator(workers=workers) as evaluator:
+        x = evaluator.empty(size)
+        y = evaluator.empty(size)
+        fill(x, rng, -10, 10)
+        fill(y, rng, 0, 10)
+        evaluator.free(*evaluator.evaluate(EXPRESSION, x=x[:1 << 21], y=y[:1 << 21]))  # start the workers
+        result = evaluator.evaluate(EXPRESSION, x=x, y=y)  # and fault in the output pages
+        timing = measure(lambda: evaluator.evaluate(EXPRESSION, x=x, y=y, out=result),
+                         repeat=repeat, min_seconds=0)
+        del x, y, result
+    return timing
+
+
+def suite_cases():
+    """evaluate() on one worker and on every CPU, keyed for suite.py."""
+    rng = np.random.default_rng(0)
+    return {f'parallel.workers.{workers}': time_workers(workers, SUITE_SIZE, rng, repeat=5)
+            for workers in sorted({1, os.cpu_count() or 1})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=SIZE)
+    parser.add_argument('--workers', type=int, nargs='+', default=worker_counts())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{EXPRESSION!r} over {args.size:,} elements, {os.cpu_count()} CPU(s)")
+    print(f"{'workers':>7} {'seconds':>8} {'Melem/s':>8} {'speedup':>8} {'efficiency':>10}")
+    rng = np.random.default_rng(0)
+    base = None
+    for workers in args.workers:
+        seconds = time_workers(workers, args.size, rng, args.repeat)['median_us'] / 1e6
+        if base is None:
+            base = (workers, seconds)  # speedups are relative to the first count
+        speedup = base[1] / seconds
+        print(f"{workers:>7} {seconds:>8.2f} {args.size / seconds / 1e6:>8.1f} {speedup:>7.2f}x "
+              f"{speedup * base[0] / workers:>9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Cost of plot(): cold sampling, a pan, zooms, and LTTB downsampling.
+
+Each function is plotted over [-10, 10] with the default 10^6 point budget.
+"cold" starts from an empty tile cache and "warm" repeats that view. "pan"
+shifts the view by a quarter of its width from a cache holding the first
+view (only the newly exposed tiles are sampled), "zoom in" shows [-4, 4]
+from that cache, refining its tiles, and "zoom out" shows [-20, 20],
+merging them. Times are whole plot() calls, LTTB included; the "lttb"
+column is downsample() alone and the last one is the number of points sent
+to the browser. The same cases are the 'plot' layer of suite.py.
+
+Run from the repository root:  python benchmarks/bench_plot.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from zhina_calc.plot import DEFAULT_THRESHOLD, PlotCache, downsample, plot  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+FUNCTIONS = (
+    'x^3 - x',
+    'sin(x)/x',
+    'sin(1/x)',
+    'tan(x)',
+    'log(x)',
+    'gamma(x)',
+    'e^(-x^2) * cos(20*x)',
+)
+
+VIEW = (-10, 10)
+MOVES = {'pan': (-5, 15), 'zoom_in': (-4, 4), 'zoom_out': (-20, 20)}
+
+
+class RecordingCache(PlotCache):
+    """A PlotCache that remembers every tile put into it, to prime others with."""
+
+    def __init__(self):
+        super().__init__()
+        self.tiles = []
+
+    def put(self, key, tile):
+        self.tiles.append((key, tile))
+        super().put(key, tile)
+
+
+def primed(tiles):
+    cache = PlotCache()
+    for key, tile in tiles:
+        cache.put(key, tile)
+    return cache
+
+
+def suite_cases(functions=FUNCTIONS, repeat=5):
+    """Wall-clock plot() and downsample() timings, keyed for suite.py."""
+    plot('x', 0, 1)  # import-time and first-call costs
+    results = {}
+    for expression in functions:
+        results[f'plot.cold.{expression}'] = measure(lambda: plot(expression, *VIEW, cache=PlotCache()),
+                                                     repeat=repeat)
+        first = RecordingCache()
+        plot(expression, *VIEW, cache=first)
+        results[f'plot.warm.{expression}'] = measure(lambda: plot(expression, *VIEW, cache=first), repeat=repeat)
+        for move, view in MOVES.items():
+            results[f'plot.{move}.{expression}'] = measure(
+                lambda view=view: plot(expression, *view, cache=primed(first.tiles)), repeat=repeat)
+        x = np.concatenate([tile[0] for _, tile in first.tiles])
+        y = np.concatenate([tile[1] for _, tile in first.tiles])
+        in_view = (x >= VIEW[0]) & (x <= VIEW[1])
+        results[f'plot.lttb.{expression}'] = measure(
+            lambda x=x[in_view], y=y[in_view]: downsample(x, y, DEFAULT_THRESHOLD), repeat=repeat)
+    return results
+
+
+def main():
+    cases = suite_cases()
+    columns = ('cold', 'warm', 'pan', 'zoom_in', 'zoom_out', 'lttb')
+    print(f"{'function (ms)':<24} {'samples':>9} " + ' '.join(f"{column:>8}" for column in columns)
+          + f" {'points':>7}")
+    for expression in FUNCTIONS:
+        result = plot(expression, *VIEW, cache=PlotCache())
+        print(f"{expression:<24} {result.sampled:>9,} "
+              + ' '.join(f"{cases[f'plot.{column}.{expression}']['median_us'] / 1000:>8.1f}" for column in columns)
+              + f" {len(result.x):>7,}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
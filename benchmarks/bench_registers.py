@@ -0,0 +1,77 @@
+"""
+Cost of M+ with persistent registers, and how many disk writes it causes.
+
+Each simulated press adds to the active register and calls
+RegisterStore.save(), which is what the M+ callback does. Presses arrive
+every INTERVAL seconds for DURATION seconds across PROFILES profiles; the
+store's writer coalesces them into one row write per profile and flush.
+The cost of a press, with presses back to back, is the 'registers' layer of
+suite.py.
+
+Run from the repository root:  python benchmarks/bench_registers.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.registers import MemoryRegisters  # noqa: E402
+from zhina_calc.registers_db import RegisterStore  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+PROFILES = 20
+DURATION = 3.0
+INTERVAL = 0.001
+
+
+def suite_cases():
+    """M+ (add + save) pressed back to back, keyed for suite.py."""
+    with tempfile.TemporaryDirectory() as directory:
+        store = RegisterStore(os.path.join(directory, 'memory.sqlite3'), flush_interval=0.5)
+        sessions = [(f'profile-{i}', MemoryRegisters()) for i in range(PROFILES)]
+        presses = iter(range(10**9))
+
+        def press():
+            profile, registers = sessions[next(presses) % PROFILES]
+            registers.add(1.0)
+            store.save(profile, registers)
+        results = {'registers.m_plus': measure(press)}
+        store.close()
+    return results
+
+
+def main():
+    m_plus = suite_cases()['registers.m_plus']
+    with tempfile.TemporaryDirectory() as directory:
+        store = RegisterStore(os.path.join(directory, 'memory.sqlite3'), flush_interval=0.5)
+        sessions = {f'profile-{i}': MemoryRegisters() for i in range(PROFILES)}
+        profiles = list(sessions)
+        samples = []  # per press: a paced press finds colder caches than measure()'s loop
+        presses = 0
+        end = time.perf_counter() + DURATION
+        while time.perf_counter() < end:
+            profile = profiles[presses % PROFILES]
+            start = time.perf_counter()
+            sessions[profile].add(1.0)
+            store.save(profile, sessions[profile])
+            samples.append((time.perf_counter() - start) * 1e6)
+            presses += 1
+            time.sleep(INTERVAL)
+        store.close()
+        recall = sessions[profiles[0]].recall()
+        reloaded = RegisterStore(os.path.join(directory, 'memory.sqlite3'))
+        assert reloaded.load(profiles[0]).recall() == recall
+        reloaded.close()
+    print(f"M+ (add + save)    median {statistics.median(samples):.2f} us, "
+          f"max {max(samples):.1f} us over {presses} presses; {m_plus['median_us']:.2f} us back to back")
+    print(f"disk writes        {store.written} rows in {store.batches} transactions "
+          f"({presses / max(store.written, 1):.0f} presses per row)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Compares the scientific builtins with naive implementations.
+
+Scalar: factorial() (table / math.factorial) against a multiplication loop,
+and gamma() against exp(lgamma()). Vectorized: the NumPy forms used by
+calculate_many() against calling the scalar function once per element, as
+np.vectorize would. The zhina_calc side of each row is also the
+'scientific' layer of suite.py.
+
+Run from the repository root:  python benchmarks/bench_scientific.py
+"""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from zhina_calc import scientific  # noqa: E402
+from zhina_calc.vector import calculate_many  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+FACTORIALS = (20, 170, 2000, 20000)
+VECTOR_SIZE = 100_000
+
+
+def naive_factorial(n):
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+
+def naive_gamma(x):
+    """Gamma for x > 0 through the log-gamma function."""
+    return math.exp(math.lgamma(x))
+
+
+def vector_inputs(size=VECTOR_SIZE):
+    """expression -> (x, the scalar function calculate_many() replaces)."""
+    rng = np.random.default_rng(42)
+    return {
+        'sin(x)': (rng.uniform(-10, 10, size), math.sin),
+        'cos(x)': (rng.uniform(-10, 10, size), math.cos),
+        'tan(x)': (rng.uniform(-1.5, 1.5, size), math.tan),
+        'log(x)': (rng.uniform(0.1, 100, size), math.log),
+        'gamma(x)': (rng.uniform(0.1, 150, size), math.gamma),
+        'factorial(x)': (rng.integers(0, 170, size).astype(float), lambda v: scientific.factorial(int(v))),
+    }
+
+
+def suite_cases():
+    """The zhina_calc timings, keyed for suite.py."""
+    results = {}
+    for n in FACTORIALS:
+        results[f'scientific.factorial.{n}'] = measure(lambda n=n: scientific.factorial(n))
+    results['scientific.gamma'] = measure(lambda: scientific.gamma(7.5))
+    for expression, (x, _) in vector_inputs().items():
+        results[f'scientific.vector.{expression}'] = measure(lambda expression=expression, x=x:
+                                                             calculate_many(expression, x=x))
+    return results
+
+
+def main():
+    cases = suite_cases()
+    print(f"{'scalar':<24} {'zhina_calc':>12} {'naive':>12} {'speedup':>8}")
+    for n in FACTORIALS:
+        fast = cases[f'scientific.factorial.{n}']['median_us']
+        slow = measure(lambda n=n: naive_factorial(n))['median_us']
+        print(f"{f'factorial({n})':<24} {fast:>11.2f}u {slow:>11.2f}u {slow / fast:>7.1f}x")
+    fast = cases['scientific.gamma']['median_us']
+    slow = measure(lambda: naive_gamma(7.5))['median_us']
+    print(f"{'gamma(7.5)':<24} {fast:>11.2f}u {slow:>11.2f}u {slow / fast:>7.1f}x")
+
+    print(f"\n{f'vectorized, {VECTOR_SIZE} rows':<24} {'ns/row':>12} {'per-row':>12} {'speedup':>8}")
+    for expression, (x, scalar_func) in vector_inputs().items():
+        fast = cases[f'scientific.vector.{expression}']['median_us'] * 1000 / VECTOR_SIZE
+        slow = measure(lambda: [scalar_func(v) for v in x.tolist()], repeat=3)['median_us'] * 1000 / VECTOR_SIZE
+        print(f"{expression:<24} {fast:>11.1f}n {slow:>11.1f}n {slow / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Latency of solve() for typical equations against the 50 ms target.
+
+Each equation is solved over [-100, 100] with the default grid, cold (the
+compiled equation cache cleared) and warm; these are also the 'solve' layer
+of suite.py.
+
+Run from the repository root:  python benchmarks/bench_solve.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.solve import compile_equation, solve  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+TARGET_MS = 50.0
+
+EQUATIONS = (
+    'x^2 = 2',
+    'x^3 - 2*x = 5',
+    'x^5 - 3*x^4 + x - 7 = 0',
+    '(x-1)*(x-2)*(x-3)*(x+4.5)*(x-50)',
+    '0.001*x^7 - 10*x^3 + x - 1',
+    'sin(x) = 0.5',
+    'tan(x)',
+    'cos(x) = x/50',
+)
+
+
+def suite_cases():
+    """Cold and warm solve() of every equation, keyed for suite.py."""
+    solve('x = 1')  # import-time and first-call costs
+    results = {}
+    for equation in EQUATIONS:
+        def cold(equation=equation):
+            compile_equation.cache_clear()
+            return solve(equation)
+        results[f'solve.cold.{equation}'] = measure(cold)
+        results[f'solve.warm.{equation}'] = measure(lambda equation=equation: solve(equation))
+    return results
+
+
+def main():
+    cases = suite_cases()
+    print(f"{'equation':<36} {'roots':>5} {'cold ms':>9} {'warm ms':>9}")
+    worst = 0.0
+    for equation in EQUATIONS:
+        cold_ms = cases[f'solve.cold.{equation}']['median_us'] / 1000
+        warm_ms = cases[f'solve.warm.{equation}']['median_us'] / 1000
+        worst = max(worst, cold_ms)
+        print(f"{equation:<36} {len(solve(equation).roots):>5} {cold_ms:>9.2f} {warm_ms:>9.2f}")
+    print(f"worst {worst:.2f} ms (target {TARGET_MS:.0f} ms)")
+    return 0 if worst <= TARGET_MS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Update cost of a Workspace against the size of the affected subgraph.
+
+The workspace holds CHAINS independent chains of LENGTH cells each
+(c<i>_0 = <value>, c<i>_1 = f(c<i>_0), ...) sharing one user function f.
+Changing the head of one chain recomputes LENGTH cells; changing f (a new
+body) recompiles every cell. The time per recomputed cell should stay flat
+while the workspace grows. These are also the 'workspace' layer of suite.py.
+
+Run from the repository root:  python benchmarks/bench_workspace.py
+"""
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zhina_calc.workspace import Workspace  # noqa: E402
+
+from suite import measure  # noqa: E402
+
+LENGTH = 20
+CHAINS = (10, 100, 1000)
+SUITE_CHAINS = (10, 100)
+
+
+def build(chains):
+    ws = Workspace()
+    ws.define('k = 1.5')
+    ws.define('f(x) = x * k + 1')
+    for i in range(chains):
+        ws.define(f'c{i}_0 = {i}')
+        for j in range(1, LENGTH):
+            ws.define(f'c{i}_{j} = f(c{i}_{j - 1}) - c{i}_0')
+    return ws
+
+
+def run(chains):
+    """Build, one-chain and whole-workspace update timings per number of chains,
+    plus the number of cells each update recomputed."""
+    results, cells_run = {}, {}
+    for count in chains:
+        results[f'workspace.build.{count}'] = measure(lambda count=count: build(count), repeat=3)
+        ws = build(count)
+        values = itertools.count()
+        results[f'workspace.one_chain.{count}'] = measure(lambda: ws.define(f'c0_0 = {next(values)}'))
+        cells_run[f'workspace.one_chain.{count}'] = len(ws.define(f'c0_0 = {next(values)}'))
+        bodies = itertools.count()
+        results[f'workspace.all.{count}'] = measure(lambda: ws.define(f'f(x) = x * k + {next(bodies)}'),
+                                                    repeat=3)
+        cells_run[f'workspace.all.{count}'] = len(ws.define(f'f(x) = x * k + {next(bodies)}'))
+    return results, cells_run
+
+
+def suite_cases():
+    """run() for SUITE_CHAINS, keyed for suite.py."""
+    return run(SUITE_CHAINS)[0]
+
+
+def main():
+    cases, cells_run = run(CHAINS)
+    print(f"{'cells':>7} {'build ms':>9} {'one chain ms':>13} {'cells run':>9} {'us/cell':>8} "
+          f"{'all (f) ms':>10} {'cells run':>9}")
+    for count in CHAINS:
+        chain_ms = cases[f'workspace.one_chain.{count}']['median_us'] / 1000
+        chain_run = cells_run[f'workspace.one_chain.{count}']
+        print(f"{count * LENGTH + 2:>7} {cases[f'workspace.build.{count}']['median_us'] / 1000:>9.1f} "
+              f"{chain_ms:>13.3f} {chain_run:>9} {chain_ms * 1000 / chain_run:>8.1f} "
+              f"{cases[f'workspace.all.{count}']['median_us'] / 1000:>10.1f} "
+              f"{cells_run[f'workspace.all.{count}']:>9}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
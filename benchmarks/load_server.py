@@ -0,0 +1,154 @@
+"""
+Load generator for the HTTP evaluation service (zhina_calc.server).
+
+Opens CONCURRENCY keep-alive connections, each sending POST /eval requests
+back to back for DURATION seconds, and reports throughput and p50/p99
+latency, plus how the server batched them (from GET /stats). By default it
+starts a server on a free port in a subprocess; --url targets a running one.
+
+    --mode calc   distinct plain expressions ('123*457+1'), the calculate() path
+    --mode vars   one expression with per-request variables, the NumPy path
+    --mode mixed  half of each
+
+Client and server share the machine, so on few cores the client's own CPU
+use lowers the numbers.
+
+Run from the repository root:  python benchmarks/load_server.py [--concurrency 64] [--mode mixed]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request_body(rng, mode):
+    if mode == 'vars' or (mode == 'mixed' and rng.random() < 0.5):
+        return {'expression': 'price * qty * (1 - discount)',
+                'variables': {'price': rng.uniform(1, 1000), 'qty': rng.randrange(1, 50),
+                              'discount': rng.choice([0, 0.05, 0.1])}}
+    return {'expression': f'{rng.randrange(1, 10_000)}*{rng.randrange(1, 10_000)}+{rng.randrange(100)}'}
+
+
+async def send(reader, writer, host, path, body=None):
+    """One request on an open connection; returns (status, parsed JSON body)."""
+    data = json.dumps(body).encode() if body is not None else b''
+    method = 'POST' if body is not None else 'GET'
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(data)}\r\n\r\n'.encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, mode, deadline, seed, latencies, statuses):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            body = request_body(rng, mode)
+            start = time.perf_counter()
+            status, _ = await send(reader, writer, host, '/eval', body)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return (await send(reader, writer, host, '/stats'))[1]
+    finally:
+        writer.close()
+
+
+async def run(host, port, concurrency, duration, mode):
+    latencies, statuses = [], {}
+    before = await stats(host, port)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, mode, start + duration, seed, latencies, statuses)
+                           for seed in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    after = await stats(host, port)
+    return latencies, statuses, elapsed, before, after
+
+
+def wait_for_server(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on {host}:{port} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', help="server to load (default: start one)")
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--mode', choices=('calc', 'vars', 'mixed'), default='mixed')
+    parser.add_argument('--max-batch', type=int, help="--max-batch for the started server")
+    parser.add_argument('--max-wait-ms', type=float, help="--max-wait-ms for the started server")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = '127.0.0.1', free_port()
+        command = [sys.executable, '-m', 'zhina_calc.server', '--port', str(port)]
+        if args.max_batch is not None:
+            command += ['--max-batch', str(args.max_batch)]
+        if args.max_wait_ms is not None:
+            command += ['--max-wait-ms', str(args.max_wait_ms)]
+        server = subprocess.Popen(command, cwd=ROOT, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_server(host, port)
+        latencies, statuses, elapsed, before, after = asyncio.run(
+            run(host, port, args.concurrency, args.duration, args.mode))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    batches = after['batches'] - before['batches']
+    items = after['batched_items'] - before['batched_items']
+    print(f"{args.mode}, {args.concurrency} connections, {elapsed:.1f} s: {len(ms):,} requests "
+          f"({len(ms) / elapsed:,.0f} req/s), status {dict(sorted(statuses.items()))}")
+    print(f"latency p50 {statistics.median(ms):.2f} ms  p99 {ms[int(len(ms) * 0.99) - 1]:.2f} ms  "
+          f"max {ms[-1]:.2f} ms")
+    print(f"server: {batches:,} batches, {items / batches if batches else 0:.1f} items per batch on average, "
+          f"largest {after['largest_batch']}, {after['rejected'] - before['rejected']} rejected")
+
+
+if __name__ == '__main__':
+    main()
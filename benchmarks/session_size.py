@@ -0,0 +1,84 @@
+"""
+Per-session memory footprint: the old loose st.session_state keys against
+one CalculatorState.
+
+Sizes are deep sys.getsizeof() totals of what a session keeps alive, for a
+session in the middle of a calculation ('7*6+' typed, '2' on the display,
+12.5 in memory). The legacy layout is rebuilt here as it was: four separate
+session_state entries plus a ZhinaScientificCalculator instance per session.
+Interned strings and small ints shared across sessions are counted anyway,
+so both figures are upper bounds.
+
+    python benchmarks/session_size.py
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from zhina_calc import registers  # noqa: E402
+from zhina_calc.arithmetic import FLOAT  # noqa: E402
+from zhina_calc.incremental import RunningChain  # noqa: E402
+from zhina_calc.state import CalculatorState  # noqa: E402
+
+
+class _LegacyCalculator:
+    """Stand-in for the per-session ZhinaScientificCalculator (methods only)."""
+
+    def __init__(self):
+        pass
+
+
+def deep_size(obj, seen=None):
+    # The chain's arithmetic and the default register names are process-wide
+    # objects, not per-session memory.
+    seen = {id(FLOAT), id(registers.DEFAULT_NAMES), id(registers._DEFAULT_INDEX)} if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot):
+            size += deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def _chain():
+    chain = RunningChain()
+    chain.push('7', '*')
+    chain.push('6', '+')
+    return chain
+
+
+def legacy_session():
+    return {'current_input': '2', 'expression': '7*6+', 'memory': 12.5,
+            'calc': _LegacyCalculator(), 'chain': _chain()}
+
+
+def compact_session():
+    return {'calc_state': CalculatorState('2', '7*6+', 12.5, chain=_chain())}
+
+
+def main():
+    legacy = deep_size(legacy_session())
+    compact = deep_size(compact_session())
+    state = compact_session()['calc_state']
+    blob = state.to_bytes()
+    print(f"legacy session_state keys:  {legacy:5d} bytes/session")
+    print(f"CalculatorState:            {compact:5d} bytes/session ({compact / legacy:.0%})")
+    print(f"CalculatorState.to_bytes(): {len(blob):5d} bytes")
+    dumps = min(timeit.repeat(state.to_bytes, number=100_000, repeat=5)) / 100_000
+    loads = min(timeit.repeat(lambda: CalculatorState.from_bytes(blob), number=100_000, repeat=5)) / 100_000
+    print(f"snapshot {dumps * 1e6:.2f} us, restore {loads * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Cold-start and per-rerun budget check.
+
+Import time: runs a fresh interpreter with `python -X importtime` on the
+module-level zhina_calc imports of app.py (read from its source, so the list
+cannot go stale), and adds up their cumulative times. It also fails if any module in LAZY_MODULES was loaded, since those
+must only load on first use.
+
+Rerun time: runs app.py through Streamlit's AppTest and takes the median of
+repeated full reruns.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --import-budget-ms 50 --rerun-budget-ms 150
+
+Exits with status 1 if a budget is exceeded.
+"""
+import argparse
+import ast
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+
+# Heavy modules that must not be loaded by those imports.
+LAZY_MODULES = ('numpy', 'multiprocessing', 'concurrent.futures', 'sqlite3')
+
+IMPORT_BUDGET_MS = 60.0
+RERUN_BUDGET_MS = 150.0
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+def app_imports(path=APP_PATH):
+    """The import statements app.py runs from zhina_calc at module level, as source lines.
+
+    Imports inside functions are the deferred ones and are left out.
+    """
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    statements = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and not node.level:
+            names = [node.module]
+        else:
+            continue
+        if any(name == 'zhina_calc' or name.startswith('zhina_calc.') for name in names):
+            statements.append(ast.unparse(node))
+    return statements
+
+
+def measure_import(statements=None, lazy=LAZY_MODULES):
+    """Returns (cumulative_ms, loaded_lazy_modules) from a fresh interpreter."""
+    statements = app_imports() if statements is None else statements
+    code = '\n'.join([*statements, 'import sys',
+                      f"print(','.join(m for m in {lazy!r} if m in sys.modules))"])
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        # Top-level rows (no indentation) carry the cumulative time of their subtree.
+        if match and not match.group(3) and match.group(4).startswith('zhina_calc'):
+            total_us += int(match.group(2))
+    loaded = [name for name in proc.stdout.strip().split(',') if name]
+    return total_us / 1000, loaded
+
+
+def measure_rerun(repeat=15):
+    """Median milliseconds for a full rerun of app.py under AppTest."""
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+    set_log_level('error')
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import-time and rerun-time budgets.")
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--rerun-budget-ms', type=float, default=RERUN_BUDGET_MS)
+    parser.add_argument('--skip-rerun', action='store_true', help="only check import time")
+    args = parser.parse_args(argv)
+
+    failures = []
+    import_ms, loaded = measure_import()
+    print(f"import zhina_calc (app imports): {import_ms:.1f} ms (budget {args.import_budget_ms:.0f} ms)")
+    if import_ms > args.import_budget_ms:
+        failures.append('import time')
+    if loaded:
+        print(f"  eagerly loaded: {', '.join(loaded)}")
+        failures.append('lazy imports')
+
+    if not args.skip_rerun:
+        rerun_ms = measure_rerun()
+        print(f"app.py full rerun (AppTest): {rerun_ms:.1f} ms (budget {args.rerun_budget_ms:.0f} ms)")
+        if rerun_ms > args.rerun_budget_ms:
+            failures.append('rerun time')
+
+    if failures:
+        print(f"FAILED: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
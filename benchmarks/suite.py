@@ -0,0 +1,277 @@
+"""
+Benchmark suite for the calculator, from the engine up to a full page rerun.
+
+Layers:
+  engine     calculate()'s evaluation path (cache.calculate_uncached) over a
+             corpus of short, long, deeply nested and big-integer
+             expressions, cold (compile cache cleared) and warm, plus
+             compile-cache hits from 8 threads at once
+  callbacks  handle_button() key sequences against a fake session state
+  rerun      a full main() rerun through Streamlit's AppTest harness
+
+and one layer per standalone benchmark, run at suite-sized inputs through
+the suite_cases() of benchmarks/bench_<layer>.py: scientific, modes, solve,
+plot, history, registers, workspace, csv and parallel. Those scripts time
+with measure() too, so their tables and the JSON report agree.
+
+Results are written as JSON (median/min microseconds per operation). With
+--compare, each case is checked against a stored baseline and the run fails
+(exit status 1) if any case got slower than the threshold allows.
+
+    python benchmarks/suite.py -o baseline.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.25
+"""
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+sys.path.insert(0, ROOT)
+
+from zhina_calc.cache import calculate_uncached  # noqa: E402
+from zhina_calc.engine import SHARED_COMPILE_CACHE, CompileCache  # noqa: E402
+
+# Layers whose cases live in benchmarks/bench_<layer>.py.
+MODULE_LAYERS = ('scientific', 'modes', 'solve', 'plot', 'history', 'registers', 'workspace', 'csv', 'parallel')
+LAYERS = ('engine', 'callbacks', 'rerun') + MODULE_LAYERS
+
+_CONTENDED_CACHE = CompileCache()
+
+
+# --- Corpus ---
+
+def _chain(operands):
+    return ''.join(f"{i % 97 + 1}{'+-*/'[i % 4]}" for i in range(operands - 1)) + '7'
+
+
+def _nested(depth):
+    expression = '1'
+    for i in range(depth):
+        expression = f"({expression}+{i})*{i % 3 + 1}"
+    return expression
+
+
+CORPUS = {
+    'short': '7*6+2',
+    'long': _chain(200),
+    'nested': _nested(60),
+    'bigint': '2**4000*3**2000//7**300+5**1000',
+    'functions': 'sqrt(2)*max(1,2,3)+abs(-4.5)-round(2.675,2)',
+}
+
+KEY_SEQUENCES = {
+    'short': list('7*6+2='),
+    'chain50': [k for i in range(50) for k in (str(i % 9 + 1), '+-*/'[i % 4])] + ['1', '='],
+    'memory': ['5', 'M+', 'C', 'MR', '*', '2', '=', 'MC'],
+    'sqrt': ['9', 'sqrt', '+', '1', '='],
+}
+
+
+# --- Timing ---
+
+def measure(func, repeat=7, min_seconds=0.05):
+    """Returns per-call timings in microseconds (median over `repeat` rounds)."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or number >= 1_000_000:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return {
+        'median_us': statistics.median(samples) * 1e6,
+        'min_us': min(samples) * 1e6,
+        'calls': number * repeat,
+    }
+
+
+# --- Layers ---
+
+def bench_engine():
+    results = {}
+    for name, expression in CORPUS.items():
+        def cold(expression=expression):
+            SHARED_COMPILE_CACHE.clear()
+            calculate_uncached(expression)
+        results[f'engine.cold.{name}'] = measure(cold)
+        calculate_uncached(expression)
+        results[f'engine.warm.{name}'] = measure(lambda expression=expression: calculate_uncached(expression))
+    results['engine.compile_cache.contended'] = measure(_contended_lookups, repeat=5)
+    return results
+
+
+def _contended_lookups(threads=8, lookups=2000):
+    """`threads` threads hitting one CompileCache at once (as concurrent reruns do)."""
+    keys = list(CORPUS.values())
+
+    def worker():
+        for i in range(lookups):
+            _CONTENDED_CACHE.get(keys[i % len(keys)])
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+
+class FakeSessionState(dict):
+    """Attribute-style dict standing in for st.session_state."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class FakeStreamlit:
+    """Just enough of the streamlit module for handle_button()."""
+
+    def __init__(self):
+        self.session_state = FakeSessionState()
+
+    def toast(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+
+def load_app():
+    """Imports app.py as a module (without running main())."""
+    # Bare-mode imports warn about the missing script context on every access.
+    from streamlit.logger import set_log_level
+    set_log_level('error')
+    spec = importlib.util.spec_from_file_location('zhina_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_callbacks(app=None):
+    app = app or load_app()
+    session_keys = dict(app.st.session_state)
+    fake = FakeStreamlit()
+    app.st = fake
+    results = {}
+    for name, keys in KEY_SEQUENCES.items():
+        def press_all(keys=keys):
+            fake.session_state.clear()
+            fake.session_state.calc_state = app.CalculatorState()
+            for key in session_keys:
+                if key not in fake.session_state:
+                    fake.session_state[key] = type(session_keys[key])()
+            for key in keys:
+                app.handle_button(key)
+        results[f'callbacks.{name}'] = measure(press_all)
+    return results
+
+
+def bench_rerun():
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("streamlit AppTest not available; skipping rerun layer", file=sys.stderr)
+        return {}
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    results = {'rerun.idle': measure(at.run, repeat=5, min_seconds=0.2)}
+
+    def click_digit():
+        at.button(key='7').click()
+        at.run()
+    results['rerun.click_digit'] = measure(click_digit, repeat=5, min_seconds=0.2)
+    return results
+
+
+def bench_module(layer):
+    """The suite_cases() of benchmarks/bench_<layer>.py."""
+    return importlib.import_module(f'bench_{layer}').suite_cases()
+
+
+# --- Reporting ---
+
+def run_suite(layers):
+    benches = {'engine': bench_engine, 'callbacks': bench_callbacks, 'rerun': bench_rerun}
+    results = {}
+    for layer in layers:
+        results.update(benches[layer]() if layer in benches else bench_module(layer))
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Returns a list of (case, baseline_us, current_us, ratio) that regressed."""
+    regressions = []
+    for case, now in current['results'].items():
+        before = baseline['results'].get(case)
+        if before is None:
+            continue
+        ratio = now['median_us'] / before['median_us']
+        if ratio > 1 + threshold:
+            regressions.append((case, before['median_us'], now['median_us'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--layers', default=','.join(LAYERS),
+                        help=f"comma-separated subset of {', '.join(LAYERS)}")
+    parser.add_argument('-o', '--output', help="write the JSON report here (default: stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="baseline JSON to check against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    layers = [layer.strip() for layer in args.layers.split(',') if layer.strip()]
+    unknown = set(layers) - set(LAYERS)
+    if unknown:
+        parser.error(f"unknown layer(s): {', '.join(sorted(unknown))}")
+
+    report = run_suite(layers)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for case, before, now, ratio in regressions:
+            print(f"REGRESSION {case}: {before:.1f}us -> {now:.1f}us ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Tests for the Streamlit app (app.py) through Streamlit's AppTest.
+
+Run from the repository root:  python -m pytest -q
+"""
+import os
+
+import pytest
+
+pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # History and register databases go to a scratch directory.
+    monkeypatch.chdir(tmp_path)
+    return AppTest.from_file(APP_PATH, default_timeout=30).run()
+
+
+def press(app, *keys):
+    for key in keys:
+        app.button(key=key).click().run()
+
+
+def display(app):
+    return app.session_state.calc_state.current_input
+
+
+def test_memory_recall_shows_whole_numbers_as_typed(app):
+    press(app, 'MR')
+    assert display(app) == '0'
+    press(app, '5')
+    assert display(app) == '5'
+    press(app, 'M+', 'C', 'MR')
+    assert display(app) == '5'
+    press(app, '.', '5', 'M+', 'MR')
+    assert display(app) == '10.5'
+
+
+def test_keypad_chain_and_equals(app):
+    press(app, '2', '+', '3', '*', '4')
+    assert app.session_state.calc_state.expression == '2+3*'
+    press(app, '=')
+    state = app.session_state.calc_state
+    assert (state.expression, state.current_input) == ('2+3*4=', '14')
+    # A finished calculation starts the next chain from its result.
+    press(app, '-', '4', '=')
+    assert display(app) == '10'
+
+
+def test_function_keys_and_clear(app):
+    press(app, '5', 'n!')
+    state = app.session_state.calc_state
+    assert (state.expression, state.current_input) == ('factorial(5)=', '120')
+    press(app, '.', '.', '5', 'C')
+    assert display(app) == '0' and app.session_state.calc_state.expression == ''
+    press(app, '1', '/', '0', '=')
+    assert display(app) == 'Error'
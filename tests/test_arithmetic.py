@@ -0,0 +1,72 @@
+"""
+Tests for the keypad number modes (zhina_calc.arithmetic).
+
+Run from the repository root:  python -m pytest -q
+"""
+import decimal
+from fractions import Fraction
+
+import pytest
+
+from zhina_calc.arithmetic import (
+    FLOAT, MAX_DECIMAL_PRECISION, DecimalArithmetic, FractionArithmetic, arithmetic_for, parse_operand,
+)
+from zhina_calc.errors import ExpressionError, TooExpensive
+from zhina_calc.incremental import RunningChain
+
+
+def chain_result(arithmetic, keys, last):
+    chain = RunningChain(arithmetic)
+    for operand, op in keys:
+        chain.push(operand, op)
+    return chain.result_str(last)
+
+
+@pytest.mark.parametrize('mode, expected', [
+    ('standard', '0.30000000000000004'),
+    ('fraction', '3/10'),
+    ('decimal', '0.3'),
+])
+def test_point_one_plus_point_two(mode, expected):
+    assert chain_result(arithmetic_for(mode), [('0.1', '+')], '0.2') == expected
+
+
+def test_fraction_mode_is_exact():
+    fraction = arithmetic_for('fraction')
+    assert chain_result(fraction, [('1', '/'), ('3', '*')], '3') == '1'
+    assert fraction.decode(fraction.encode(Fraction(2, 7))) == Fraction(2, 7)
+    with pytest.raises(ExpressionError):
+        fraction.parse('abc')
+
+
+def test_fraction_mode_refuses_huge_operands():
+    small = FractionArithmetic(max_bits=64)
+    with pytest.raises(TooExpensive):
+        small.parse('1' * 40)
+    with pytest.raises(TooExpensive):
+        small.apply('*', Fraction(2 ** 40), Fraction(2 ** 40))
+
+
+def test_decimal_mode_uses_its_own_context():
+    before = decimal.getcontext().prec
+    five = DecimalArithmetic(5)
+    assert five.format(five.apply('/', five.parse('1'), five.parse('3'))) == '0.33333'
+    assert decimal.getcontext().prec == before
+    with pytest.raises(decimal.DivisionByZero):
+        five.apply('/', five.parse('1'), five.parse('0'))
+    with pytest.raises(ValueError):
+        DecimalArithmetic(MAX_DECIMAL_PRECISION + 1)
+
+
+def test_arithmetic_for_shares_instances():
+    assert arithmetic_for('standard') is FLOAT
+    assert arithmetic_for('decimal', 10) is arithmetic_for('decimal', 10)
+    assert arithmetic_for('decimal', 10) is not arithmetic_for('decimal', 11)
+    with pytest.raises(ValueError):
+        arithmetic_for('hex')
+
+
+def test_parse_operand():
+    assert parse_operand('12') == 12 and parse_operand('0.') == 0.0 and parse_operand('-5.0') == -5.0
+    with pytest.raises(ExpressionError):
+        parse_operand('x')
@@ -0,0 +1,56 @@
+"""
+Tests for the calculate() result cache (zhina_calc.cache).
+
+Run from the repository root:  python -m pytest -q
+"""
+import pickle
+
+from zhina_calc.cache import ERROR, ErrorResult, ResultCache, calculate_uncached
+
+
+def test_caret_is_power_in_calculate():
+    assert calculate_uncached('2^10') == ('1024', True)
+
+
+def test_errors_display_as_error():
+    result, cacheable = calculate_uncached('1/0')
+    assert result == ERROR and isinstance(result, ErrorResult)
+    assert isinstance(result.error, ZeroDivisionError)
+    assert cacheable
+
+
+def test_error_result_drops_traceback_and_pickles():
+    result, _ = calculate_uncached('1/0')
+    assert result.error.__traceback__ is None
+    copy = pickle.loads(pickle.dumps(result))
+    assert copy == ERROR and type(copy.error) is ZeroDivisionError
+
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    assert cache.calculate('1+1') == '2'
+    assert cache.calculate('2+2') == '4'
+    assert cache.get('1+1') == '2'
+    assert cache.calculate('3+3') == '6'  # evicts '2+2'
+    assert cache.get('2+2') is None
+    assert cache.evictions == 1 and len(cache) == 2
+
+
+def test_result_cache_shares_normalized_keys():
+    cache = ResultCache(maxsize=4)
+    cache.calculate(' 2^3 ')
+    assert cache.get('2**3') == '8'
+
+
+def test_result_cache_skips_nondeterministic():
+    cache = ResultCache(maxsize=4)
+    cache.calculate('rand()')
+    assert len(cache) == 0 and cache.skipped == 1
+
+
+def test_result_cache_stats():
+    cache = ResultCache(maxsize=4)
+    cache.calculate('1+1')
+    cache.calculate('1+1')
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_rate'] == 0.5
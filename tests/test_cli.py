@@ -0,0 +1,64 @@
+"""
+Tests for the headless batch mode (zhina_calc.cli, python -m zhina_calc).
+
+Run from the repository root:  python -m pytest -q
+"""
+import io
+import subprocess
+import sys
+
+import pytest
+
+from zhina_calc.cache import calculate_uncached
+from zhina_calc.cli import main, run
+
+LINES = ['1+1', '', '2^10', '1/0', 'sqrt(2)', '   ', '2**100', 'nonsense(']
+
+
+def expected(lines):
+    return [calculate_uncached(line)[0] if line.strip() else '' for line in lines]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+def test_one_output_line_per_input_line(chunk_size):
+    out = io.StringIO()
+    assert run(io.StringIO('\n'.join(LINES) + '\n'), out, chunk_size=chunk_size) == len(LINES)
+    assert out.getvalue().split('\n')[:-1] == expected(LINES)
+
+
+def test_jobs_keep_input_order():
+    lines = [f'{i}*{i}' for i in range(500)]
+    out = io.StringIO()
+    assert run(io.StringIO('\n'.join(lines)), out, jobs=2, chunk_size=7) == 500
+    assert out.getvalue().split('\n')[:-1] == [str(i * i) for i in range(500)]
+
+
+def test_files_and_summary(tmp_path, capsys):
+    source = tmp_path / 'in.txt'
+    source.write_text('\n'.join(LINES) + '\n', encoding='utf-8')
+    target = tmp_path / 'out.txt'
+    assert main([str(source), '-o', str(target), '--chunk-size', '2']) == 0
+    assert target.read_text(encoding='utf-8').split('\n')[:-1] == expected(LINES)
+    assert f'{len(LINES)} expressions in' in capsys.readouterr().err
+
+
+def test_csv_mode(tmp_path, capsys):
+    pytest.importorskip('numpy')
+    source = tmp_path / 'in.csv'
+    source.write_text('price,qty\n2,3\n1.5,4\n', encoding='utf-8')
+    target = tmp_path / 'out.csv'
+    assert main([str(source), '--csv', 'price*qty', '--column', 'total', '-o', str(target), '-q']) == 0
+    assert target.read_text(encoding='utf-8') == 'price,qty,total\n2,3,6.0\n1.5,4,6.0\n'
+    assert capsys.readouterr().err == ''
+
+
+def test_invalid_arguments():
+    with pytest.raises(SystemExit):
+        main(['--jobs', '0'])
+
+
+def test_module_entry_point():
+    done = subprocess.run([sys.executable, '-m', 'zhina_calc', '-q'], input='6*7\n1/0\n',
+                          capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0
+    assert done.stdout == '42\nError\n'
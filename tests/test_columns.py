@@ -0,0 +1,64 @@
+"""
+Tests for evaluating expressions over CSV columns (zhina_calc.columns).
+
+Run from the repository root:  python -m pytest -q
+"""
+import csv
+import io
+
+import pytest
+
+pytest.importorskip('numpy')
+from zhina_calc.columns import column_name, evaluate_csv  # noqa: E402
+from zhina_calc.errors import ExpressionError  # noqa: E402
+
+
+def run(text, expression, **kwargs):
+    out = io.StringIO()
+    report = evaluate_csv(io.StringIO(text), out, expression, **kwargs)
+    return out.getvalue(), report
+
+
+def test_appends_a_result_column():
+    output, report = run('price,qty\n2,3\n1.5,4\n', 'price * qty', column='total')
+    assert output == 'price,qty,total\n2,3,6.0\n1.5,4,6.0\n'
+    assert (report.rows, report.errors, report.chunks) == (2, 0, 1)
+
+
+def test_rows_without_a_value_are_empty_and_counted():
+    output, report = run('a,b\n1,0\n,2\nx,1\n4,2\n', 'a / b')
+    assert output.splitlines()[1:] == ['1,0,', ',2,', 'x,1,', '4,2,2.0']
+    assert report.errors == 3
+
+
+def test_chunks_and_blank_lines():
+    text = 'x\n' + '\n'.join(str(i) for i in range(10)) + '\n\n'
+    output, report = run(text, 'x * 2', chunk_rows=3)
+    assert output.splitlines()[-1] == '9,18.0'
+    assert (report.rows, report.chunks) == (10, 4)
+
+
+def test_hash_is_not_a_comment():
+    output, report = run('id,x\n"#1",2\n#2,3\n4,5#6\n', 'x + 1', chunk_rows=1)
+    assert output.splitlines()[1:] == ['"#1",2,3.0', '#2,3,4.0', '4,5#6,']
+    assert report.errors == 1
+
+
+def test_new_column_name_is_quoted():
+    output, _ = run('a\n1\n', 'a', column='total, "net"')
+    header = next(csv.reader(io.StringIO(output)))
+    assert header == ['a', 'total, "net"']
+
+
+def test_headers_become_names():
+    assert column_name(' unit price ') == 'unit_price'
+    assert column_name('2nd') == '_2nd'
+    output, _ = run('unit price;2nd\n2;3\n', 'unit_price * _2nd', delimiter=';')
+    assert output.splitlines()[1] == '2;3;6.0'
+
+
+def test_errors():
+    with pytest.raises(ExpressionError, match='empty'):
+        run('', 'x')
+    with pytest.raises(ExpressionError, match='No column named y'):
+        run('x\n1\n', 'y + 1')
@@ -0,0 +1,39 @@
+"""
+Tests for the process-wide compile cache (zhina_calc.engine.CompileCache).
+
+Run from the repository root:  python -m pytest -q
+"""
+from zhina_calc.engine import CompileCache
+
+
+def test_compile_cache_evicts_least_recently_used():
+    cache = CompileCache(maxsize=2, shards=1)
+    first = cache.get('1+1')
+    cache.get('2+2')
+    assert cache.get('1+1') is first  # now the most recent
+    cache.get('3+3')  # evicts '2+2'
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 1, 3)
+    assert cache.get('1+1') is first
+    cache.get('2+2')
+    assert cache.stats()['misses'] == 4
+
+
+def test_compile_cache_skips_large_constants():
+    cache = CompileCache(maxsize=8, shards=1, max_constant_bits=64)
+    assert cache.get('2**100').evaluate() == 2**100
+    assert len(cache) == 0 and cache.stats()['skipped'] == 1
+
+
+def test_compile_cache_resize_evicts():
+    cache = CompileCache(maxsize=4, shards=1)
+    for i in range(4):
+        cache.get(f'{i}+1')
+    cache.resize(1)
+    assert len(cache) == 1 and cache.stats()['evictions'] == 3
+
+
+def test_compile_cache_does_not_keep_long_sources():
+    cache = CompileCache(maxsize=8, shards=1, max_source_len=10)
+    assert cache.get('1+2+3+4+5+6').evaluate() == 21
+    assert len(cache) == 0
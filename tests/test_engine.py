@@ -0,0 +1,89 @@
+"""
+Tests for the expression engine: parity with Python's eval(), rejection of
+anything eval() would not run, and reusable compiled expressions.
+
+Run from the repository root:  python -m pytest -q
+"""
+import math
+
+import pytest
+
+from zhina_calc.engine import compile_expression, evaluate
+from zhina_calc.errors import ExpressionError
+
+# Expressions Python evaluates the same way; the engine must agree exactly.
+PARITY = [
+    # precedence and associativity
+    '1+2*3', '(1+2)*3', '10-3-2', '100/10/5', '2*3%4', '7+8//3*2',
+    '2**3**2', '(2**3)**2', '-2**2', '(-2)**2', '2**-1', '-2**-2', '2*-3', '--3', '-+-3',
+    # numbers
+    '0', '00', '0.0', '007.5', '.5+1', '1.', '1e3', '1.5E-3*2', '0.1+0.2', '12+7.5*3-4/2',
+    # integer division and remainder with signs
+    '7/2', '7//2', '-7//2', '7//-2', '7%3', '-7%3', '7%-3', '7.5//2', '-7.5%2',
+    # big integers stay exact
+    '2**100+1', '3**200//7**50', '(10**30+7)%97',
+    # functions shared with Python's builtins
+    'abs(-4.5)', 'max(1,2,3)', 'min(3,1)', 'round(2.675,2)', 'round(-7.5)', 'round(12345,-2)',
+    'pow(2,10)', 'pow(3,4,5)', 'pow(2,-1)',
+]
+
+# Expressions Python rejects; the engine must raise ExpressionError.
+REJECTED = ['07', '1+007', '1+', '(1+2', '1+2)', '2**', '*3', '', '1 2', 'import os', '__import__("os")',
+            '1;2', 'x.y', 'abs(1', 'max(,)']
+
+# Errors Python raises at run time; the engine raises the same kind.
+RUNTIME_ERRORS = ['1/0', '1//0', '1%0', '0**-1', 'pow(2,3,0)']
+
+
+@pytest.mark.parametrize('expression', PARITY)
+def test_matches_eval(expression):
+    expected = eval(expression)
+    result = evaluate(expression)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+@pytest.mark.parametrize('expression', REJECTED)
+def test_rejects_what_python_rejects(expression):
+    with pytest.raises(ExpressionError):
+        compile_expression(expression).evaluate()
+
+
+def test_leading_zero_message():
+    with pytest.raises(ExpressionError, match="Leading zeros"):
+        compile_expression('07')
+
+
+@pytest.mark.parametrize('expression', RUNTIME_ERRORS)
+def test_runtime_errors_match_eval(expression):
+    with pytest.raises(Exception) as expected:
+        eval(expression)
+    with pytest.raises(expected.type):
+        evaluate(expression)
+
+
+def test_caret_is_power():
+    assert evaluate('2^10') == 1024
+
+
+def test_compiled_expression_is_reusable():
+    compiled = compile_expression('x * 2 + 1')
+    assert compiled.variables == {'x'}
+    assert [compiled.evaluate({'x': x}) for x in range(3)] == [1, 3, 5]
+    assert compile_expression('2 * 3 + 1').is_constant
+
+
+def test_unknown_names_and_functions():
+    with pytest.raises(ExpressionError, match="Unknown function"):
+        compile_expression('system(1)')
+    with pytest.raises(ExpressionError, match="Unknown name"):
+        evaluate('x + 1')
+    assert evaluate('x + 1', {'x': 2}) == 3
+    assert evaluate('2*pi') == 2 * math.pi
+
+
+@pytest.mark.parametrize('operands', [3000, 20000])
+def test_long_chains_do_not_recurse_per_operand(operands):
+    assert evaluate('+'.join(['1'] * operands)) == operands
+    assert evaluate('-'.join(['x*2'] * operands), {'x': 1}) == 2 * (2 - operands)
+    assert compile_expression('+'.join(['x'] * operands)).variables == {'x'}
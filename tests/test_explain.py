@@ -0,0 +1,63 @@
+"""
+Tests for step-by-step solutions (zhina_calc.explain).
+
+Run from the repository root:  python -m pytest -q
+"""
+import pytest
+
+from zhina_calc.arithmetic import arithmetic_for
+from zhina_calc.engine import parse
+from zhina_calc.errors import TooExpensive
+from zhina_calc.explain import explain, render
+from zhina_calc.sandbox import Budget
+
+
+def texts(expression, **kwargs):
+    return [step.text for step in explain(expression, **kwargs)]
+
+
+def test_steps_follow_evaluation_order():
+    assert texts('2 + 3 * 4 ^ 2') == [
+        'Read as: 2 + (3 * (4 ** 2))',
+        'Raise to a power: 4 ** 2 = 16',
+        'Multiply: 3 * 16 = 48',
+        'Add: 2 + 48 = 50',
+        'Result: 50',
+    ]
+
+
+def test_constants_functions_and_identities():
+    assert texts('2*pi')[0] == 'Replace pi with 3.141592653589793'
+    assert texts('sqrt(16)') == ['Apply sqrt: sqrt(16) = 4.0', 'Result: 4.0']
+    assert texts('x * 1 + 0')[1:] == ['Simplify: x * 1 = x', 'Simplify: x + 0 = x', 'Simplified: x']
+    assert texts('-(-x)') == ['Simplify: -(-x) = x', 'Simplified: x']
+
+
+def test_errors_are_steps():
+    assert explain('1/0') == (('error', 'Stopped: division by zero'),)
+    assert explain('2+')[0].rule == 'error'
+    with pytest.raises(TooExpensive):
+        explain('2 * 3 * 4 * 5', budget=Budget(max_seconds=1e-9))
+    assert explain('2**2000000')[-1].rule == 'error'
+
+
+def test_number_modes():
+    assert texts('0.1+0.2', arithmetic=arithmetic_for('fraction')) == ['Add: (1/10) + (1/5) = 3/10', 'Result: 3/10']
+    assert texts('1/3', arithmetic=arithmetic_for('decimal', 5))[-1] == 'Result: 0.33333'
+    assert texts('2**3', arithmetic=arithmetic_for('fraction')) == ["Stopped: '**' is not available in fraction mode"]
+    assert texts('pi', arithmetic=arithmetic_for('decimal')) == ['Stopped: pi is not available in decimal mode']
+    assert explain('0.1+0.2', arithmetic=arithmetic_for('standard')) == explain('0.1+0.2')
+
+
+def test_render_makes_grouping_explicit():
+    assert render(parse('1 - 2 - 3')) == '(1 - 2) - 3'
+    assert render(parse('1 - (2 - 3)')) == '1 - (2 - 3)'
+    assert render(parse('(a + b) ** c ** d')) == '(a + b) ** (c ** d)'
+    assert render(parse('1 + 2 + 3 + 4'), width=6) == '((1 + ...'
+
+
+def test_long_chain_is_explained():
+    steps = explain('+'.join(['1'] * 3000))
+    assert steps[-1].text == 'Result: 3000'
+    assert len(steps) == 3001
+    assert explain('+'.join(['x'] * 3000))[-1].rule == 'result'
@@ -0,0 +1,48 @@
+"""
+Tests for result display strings (zhina_calc.formatting).
+
+Run from the repository root:  python -m pytest -q
+"""
+import decimal
+import sys
+
+import pytest
+
+from zhina_calc.formatting import MAX_INT_DIGITS, format_result, int_to_decimal, iter_digits, scientific
+
+
+def test_small_values_are_str():
+    assert format_result(1024) == '1024'
+    assert format_result(-7) == '-7'
+    assert format_result(0.1 + 0.2) == str(0.1 + 0.2)
+    assert format_result(10 ** (MAX_INT_DIGITS - 1)) == str(10 ** (MAX_INT_DIGITS - 1))
+
+
+def test_large_ints_use_scientific_notation():
+    assert format_result(2 ** 100_000) == '9.99002093014385e+30102'
+    assert format_result(-(10 ** MAX_INT_DIGITS)) == '-1e+4300'
+    assert format_result(12345, max_int_digits=3) == '1.2345e+4'
+
+
+@pytest.mark.parametrize('n', [10 ** 5000 - 1, 3 ** 20000, 2 ** 65536 + 12345], ids=['nines', '3**20000', '2**65536'])
+def test_scientific_rounds_like_decimal(n):
+    with decimal.localcontext() as context:
+        context.prec = 15
+        context.Emax = decimal.MAX_EMAX
+        expected = format(+int_to_decimal(n), '.14e')
+    mantissa, exponent = expected.split('e')
+    mantissa = mantissa.rstrip('0').rstrip('.')
+    assert scientific(n) == f"{mantissa}e{exponent}"
+
+
+def test_all_digits_on_request():
+    n = 7 ** 30000
+    limit = sys.get_int_max_str_digits()
+    sys.set_int_max_str_digits(0)
+    try:
+        expected = str(n)
+    finally:
+        sys.set_int_max_str_digits(limit)
+    assert ''.join(iter_digits(n, chunk_size=1000)) == expected
+    assert all(len(chunk) == 1000 for chunk in list(iter_digits(n, chunk_size=1000))[:-1])
+    assert list(iter_digits(-42)) == ['-42']
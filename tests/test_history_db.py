@@ -0,0 +1,92 @@
+"""
+Tests for the on-disk calculation history (zhina_calc.history_db).
+
+Run from the repository root:  python -m pytest -q
+"""
+import time
+
+import pytest
+
+from zhina_calc import history_db
+from zhina_calc.history_db import HistoryStore, _prefix_end
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'history.sqlite3')
+
+
+@pytest.fixture
+def store(path):
+    store = HistoryStore(path, flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def fill(store, session, expressions):
+    for expression in expressions:
+        store.append(session, expression, 'result')
+    store.flush()
+
+
+def test_pages_are_newest_first(store):
+    fill(store, 'a', [f'{i}+1' for i in range(5)])
+    fill(store, 'b', ['other'])
+    first = store.page('a', limit=2)
+    assert [entry.expression for entry in first.entries] == ['4+1', '3+1']
+    second = store.page('a', first.cursor, limit=2)
+    third = store.page('a', second.cursor, limit=2)
+    assert [entry.expression for entry in second.entries + third.entries] == ['2+1', '1+1', '0+1']
+    assert third.cursor is None
+    assert store.count() == 6 and store.count('a') == 5
+
+
+def test_search_by_prefix(store):
+    fill(store, 'a', ['sin(1)', 'sqrt(2)', 'sin(2)', 's', 'tan(1)', 'sin(1)'])
+    page = store.search('a', 'sin', limit=2)
+    assert [entry.expression for entry in page.entries] == ['sin(1)', 'sin(1)']
+    rest = store.search('a', 'sin', page.cursor, limit=2)
+    assert [entry.expression for entry in rest.entries] == ['sin(2)'] and rest.cursor is None
+    assert len(store.search('a', '').entries) == 6
+
+
+def test_prefix_end():
+    assert _prefix_end('ab') == 'ac'
+    assert _prefix_end('a\U0010ffff') == 'b'
+    assert _prefix_end('\U0010ffff') is None
+    assert _prefix_end('\ud7ff') == '\ue000'  # skips the surrogates
+
+
+def test_search_with_highest_code_point(store):
+    top = '\U0010ffff'
+    fill(store, 'a', [top, top + '1', 'a'])
+    assert [entry.expression for entry in store.search('a', top).entries] == [top, top + '1']
+
+
+def test_max_rows_prunes_oldest_in_batches(path, monkeypatch):
+    monkeypatch.setattr(history_db, 'PRUNE_BATCH', 4)
+    store = HistoryStore(path, flush_interval=0.01)
+    fill(store, 'a', [str(i) for i in range(25)])
+    store.close()
+    store = HistoryStore(path, flush_interval=0.01, max_rows=10)  # prunes on start
+    try:
+        store.flush()
+        assert store.count() == 10 and store.stats()['pruned'] == 15
+        assert store.page('a', limit=20).entries[-1].expression == '15'
+    finally:
+        store.close()
+
+
+def test_retention_prunes_old_entries(path):
+    store = HistoryStore(path, flush_interval=0.01)
+    store.append('a', 'old', '1')
+    store._queue.put(('a', 'older', '1', time.time() - 3 * 86400))
+    fill(store, 'a', ['new'])
+    store.close()
+    store = HistoryStore(path, flush_interval=0.01, retention_days=1)
+    try:
+        store.flush()
+        assert [entry.expression for entry in store.page('a').entries] == ['new', 'old']
+    finally:
+        store.close()
+
@@ -0,0 +1,53 @@
+"""
+Tests for the keypad's running chain (zhina_calc.incremental): it must give
+what calculate() gives for the whole typed string.
+
+Run from the repository root:  python -m pytest -q
+"""
+import pytest
+
+from zhina_calc.cache import ERROR, calculate_uncached
+from zhina_calc.engine import evaluate
+from zhina_calc.incremental import RunningChain
+
+CHAINS = [
+    ['1', '+', '2', '*', '3'],
+    ['10', '-', '4', '/', '8', '*', '3', '+', '0.5'],
+    ['0.1', '+', '0.2', '+', '0.3'],
+    ['7', '/', '3', '*', '3', '-', '7'],
+    ['-5', '*', '2', '-', '-3'],
+    ['2', '*', '3', '*', '4', '/', '5', '+', '6', '-', '7', '*', '8'],
+    ['1e20', '+', '1', '-', '1e20'],
+]
+
+
+def type_chain(keys):
+    chain = RunningChain()
+    for operand, op in zip(keys[:-1:2], keys[1::2]):
+        chain.push(operand, op)
+    return chain, keys[-1]
+
+
+@pytest.mark.parametrize('keys', CHAINS, ids=''.join)
+def test_chain_matches_eval(keys):
+    chain, last = type_chain(keys)
+    text = ''.join(keys)
+    assert chain.result(last) == eval(text) == evaluate(text)
+    assert chain.result_str(last) == calculate_uncached(text)[0]
+
+
+def test_chain_division_by_zero_matches_calculate():
+    chain, last = type_chain(['1', '/', '0', '+', '2'])
+    assert chain.result_str(last) == calculate_uncached('1/0+2')[0] == ERROR
+
+
+def test_chain_snapshot_round_trip():
+    chain, last = type_chain(['2', '+', '3', '*', '4'])
+    restored = RunningChain.from_tuple(chain.to_tuple())
+    assert restored.result(last) == chain.result(last) == 2 + 3 * 4
+
+
+def test_preview_is_none_without_a_chain():
+    assert RunningChain().preview('5') is None
+    chain, _ = type_chain(['2', '+', '3'])
+    assert chain.preview('3') == '5'
@@ -0,0 +1,51 @@
+"""
+Tests for timers and counters (zhina_calc.metrics).
+
+Run from the repository root:  python -m pytest -q
+"""
+import json
+
+from zhina_calc.metrics import Registry
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry()
+    with registry.timer('calculate'):
+        pass
+    assert registry.timer('a') is registry.timer('b')  # one shared do-nothing timer
+    registry.inc('errors')
+    snapshot = registry.snapshot()
+    assert snapshot['timers'] == [] and snapshot['counters'] == []
+
+
+def test_timers_and_counters():
+    registry = Registry(enabled=True)
+    for _ in range(3):
+        with registry.timer('handle_button', branch='digit'):
+            pass
+    registry.inc('errors')
+    registry.inc('errors', 2)
+    snapshot = registry.snapshot()
+    [timer] = snapshot['timers']
+    assert (timer['name'], timer['labels'], timer['count']) == ('handle_button', {'branch': 'digit'}, 3)
+    assert 0 <= timer['max_seconds'] <= timer['sum_seconds']
+    assert snapshot['counters'] == [{'name': 'errors', 'labels': {}, 'value': 3}]
+    json.dumps(snapshot)
+    registry.reset()
+    assert registry.snapshot()['timers'] == []
+
+
+def test_prometheus_text():
+    registry = Registry(enabled=True)
+    with registry.timer('calculate', path='a"b'):
+        pass
+    registry.inc('cache-misses')
+    collector = lambda: {'cache_size': 7}  # noqa: E731
+    registry.add_collector(collector)
+    registry.add_collector(collector)  # registered once
+    text = registry.prometheus_text()
+    assert '# TYPE zhina_calculate_seconds summary' in text
+    assert 'zhina_calculate_seconds_count{path="a\\"b"} 1' in text
+    assert '# TYPE zhina_cache_misses_total counter\nzhina_cache_misses_total 1' in text
+    assert text.count('zhina_cache_size 7') == 1
+    assert text.endswith('\n')
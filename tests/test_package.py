@@ -0,0 +1,30 @@
+"""
+Tests for the package's cheap import and lazy attributes (zhina_calc/__init__.py).
+
+Run from the repository root:  python -m pytest -q
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import zhina_calc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_load_heavy_modules():
+    code = ("import sys, zhina_calc; zhina_calc.evaluate('1+1'); "
+            "print(sorted(m for m in ('numpy', 'multiprocessing', 'sqlite3') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=ROOT).stdout
+    assert output.strip() == '[]'
+
+
+def test_lazy_attributes():
+    from zhina_calc.vector import calculate_many
+    assert zhina_calc.calculate_many is calculate_many
+    assert zhina_calc.calculate_many('x + 1', x=[1.0]).values.tolist() == [2.0]
+    with pytest.raises(AttributeError):
+        zhina_calc.no_such_name
@@ -0,0 +1,63 @@
+"""
+Tests for parallel evaluation over shared memory (zhina_calc.parallel).
+
+Run from the repository root:  python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from zhina_calc import parallel
+from zhina_calc.errors import ExpressionError
+from zhina_calc.parallel import ParallelEvaluator, evaluate_parallel
+
+
+@pytest.fixture
+def evaluator(monkeypatch):
+    # Small inputs take the worker path too, so the tests stay fast.
+    monkeypatch.setattr(parallel, 'MIN_PARALLEL_ELEMENTS', 16)
+    with ParallelEvaluator(workers=2) as evaluator:
+        yield evaluator
+
+
+def test_workers_match_numpy(evaluator):
+    x = evaluator.empty(1001)
+    x[:] = np.linspace(-1, 1, len(x))
+    result = evaluator.evaluate('x * (1 + rate) ^ 2', x=x, rate=0.5)
+    assert np.allclose(result.values, x * 2.25)
+    assert not result.errors.any()
+
+
+def test_plain_arrays_are_copied_in(evaluator):
+    x = np.arange(100.0)
+    result = evaluator.evaluate('1 / (x - 50)', {'x': x})
+    assert result.errors.tolist() == [value == 50 for value in x]
+    assert np.isnan(result.values[50]) and result.values[51] == 1.0
+
+
+def test_out_is_reused(evaluator):
+    x = evaluator.asarray(np.arange(64.0))
+    out = (evaluator.empty(64), evaluator.empty(64, np.bool_))
+    result = evaluator.evaluate('x + 1', x=x, out=out)
+    assert result.values is out[0] and result.values[-1] == 64.0
+    with pytest.raises(ValueError):
+        evaluator.evaluate('x + 1', x=x, out=(np.empty(64), np.empty(64, np.bool_)))
+
+
+def test_input_errors(evaluator):
+    with pytest.raises(ExpressionError):
+        evaluator.evaluate('x + y', x=np.arange(32.0))
+    with pytest.raises(ValueError):
+        evaluator.evaluate('x + y', x=np.arange(32.0), y=np.arange(33.0))
+
+
+def test_small_inputs_stay_on_the_calling_process():
+    with ParallelEvaluator(workers=2) as evaluator:
+        result = evaluator.evaluate('x * 2', x=np.arange(10.0))
+        assert result.values.tolist() == [2.0 * i for i in range(10)]
+        assert evaluator._executor is None
+
+
+def test_evaluate_parallel_returns_ordinary_arrays():
+    result = evaluate_parallel('x ^ 2', x=[1.0, 2.0, 3.0], workers=2)
+    assert result.values.tolist() == [1.0, 4.0, 9.0]
+    assert isinstance(result.values, np.ndarray)
@@ -0,0 +1,80 @@
+"""
+Tests for plot sampling, tile caching and downsampling (zhina_calc.plot).
+
+Run from the repository root:  python -m pytest -q
+"""
+import numpy as np
+import pytest
+
+from zhina_calc.errors import ExpressionError
+from zhina_calc.plot import PlotCache, downsample, lttb, plot, tile_layout
+
+
+def test_plot_is_downsampled_and_accurate():
+    result = plot('sin(x)', -10, 10, points=20_000, threshold=500, cache=PlotCache())
+    assert len(result.x) == 500 and result.sampled > 500
+    assert result.x[0] >= -10 and result.x[-1] <= 10
+    assert np.all(np.diff(result.x) > 0)
+    assert np.allclose(result.y, np.sin(result.x))
+    assert result.tiles_computed > 0 and result.tiles_cached == 0
+
+
+def test_pan_reuses_cached_tiles():
+    cache = PlotCache()
+    first = plot('x^2', 0, 8, points=4000, cache=cache)
+    again = plot('x^2', 0, 8, points=4000, cache=cache)
+    assert again.tiles_computed == 0 and again.tiles_cached == first.tiles_computed
+    panned = plot('x^2', 1, 9, points=4000, cache=cache)
+    assert panned.tiles_cached > 0 and panned.tiles_computed < first.tiles_computed
+
+
+def test_zoom_derives_tiles_from_the_level_next_to_it():
+    cache = PlotCache()
+    plot('x^3', 0, 16, points=8000, cache=cache)
+    zoomed_in = plot('x^3', 0, 8, points=8000, cache=cache)
+    assert zoomed_in.tiles_derived > 0 and zoomed_in.tiles_computed == 0
+    assert np.allclose(zoomed_in.y, zoomed_in.x ** 3)
+
+
+def test_rand_is_never_cached():
+    cache = PlotCache()
+    plot('rand() + x', 0, 1, points=1000, cache=cache)
+    assert cache.stats()['tiles'] == 0
+
+
+def test_gaps_stay_gaps():
+    result = plot('log(x)', -1, 1, points=4000, threshold=200, cache=PlotCache())
+    assert np.all(result.x[np.isfinite(result.y)] > 0)
+    x = np.arange(10.0)
+    y = np.array([0, 1, 2, np.nan, np.nan, 5, 6, 7, 8, 9.0])
+    out_x, out_y = downsample(x, y, 1000)
+    assert np.isnan(out_y).sum() == 1 and len(out_x) == 9
+
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(1001.0)
+    y = np.zeros(1001)
+    y[500] = 10.0
+    out_x, out_y = lttb(x, y, 50)
+    assert len(out_x) == 50 and out_x[0] == 0 and out_x[-1] == 1000
+    assert 10.0 in out_y
+    assert len(lttb(x[:10], y[:10], 50)[0]) == 10  # already under the threshold
+
+
+def test_cache_is_bounded():
+    tile = (np.zeros(100), np.zeros(100))
+    cache = PlotCache(max_bytes=3 * 1600)
+    for key in range(5):
+        cache.put(key, tile)
+    assert cache.stats()['tiles'] == 3 and cache.get(0) is None and cache.get(4) is tile
+
+
+def test_tile_layout_and_errors():
+    exponent, first, last = tile_layout(0, 8)
+    assert (exponent, first, last) == (0, 0, 8)
+    with pytest.raises(ExpressionError):
+        plot('x', 1, 1)
+    with pytest.raises(ExpressionError):
+        plot('x + y', 0, 1)
+    with pytest.raises(ExpressionError):
+        plot('x', 0, 1, points=1)
@@ -0,0 +1,100 @@
+"""
+Tests for the process-pool backend (zhina_calc.pool).
+
+These start real worker processes, so they take a few seconds.
+
+Run from the repository root:  python -m pytest -q
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+
+from zhina_calc.cache import ERROR, calculate_uncached
+from zhina_calc.engine import SHARED_COMPILE_CACHE, parse
+from zhina_calc.pool import ProcessPoolBackend, is_heavy
+from zhina_calc.sandbox import Budget
+
+
+class StallingBudget(Budget):
+    """A budget whose worker stalls for `stall` seconds before evaluating.
+
+    The stall happens outside the deadline, like a worker stuck in a C call.
+    """
+    __slots__ = ('stall',)
+
+    def __init__(self, stall, **kwargs):
+        super().__init__(**kwargs)
+        self.stall = stall
+
+    @contextmanager
+    def active(self):
+        time.sleep(self.stall)
+        with super().active():
+            yield self
+
+
+@pytest.fixture
+def backend():
+    backend = ProcessPoolBackend(max_workers=2, grace_seconds=0.2)
+    yield backend
+    backend.shutdown()
+
+
+def test_is_heavy():
+    assert is_heavy(parse('2 ** 100'))
+    assert is_heavy(parse('1 + factorial(5)'))
+    assert is_heavy(parse(f'{2**5000} + 1'))
+    assert not is_heavy(parse('12 + 7.5 * 3 - 4 / 2'))
+    assert not is_heavy(parse('+'.join(['1'] * 3000)))
+
+
+def test_should_offload_reuses_the_compile_cache(backend):
+    assert backend.should_offload('x' * 501)
+    assert backend.should_offload('2 ** 100001')
+    assert not backend.should_offload('1 + 23456')
+    # Compiled while deciding, so the inline evaluation does not parse again.
+    assert SHARED_COMPILE_CACHE.peek('1 + 23456') is not None
+    # Already compiled here, hence folded: nothing heavy is left to do.
+    SHARED_COMPILE_CACHE.get('factorial(12)')
+    assert not backend.should_offload('factorial(12)')
+
+
+def test_results_match_inline(backend):
+    for expression in ['2 ** 100001 % 1000', '1 + 1', '1/0', 'factorial(30)']:
+        assert backend.calculate_uncached(expression) == calculate_uncached(expression)
+    stats = backend.stats()
+    assert (stats['inline'], stats['offloaded']) == (2, 2)
+
+
+def test_hung_task_does_not_fail_other_tasks(backend):
+    hung = StallingBudget(3.0, max_seconds=0.1)
+    slow = StallingBudget(0.5, max_seconds=1.0)
+    with ThreadPoolExecutor(2) as threads:
+        hung_result = threads.submit(backend.calculate_uncached, '2 ** 100', hung)
+        time.sleep(0.05)
+        slow_result = threads.submit(backend.calculate_uncached, '2 ** 101', slow)
+        assert hung_result.result() == (ERROR, False)
+        assert hung_result.result()[0].error.reason == 'time'
+        assert slow_result.result() == (str(2 ** 101), True)
+    stats = backend.stats()
+    assert (stats['timeouts'], stats['crashes'], stats['recycles']) == (1, 0, 1)
+    # The next task goes to a fresh executor.
+    assert backend.calculate_uncached('2 ** 102') == (str(2 ** 102), True)
+
+
+def test_tasks_queued_behind_a_hung_task_are_retried():
+    backend = ProcessPoolBackend(max_workers=1, grace_seconds=0.2)
+    try:
+        hung = StallingBudget(3.0, max_seconds=0.1)
+        with ThreadPoolExecutor(3) as threads:
+            hung_result = threads.submit(backend.calculate_uncached, '2 ** 100', hung)
+            time.sleep(0.05)
+            queued = [threads.submit(backend.calculate_uncached, f'2 ** {n}', Budget(max_seconds=1.0))
+                      for n in (101, 102)]
+            assert hung_result.result()[0] == ERROR
+            assert [future.result() for future in queued] == [(str(2 ** 101), True), (str(2 ** 102), True)]
+        assert backend.stats()['crashes'] == 0
+    finally:
+        backend.shutdown()
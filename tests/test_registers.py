@@ -0,0 +1,66 @@
+"""
+Tests for named memory registers (zhina_calc.registers).
+
+Run from the repository root:  python -m pytest -q
+"""
+import pytest
+
+from zhina_calc.registers import DEFAULT_NAMES, MAX_REGISTERS, MemoryRegisters
+
+
+def test_memory_keys_act_on_the_active_register():
+    registers = MemoryRegisters()
+    registers.add(2.5)
+    registers.add(1.5)
+    assert registers.recall() == registers.recall('M1') == 4.0
+    registers.select('M2')
+    registers.store(7)
+    assert registers.recall() == 7.0 and registers.recall('M1') == 4.0
+    registers.clear()
+    assert registers.recall() == 0.0
+
+
+def test_named_registers():
+    registers = MemoryRegisters()
+    registers.define('rate')
+    registers.define('rate')  # already there: left as it is
+    registers.store(0.07, 'rate')
+    assert registers.names() == DEFAULT_NAMES + ('rate',)
+    assert registers.recall('rate') == 0.07
+    registers.select('rate')
+    registers.remove('rate')
+    assert registers.active == 'M1' and len(registers) == len(DEFAULT_NAMES)
+    with pytest.raises(KeyError):
+        registers.recall('rate')
+    with pytest.raises(ValueError):
+        registers.remove('M1')
+    with pytest.raises(ValueError):
+        registers.define('no spaces')
+
+
+def test_register_limit():
+    registers = MemoryRegisters()
+    for i in range(MAX_REGISTERS - len(DEFAULT_NAMES)):
+        registers.define(f'r{i}')
+    with pytest.raises(ValueError, match='At most'):
+        registers.define('one_more')
+
+
+def test_defaults_are_shared_until_a_name_is_defined():
+    first, second = MemoryRegisters(), MemoryRegisters()
+    first.define('x')
+    assert 'x' not in second.names()
+    assert second._index is MemoryRegisters()._index
+
+
+def test_tuple_round_trip():
+    registers = MemoryRegisters()
+    registers.define('rate')
+    registers.store(0.07, 'rate')
+    registers.add(3)
+    registers.select('rate')
+    data = registers.to_tuple()
+    assert data == ('rate', ('rate',), (3.0,) + (0.0,) * 8 + (0.07,))
+    assert MemoryRegisters.from_tuple(data) == registers
+    with pytest.raises(ValueError):
+        MemoryRegisters.from_tuple(('M1', (), (1.0,)))
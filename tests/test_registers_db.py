@@ -0,0 +1,69 @@
+"""
+Tests for register persistence (zhina_calc.registers_db).
+
+Run from the repository root:  python -m pytest -q
+"""
+import time
+
+import pytest
+
+from zhina_calc.registers import MemoryRegisters
+from zhina_calc.registers_db import RegisterStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RegisterStore(str(tmp_path / 'registers.sqlite3'), flush_interval=60)
+    yield store
+    store.close()
+
+
+def registers_holding(value):
+    registers = MemoryRegisters()
+    registers.store(value)
+    return registers
+
+
+def test_load_sees_pending_and_written_saves(store):
+    assert store.load('alice') is None
+    store.save('alice', registers_holding(1.0))
+    assert store.load('alice').recall() == 1.0  # still pending
+    store.flush()
+    assert store.stats()['pending'] == 0
+    assert store.load('alice').recall() == 1.0  # from the database
+
+
+def test_saves_are_coalesced(store):
+    for i in range(100):
+        store.save('alice', registers_holding(float(i)))
+    store.save('bob', registers_holding(-1.0))
+    store.flush()
+    stats = store.stats()
+    assert (stats['saves'], stats['written'], stats['batches']) == (101, 2, 1)
+    assert store.load('alice').recall() == 99.0
+
+
+def test_close_writes_pending_saves(tmp_path):
+    path = str(tmp_path / 'registers.sqlite3')
+    store = RegisterStore(path, flush_interval=60)
+    registers = registers_holding(2.5)
+    registers.define('rate')
+    store.save('alice', registers)
+    store.close()
+    reopened = RegisterStore(path)
+    try:
+        assert reopened.load('alice') == registers
+    finally:
+        reopened.close()
+
+
+def test_writer_flushes_in_the_background(tmp_path):
+    store = RegisterStore(str(tmp_path / 'registers.sqlite3'), flush_interval=0.01)
+    try:
+        store.save('alice', registers_holding(1.0))
+        deadline = time.monotonic() + 5
+        while store.stats()['written'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert store.stats()['written'] == 1
+    finally:
+        store.close()
@@ -0,0 +1,50 @@
+"""
+Tests for evaluation budgets (zhina_calc.sandbox).
+
+Run from the repository root:  python -m pytest -q
+"""
+import pytest
+
+from zhina_calc.cache import ERROR, calculate_uncached
+from zhina_calc.engine import evaluate
+from zhina_calc.errors import TooExpensive
+from zhina_calc.sandbox import Budget
+
+
+def test_exponent_budget():
+    with pytest.raises(TooExpensive) as error:
+        evaluate('2**10000001')
+    assert error.value.reason == 'exponent'
+
+
+def test_int_bits_budget():
+    budget = Budget(max_int_bits=100)
+    with pytest.raises(TooExpensive) as error:
+        evaluate('x * x', {'x': 2**80}, budget=budget)
+    assert error.value.reason == 'int_bits'
+    assert evaluate('x * x', {'x': 2**40}, budget=budget) == 2**80
+
+
+def test_division_cost_budget():
+    # Estimated at well over 0.05 s, so refused before the division starts.
+    with pytest.raises(TooExpensive) as error:
+        evaluate('(2**999999 // 3**200000 + x) % 7', {'x': 1}, budget=Budget(max_seconds=0.05))
+    assert error.value.reason == 'time'
+
+
+def test_modular_pow_cost_budget():
+    # 20000 squarings modulo a 20000-bit number take seconds, not milliseconds.
+    with pytest.raises(TooExpensive) as error:
+        evaluate('pow(3, 2**19999, 10**6000)', budget=Budget(max_seconds=0.05))
+    assert error.value.reason == 'time'
+    with pytest.raises(TooExpensive) as error:
+        evaluate('pow(3, 5, 2**200)', budget=Budget(max_int_bits=100))
+    assert error.value.reason == 'int_bits'
+    assert evaluate('pow(3, 2**2048, 2**2048+1)', budget=Budget(max_seconds=1.0)) == pow(3, 2**2048, 2**2048 + 1)
+
+
+def test_rejected_results_are_cached_unless_timed_out():
+    result, cacheable = calculate_uncached('2**10000001')
+    assert result == ERROR and result.error.reason == 'exponent' and cacheable
+    result, cacheable = calculate_uncached('(2**999999 // 3**200000 + 1) % 7', Budget(max_seconds=0.05))
+    assert result == ERROR and result.error.reason == 'time' and not cacheable
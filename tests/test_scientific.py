@@ -0,0 +1,44 @@
+"""
+Tests for the scientific builtins (zhina_calc.scientific).
+
+Run from the repository root:  python -m pytest -q
+"""
+import math
+
+import pytest
+
+from zhina_calc.engine import evaluate
+from zhina_calc.errors import ExpressionError, TooExpensive
+from zhina_calc.scientific import FACTORIAL_TABLE, FACTORIAL_TABLE_MAX, factorial, factorial_bits
+
+
+def test_factorial_table():
+    assert len(FACTORIAL_TABLE) == FACTORIAL_TABLE_MAX + 1
+    assert all(factorial(n) == math.factorial(n) for n in (0, 1, 5, 20, FACTORIAL_TABLE_MAX))
+    assert float(FACTORIAL_TABLE[-1]) < math.inf
+
+
+def test_factorial_past_the_table():
+    assert factorial(200) == math.factorial(200)
+    assert factorial_bits(200) == pytest.approx(math.factorial(200).bit_length(), abs=1)
+    with pytest.raises(TooExpensive) as error:
+        evaluate('factorial(10**7)')
+    assert error.value.reason == 'int_bits'
+    with pytest.raises(ExpressionError):
+        factorial(-1)
+
+
+def test_factorial_of_a_float_is_gamma():
+    assert factorial(0.5) == pytest.approx(math.sqrt(math.pi) / 2)
+    assert factorial(4.0) == pytest.approx(24.0)
+
+
+def test_builtins_in_expressions():
+    assert evaluate('sin(pi/2) + cos(0)') == 2.0
+    assert evaluate('tan(0)') == 0.0
+    assert evaluate('log(8, 2)') == pytest.approx(3.0)
+    assert evaluate('log(e)') == 1.0
+    assert evaluate('gamma(5)') == 24.0
+    for expression in ('log(0)', 'gamma(0)'):
+        with pytest.raises(ValueError):
+            evaluate(expression)
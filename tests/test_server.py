@@ -0,0 +1,137 @@
+"""
+Tests for the HTTP evaluation service (zhina_calc.server).
+
+Each test starts an EvalServer on a free local port and talks raw HTTP/1.1
+to it.
+
+Run from the repository root:  python -m pytest -q
+"""
+import asyncio
+import json
+import threading
+import time
+
+from zhina_calc.server import EvalServer
+
+
+class SleepyEngine:
+    """Stands in for an Engine: 'sleep' takes a while, 'boom' raises, anything else echoes."""
+
+    def __init__(self):
+        self.cache = type('Cache', (), {'budget': None})()
+        self.threads = set()
+
+    def calculate(self, expression):
+        self.threads.add(threading.current_thread().name)
+        if expression == 'sleep':
+            time.sleep(0.5)
+        if expression == 'boom':
+            raise RuntimeError("bug in the engine")
+        return expression
+
+    def stats(self):
+        return {}
+
+    def shutdown(self):
+        pass
+
+
+def serve(test, **kwargs):
+    """Runs `test(server, port)` against a started EvalServer."""
+    async def main():
+        server = EvalServer(**kwargs)
+        listener = await server.start('127.0.0.1', 0)
+        try:
+            return await test(server, listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            await server.close()
+    return asyncio.run(main())
+
+
+async def exchange(port, *requests):
+    """Sends raw requests on one connection; returns [(status, payload)] for each response."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    responses = []
+    try:
+        for request in requests:
+            writer.write(request)
+            status_line = await reader.readline()
+            if not status_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode().partition(':')
+                headers[name.lower()] = value.strip()
+            body = await reader.readexactly(int(headers['content-length']))
+            responses.append((int(status_line.split()[1]), json.loads(body)))
+    finally:
+        writer.close()
+    return responses
+
+
+def post(path, payload, extra=b''):
+    body = json.dumps(payload).encode()
+    return (f'POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n'.encode() + extra + b'\r\n' + body)
+
+
+def test_eval_and_batch():
+    async def test(server, port):
+        return await exchange(port, post('/eval', {'expression': '2^10'}),
+                              post('/eval/batch', {'expressions': ['1+1', '1/0']}),
+                              post('/eval/batch', {'expression': 'x * 2', 'variables': {'x': [1, 2, 3]}}),
+                              b'GET /stats HTTP/1.1\r\n\r\n')
+    responses = serve(test)
+    assert responses[0] == (200, {'result': '1024', 'error': None})
+    assert responses[1] == (200, {'results': ['2', 'Error'], 'errors': [None, 'division by zero']})
+    assert responses[2] == (200, {'results': [2.0, 4.0, 6.0], 'errors': [None, None, None]})
+    assert responses[3][0] == 200 and responses[3][1]['requests'] == 3
+
+
+def test_bad_requests():
+    async def test(server, port):
+        return [status for status, _ in await exchange(
+            port, b'GET /eval HTTP/1.1\r\n\r\n', b'GET /nowhere HTTP/1.1\r\n\r\n',
+            post('/eval', {'expression': ''}), b'POST /eval HTTP/1.1\r\n\r\n')]
+    assert serve(test) == [405, 404, 400, 411]
+
+
+def test_backpressure():
+    async def test(server, port):
+        return await exchange(port, post('/eval/batch', {'expressions': ['1', '2', '3']}))
+    assert serve(test, max_pending=2)[0][0] == 503
+
+
+def test_oversized_headers_are_refused():
+    async def test(server, port):
+        huge = await exchange(port, b'GET /stats HTTP/1.1\r\nX-Big: ' + b'a' * 70_000 + b'\r\n\r\n')
+        many = await exchange(port, b'GET /stats HTTP/1.1\r\n' + b'X-A: 1\r\n' * 101 + b'\r\n')
+        fine = await exchange(port, b'GET /stats HTTP/1.1\r\n' + b'X-A: 1\r\n' * 100 + b'\r\n')
+        return huge, many, fine
+    huge, many, fine = serve(test)
+    assert huge[0][0] == many[0][0] == 431
+    assert fine[0][0] == 200
+
+
+def test_internal_errors_answer_500_and_keep_serving():
+    async def test(server, port):
+        return await exchange(port, post('/eval', {'expression': 'boom'}), post('/eval', {'expression': 'ok'}))
+    responses = serve(test, engine=SleepyEngine())
+    assert responses == [(500, {'error': 'Internal server error'}), (200, {'result': 'ok', 'error': None})]
+
+
+def test_slow_batch_does_not_hold_up_the_next():
+    engine = SleepyEngine()
+
+    async def test(server, port):
+        slow = asyncio.create_task(exchange(port, post('/eval', {'expression': 'sleep'})))
+        await asyncio.sleep(0.1)
+        started = time.monotonic()
+        fast = await exchange(port, post('/eval', {'expression': 'fast'}))
+        elapsed = time.monotonic() - started
+        return fast, elapsed, await slow
+    fast, elapsed, slow = serve(test, engine=engine, eval_threads=2)
+    assert fast == [(200, {'result': 'fast', 'error': None})]
+    assert slow == [(200, {'result': 'sleep', 'error': None})]
+    assert elapsed < 0.3
+    assert len(engine.threads) == 2
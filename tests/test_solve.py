@@ -0,0 +1,56 @@
+"""
+Tests for the equation solver (zhina_calc.solve).
+
+Run from the repository root:  python -m pytest -q
+"""
+import math
+
+import pytest
+
+from zhina_calc.errors import ExpressionError
+from zhina_calc.solve import brent, solve
+
+
+def test_cubic():
+    result = solve('x^3 - 2*x = 5')
+    assert result.variable == 'x'
+    assert result.roots == pytest.approx((2.0945514815423265,), rel=1e-12)
+    assert result.brackets == 1 and result.evaluations > 0
+
+
+def test_several_roots_sorted():
+    roots = solve('sin(t)', -10, 10).roots
+    assert roots == pytest.approx([k * math.pi for k in range(-3, 4)], abs=1e-9)
+
+
+def test_grid_roots_and_double_roots():
+    assert solve('x - 1 = 0', 0, 2, samples=3).roots == (1.0,)
+    # (x-1)^2 touches zero at a grid point, so it is found without a sign change.
+    assert solve('(x - 1)^2', 0, 2, samples=3).roots == (1.0,)
+
+
+def test_poles_are_not_roots():
+    assert solve('1/x', -1, 1, samples=10).roots == ()
+    assert solve('tan(x)', 1, 2).roots == ()
+
+
+def test_explicit_variable_and_errors():
+    assert solve('2*a = 6', 0, 10, variable='a').roots == pytest.approx((3.0,))
+    with pytest.raises(ExpressionError):
+        solve('a*x = 6', variable='a')
+    with pytest.raises(ExpressionError):
+        solve('x + y = 1')
+    with pytest.raises(ExpressionError):
+        solve('2 = 3')
+    with pytest.raises(ExpressionError):
+        solve('x = 1 = 2')
+    with pytest.raises(ExpressionError):
+        solve('x', 1, 1)
+    with pytest.raises(ExpressionError):
+        solve('x', samples=1)
+
+
+def test_brent_converges():
+    root, evaluations = brent(lambda x: x * x - 2, 0.0, 2.0, -2.0, 2.0)
+    assert root == pytest.approx(math.sqrt(2), rel=1e-15)
+    assert evaluations < 20
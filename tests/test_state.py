@@ -0,0 +1,77 @@
+"""
+Tests for per-session calculator state snapshots (zhina_calc.state).
+
+Run from the repository root:  python -m pytest -q
+"""
+import marshal
+
+import pytest
+
+from zhina_calc.registers import MemoryRegisters
+from zhina_calc.state import CalculatorState
+
+
+def test_snapshot_round_trip():
+    state = CalculatorState(current_input='4', expression='2 + 3 *', memory=1.5)
+    state.chain.push('2', '+')
+    state.chain.push('3', '*')
+    state.history.append('1+1', '2')
+    state.registers.define('rate')
+    state.registers.store(0.07, 'rate')
+    restored = CalculatorState.from_bytes(state.to_bytes())
+    assert restored == state
+    assert restored.memory == 1.5 and restored.registers.recall('rate') == 0.07
+    assert restored.chain.result_str('4') == '14'
+    assert list(restored.history) == list(state.history)
+
+
+@pytest.mark.parametrize('mode, expected', [('fraction', '3/10'), ('decimal', '0.3')])
+def test_exact_modes_survive_a_snapshot(mode, expected):
+    state = CalculatorState(mode=mode)
+    state.chain.push('0.1', '+')
+    restored = CalculatorState.from_bytes(state.to_bytes())
+    assert restored.mode == mode
+    assert restored.chain.result_str('0.2') == expected
+
+
+def test_chain_error_keeps_its_message():
+    state = CalculatorState()
+    state.chain.push('1', '/')
+    state.chain.push('0', '+')
+    restored = CalculatorState.from_bytes(state.to_bytes())
+    assert str(restored.chain.result_str('1')) == str(state.chain.result_str('1'))
+
+
+def test_older_formats_still_load():
+    v1 = marshal.dumps((1, '5', '2 +', 3.0, 'standard', (2, '+', None, None, None)))
+    state = CalculatorState.from_bytes(v1)
+    assert state.memory == 3.0 and state.registers.active == 'M1'
+    assert state.chain.result_str('5') == '7' and len(state.history) == 0
+    v3 = marshal.dumps((3, '0', '', 0, 'decimal', 10, (None, None, None, None, None), (5, (('1+1', '2'),))))
+    state = CalculatorState.from_bytes(v3)
+    assert state.precision == 10 and state.history.capacity == 5
+    assert list(state.history)[0].result == '2'
+    with pytest.raises(ValueError):
+        CalculatorState.from_bytes(marshal.dumps((99,)))
+
+
+def test_set_mode_and_clear():
+    state = CalculatorState(current_input='7', memory=2)
+    state.chain.push('1', '+')
+    state.set_mode('decimal', 5)
+    assert (state.mode, state.precision, state.current_input) == ('decimal', 5, '0')
+    assert not state.chain and state.memory == 2
+    with pytest.raises(ValueError):
+        state.set_mode('hex')
+    assert state.mode == 'decimal'
+    with pytest.raises(ValueError):
+        CalculatorState(mode='hex')
+    state.chain.push('1', '+')
+    state.history.append('1+1', '2')
+    state.clear()
+    assert not state.chain and len(state.history) == 1 and state.memory == 2
+
+
+def test_instances_have_no_dict():
+    assert not hasattr(CalculatorState(), '__dict__')
+    assert isinstance(CalculatorState().registers, MemoryRegisters)
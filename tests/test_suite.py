@@ -0,0 +1,49 @@
+"""
+Tests for the benchmark suite's timing and regression check (benchmarks/suite.py).
+
+Run from the repository root:  python -m pytest -q
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+SUITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'suite.py')
+
+
+@pytest.fixture(scope='module')
+def suite():
+    spec = importlib.util.spec_from_file_location('suite', SUITE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def report(**cases):
+    return {'meta': {}, 'results': {case: {'median_us': us, 'min_us': us, 'calls': 1} for case, us in cases.items()}}
+
+
+def test_measure(suite):
+    calls = []
+    timing = suite.measure(lambda: calls.append(1), repeat=3, min_seconds=0.001)
+    assert 0 < timing['calls'] <= len(calls)  # calibration calls are not counted
+    assert 0 < timing['min_us'] <= timing['median_us']
+
+
+def test_compare_flags_slowdowns_past_the_threshold(suite):
+    baseline = report(a=10.0, b=10.0, gone=1.0)
+    current = report(a=12.0, b=13.0, new=99.0)
+    assert suite.compare(current, baseline, 0.25) == [('b', 10.0, 13.0, pytest.approx(1.3))]
+
+
+def test_main_exit_status(suite, tmp_path, monkeypatch):
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps(report(a=10.0)))
+    monkeypatch.setattr(suite, 'run_suite', lambda layers: report(a=11.0))
+    assert suite.main(['--layers', 'engine', '-o', str(tmp_path / 'out.json'), '--compare', str(baseline)]) == 0
+    assert json.loads((tmp_path / 'out.json').read_text())['results']['a']['median_us'] == 11.0
+    assert suite.main(['--layers', 'engine', '-o', str(tmp_path / 'out.json'), '--compare', str(baseline),
+                       '--threshold', '0.05']) == 1
+    with pytest.raises(SystemExit):
+        suite.main(['--layers', 'nope'])
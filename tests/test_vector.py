@@ -0,0 +1,67 @@
+"""
+Tests for vectorized batch evaluation (zhina_calc.vector).
+
+Run from the repository root:  python -m pytest -q
+"""
+import math
+
+import pytest
+
+np = pytest.importorskip('numpy')
+from zhina_calc.engine import evaluate  # noqa: E402
+from zhina_calc.errors import ExpressionError  # noqa: E402
+from zhina_calc.vector import calculate_many, compile_vectorized  # noqa: E402
+
+
+def test_docstring_example():
+    result = calculate_many('price * (1 + rate) / qty', price=[10, 20], rate=0.07, qty=[2, 0])
+    assert np.allclose(result.values, [5.35, math.nan], equal_nan=True)
+    assert result.errors.tolist() == [False, True]
+
+
+@pytest.mark.parametrize('expression', [
+    'x + 2 * x ** 2 - 1', 'x // 3 + x % 3', '-x ** 2', 'abs(x - 5) + max(x, 3, 4) - min(x, 2)',
+    'round(x / 7, 2)', 'sqrt(x) + sin(x) * cos(x)', 'log(x + 1) + log(x + 1, 2)', 'pow(x, 3, 7)',
+    'factorial(x) / gamma(x + 1)', '2 ** 3 ** 0.5 + x * pi',
+])
+def test_matches_the_engine_element_by_element(expression):
+    xs = [0, 1, 2, 5, 9.5, 10]
+    if 'pow(' in expression or 'factorial' in expression:
+        xs = [0, 1, 2, 5, 10]
+    result = calculate_many(expression, x=xs)
+    expected = [float(evaluate(expression, {'x': x})) for x in xs]
+    assert np.allclose(result.values, expected, rtol=1e-11)
+    assert not result.errors.any()
+
+
+def test_elements_python_rejects_are_flagged():
+    result = calculate_many('1 / x + sqrt(x) + log(x)', x=[-1, 0, 4])
+    assert result.errors.tolist() == [True, True, False]
+    assert math.isnan(result.values[0]) and result.values[2] == 0.25 + 2 + math.log(4)
+    assert calculate_many('x ** 0.5', x=[-4, 4]).errors.tolist() == [True, False]
+    assert calculate_many('factorial(x)', x=[171, 170, -1]).errors.tolist() == [True, False, True]
+
+
+def test_broadcasting_and_mapping_inputs():
+    result = calculate_many('a * b', {'a': [[1], [2]]}, b=[10, 20, 30])
+    assert result.values.shape == (2, 3)
+    assert calculate_many('2 + 3').values.shape == ()
+
+
+def test_errors():
+    with pytest.raises(ExpressionError, match='Missing values for y'):
+        calculate_many('x + y', x=[1])
+    with pytest.raises(ExpressionError, match='takes 1 argument'):
+        compile_vectorized('sqrt(1, 2)')
+    with pytest.raises(ExpressionError):
+        compile_vectorized('nosuch(x)')
+
+
+def test_rand_draws_per_element():
+    values = calculate_many('rand() + x * 0', x=np.zeros(100)).values
+    assert len(set(values.tolist())) == 100
+
+
+def test_long_chains():
+    result = calculate_many('+'.join(['x'] * 3000), x=[1, 2])
+    assert result.values.tolist() == [3000, 6000]
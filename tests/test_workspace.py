@@ -0,0 +1,83 @@
+"""
+Tests for dependency-tracked variables and functions (zhina_calc.workspace).
+
+Run from the repository root:  python -m pytest -q
+"""
+import pytest
+
+from zhina_calc.errors import ExpressionError
+from zhina_calc.workspace import Workspace
+
+
+@pytest.fixture
+def ws():
+    ws = Workspace()
+    ws.define('rate = 0.07')
+    ws.define('f(x) = x * (1 + rate)')
+    ws.define('total = f(100) + f(50)')
+    ws.define('other = 2 * 21')
+    return ws
+
+
+def test_only_dependents_recompute(ws):
+    assert ws.define('rate = 0.25') == ['rate', 'f', 'total']
+    assert ws.value('total') == 187.5
+    assert ws.value('other') == 42
+
+
+def test_unchanged_value_stops_propagation(ws):
+    assert ws.define('rate = 0.14 / 2') == ['rate']
+
+
+def test_cycles_are_refused(ws):
+    ws.define('a = 1')
+    ws.define('b = a * 2')
+    with pytest.raises(ExpressionError, match='Circular reference: a -> b -> a'):
+        ws.define('a = b + 1')
+    assert ws.value('b') == 2
+    with pytest.raises(ExpressionError, match='Circular'):
+        ws.define('g(x) = g(x - 1)')
+
+
+def test_names_may_be_used_before_they_are_defined():
+    ws = Workspace()
+    ws.define('y = x + 1')
+    with pytest.raises(ExpressionError):
+        ws.value('y')
+    ws.define('x = 1')
+    assert ws.value('y') == 2
+    ws.remove('x')
+    with pytest.raises(ExpressionError):
+        ws.value('y')
+
+
+def test_function_becoming_a_variable_relinks_callers(ws):
+    ws.define('g = 3')
+    ws.define('h = g + 1')
+    ws.define('g(x) = x * 2')
+    with pytest.raises(ExpressionError):
+        ws.value('h')  # g is no longer a variable
+    ws.define('k = g(5)')
+    assert ws.value('k') == 10
+    ws.define('g = 4')
+    with pytest.raises(ExpressionError, match='Unknown function'):
+        ws.value('k')
+    assert ws.value('h') == 5
+
+
+def test_changed_parameters_relink_callers(ws):
+    ws.define('g(x) = 1')
+    ws.define('k = g(5)')
+    assert ws.value('k') == 1
+    ws.define('g(x, y) = 1')
+    with pytest.raises(ExpressionError, match='takes 2 argument'):
+        ws.value('k')
+    ws.define('g(x) = 1')
+    assert ws.value('k') == 1
+
+
+def test_long_chains_inline():
+    ws = Workspace()
+    ws.define('f(x) = ' + '+'.join(['x'] * 3000))
+    ws.define('y = f(2)')
+    assert ws.value('y') == 6000
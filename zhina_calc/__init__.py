@@ -0,0 +1,51 @@
+"""Calculation engine behind the Zhina Scientific Calculator.
+
+Importing the package stays cheap: modules with heavy dependencies (NumPy for
+calculate_many, multiprocessing for the process pool and evaluate_parallel)
+load on first use.
+"""
+from zhina_calc.engine import (
+    CompileCache,
+    CompiledExpression,
+    ExpressionError,
+    SHARED_COMPILE_CACHE,
+    compile_cached,
+    compile_expression,
+    evaluate,
+    parse,
+    tokenize,
+)
+from zhina_calc.errors import TooExpensive
+from zhina_calc.sandbox import DEFAULT_BUDGET, Budget
+
+__all__ = [
+    'Budget',
+    'CompileCache',
+    'CompiledExpression',
+    'DEFAULT_BUDGET',
+    'ExpressionError',
+    'SHARED_COMPILE_CACHE',
+    'TooExpensive',
+    'compile_cached',
+    'compile_expression',
+    'evaluate',
+    'parse',
+    'tokenize',
+]
+
+# Loaded on first attribute access (PEP 562) so `import zhina_calc` never pulls in NumPy.
+_LAZY = {
+    'BatchResult': 'zhina_calc.vector',
+    'ParallelEvaluator': 'zhina_calc.parallel',
+    'calculate_many': 'zhina_calc.vector',
+    'compile_vectorized': 'zhina_calc.vector',
+    'evaluate_parallel': 'zhina_calc.parallel',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module 'zhina_calc' has no attribute {name!r}")
+    import importlib
+    return getattr(importlib.import_module(module), name)
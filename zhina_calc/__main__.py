@@ -0,0 +1,5 @@
+import sys
+
+from zhina_calc.cli import main
+
+sys.exit(main())
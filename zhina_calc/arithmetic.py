@@ -0,0 +1,166 @@
+"""
+Number modes for the keypad's + - * / chains.
+
+    standard  Python floats and ints, as calculate() has always used
+    fraction  exact rationals (fractions.Fraction): 0.1+0.2 is 3/10
+    decimal   decimal.Decimal at a user-set precision: 0.1+0.2 is 0.3
+
+Exact arithmetic has costs that floats do not. Every Fraction operation
+reduces by a gcd, and a chain of divisions by different numbers keeps
+growing the denominator, so each key press gets slower than the last.
+FractionArithmetic therefore estimates the size of every result before
+computing it and raises TooExpensive once numerator or denominator would
+pass `max_bits`. Decimal work is bounded by its precision, which is capped
+at MAX_DECIMAL_PRECISION digits, and by the exponent range of its context.
+
+Each class turns display text into a number (parse), applies one operator
+(apply) and renders a result for the display (format). Instances hold no
+per-session state and are shared through arithmetic_for().
+"""
+import decimal
+import functools
+from fractions import Fraction
+
+from zhina_calc import sandbox
+from zhina_calc.engine import Num, compile_cached
+from zhina_calc.errors import ExpressionError, TooExpensive
+from zhina_calc.formatting import format_result
+
+MODES = ('standard', 'fraction', 'decimal')
+
+DEFAULT_DECIMAL_PRECISION = 28
+MAX_DECIMAL_PRECISION = 1000
+DEFAULT_FRACTION_BITS = 4096
+
+
+def parse_operand(text):
+    """Reads a display value such as '12', '0.', '-5.0' or '1e+20'."""
+    tree = compile_cached(text).tree
+    if type(tree) is not Num:
+        raise ExpressionError(f"Not a number: {text!r}")
+    return tree.value
+
+
+class FloatArithmetic:
+    mode = 'standard'
+
+    _APPLY = {
+        '+': lambda a, b: a + b,
+        '-': lambda a, b: a - b,
+        '*': sandbox.checked_mul,
+        '/': lambda a, b: a / b,
+    }
+
+    def parse(self, text):
+        return parse_operand(text)
+
+    def apply(self, op, a, b):
+        return self._APPLY[op](a, b)
+
+    def format(self, value):
+        return format_result(value)
+
+    # Snapshot form (see RunningChain.to_tuple): ints and floats marshal as they are.
+    def encode(self, value):
+        return value
+
+    def decode(self, data):
+        return data
+
+
+class FractionArithmetic:
+    mode = 'fraction'
+
+    def __init__(self, max_bits=DEFAULT_FRACTION_BITS):
+        self.max_bits = max_bits
+
+    def _check(self, bits):
+        if bits > self.max_bits:
+            raise TooExpensive('int_bits', self.max_bits, bits)
+
+    @staticmethod
+    def _bits(value):
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+
+    def parse(self, text):
+        try:
+            value = Fraction(text)
+        except ValueError:
+            raise ExpressionError(f"Not a number: {text!r}") from None
+        self._check(self._bits(value))
+        return value
+
+    def apply(self, op, a, b):
+        sandbox.check_deadline()
+        # a/b (op) c/d never needs more than bits(a/b) + bits(c/d) + 1 bits.
+        self._check(self._bits(a) + self._bits(b) + 1)
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        return a / b
+
+    def format(self, value):
+        # '3/10', or '2' when the denominator is 1
+        return str(value)
+
+    def encode(self, value):
+        return str(value)
+
+    def decode(self, data):
+        return Fraction(data)
+
+
+class DecimalArithmetic:
+    mode = 'decimal'
+
+    def __init__(self, precision=DEFAULT_DECIMAL_PRECISION):
+        if not 1 <= precision <= MAX_DECIMAL_PRECISION:
+            raise ValueError(f"precision must be between 1 and {MAX_DECIMAL_PRECISION}")
+        self.precision = precision
+        # A private context: the thread's decimal.getcontext() is never touched.
+        self.context = decimal.Context(
+            prec=precision, Emax=999_999, Emin=-999_999,
+            traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow],
+        )
+        self._apply = {
+            '+': self.context.add,
+            '-': self.context.subtract,
+            '*': self.context.multiply,
+            '/': self.context.divide,
+        }
+
+    def parse(self, text):
+        try:
+            return self.context.create_decimal(text.strip())
+        except decimal.InvalidOperation:
+            raise ExpressionError(f"Not a number: {text!r}") from None
+
+    def apply(self, op, a, b):
+        return self._apply[op](a, b)
+
+    def format(self, value):
+        return str(value)
+
+    def encode(self, value):
+        return str(value)
+
+    def decode(self, data):
+        return decimal.Decimal(data)
+
+
+FLOAT = FloatArithmetic()
+
+
+@functools.lru_cache(maxsize=None)
+def arithmetic_for(mode='standard', precision=DEFAULT_DECIMAL_PRECISION):
+    """The shared arithmetic for a CalculatorState mode (precision is for 'decimal')."""
+    if mode == 'standard':
+        return FLOAT
+    if mode == 'fraction':
+        return FractionArithmetic()
+    if mode == 'decimal':
+        return DecimalArithmetic(precision)
+    raise ValueError(f"Unknown mode {mode!r}")
@@ -0,0 +1,149 @@
+"""
+Bounded LRU cache of calculate() results.
+
+Users type the same expressions again and again, so the final display string
+is kept per normalized expression. The cache is safe to share between
+Streamlit sessions: only deterministic results are stored, and the stored
+value is exactly the string calculate() would return, including "Error"
+(an ErrorResult, which also carries the exception behind it).
+"""
+import threading
+from collections import OrderedDict
+
+from zhina_calc import sandbox
+from zhina_calc.engine import compile_cached
+from zhina_calc.errors import TooExpensive
+from zhina_calc.formatting import format_result
+
+ERROR = "Error"
+
+
+class ErrorResult(str):
+    """The "Error" string, carrying the exception that produced it as `.error`.
+
+    The exception is kept without its traceback and chained exceptions: their
+    frames would keep the operands alive (two million-bit ints for a refused
+    product) for as long as the result stays cached.
+    """
+
+    def __new__(cls, error):
+        result = super().__new__(cls, ERROR)
+        error.__traceback__ = error.__context__ = error.__cause__ = None
+        result.error = error
+        return result
+
+    def __reduce__(self):
+        return (ErrorResult, (self.error,))
+
+
+def normalize(expression):
+    """Canonical cache key: '^' spelled as '**', surrounding whitespace dropped."""
+    return expression.replace('^', '**').strip()
+
+
+def calculate_uncached(expression, budget=None):
+    """Evaluates an expression to its display string without touching any cache.
+
+    Returns (result_str, cacheable). Expressions calling a non-deterministic
+    function are not cacheable, and neither are wall-clock timeouts, which
+    depend on server load rather than on the expression.
+    """
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        try:
+            compiled = compile_cached(expression)
+        except Exception as e:
+            return ErrorResult(e), True
+        try:
+            return format_result(compiled.evaluate()), compiled.deterministic
+        except TooExpensive as e:
+            return ErrorResult(e), compiled.deterministic and e.reason != 'time'
+        except Exception as e:
+            return ErrorResult(e), compiled.deterministic
+
+
+class ResultCache:
+    """Thread-safe LRU map from normalized expression to result string."""
+
+    def __init__(self, maxsize=1024, budget=None):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self.budget = budget
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Returns the cached string for `key` (refreshing its recency) or None."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def calculate(self, expression, evaluator=calculate_uncached):
+        """calculate() with the cache in front of the engine.
+
+        `evaluator` computes misses; it takes (expression, budget) and returns
+        (result_str, cacheable) like calculate_uncached(), e.g. the method of
+        the same name on a zhina_calc.pool.ProcessPoolBackend.
+        """
+        key = normalize(expression)
+        result = self.get(key)
+        if result is not None:
+            return result
+        result, cacheable = evaluator(key, self.budget)
+        if cacheable:
+            self.put(key, result)
+        else:
+            with self._lock:
+                self.skipped += 1
+        return result
+
+    def resize(self, maxsize):
+        """Changes the size limit, evicting the oldest entries if needed."""
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Counters as a dict; hit_rate is hits / lookups (0.0 before any lookup)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'skipped': self.skipped,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
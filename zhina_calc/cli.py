@@ -0,0 +1,134 @@
+"""
+Headless batch mode: evaluate an expression file without the Streamlit UI.
+
+    python -m zhina_calc expressions.txt -o results.txt --jobs 8
+
+Input is read line by line (stdin by default) and every line produces one
+output line, written as soon as its chunk is done, with the same strings
+calculate() shows in the app ("Error" included). Blank lines stay blank.
+Memory use is bounded by chunk_size * jobs * 2 lines whatever the input size.
+With --jobs > 1, chunks are evaluated in a process pool and written back in
+input order. A throughput summary goes to stderr at the end.
+
+With --csv, the input is a CSV file instead and one expression over its
+columns is evaluated for every row (see zhina_calc.columns):
+
+    python -m zhina_calc orders.csv --csv 'price*qty*(1-discount)' -o out.csv
+"""
+import argparse
+import itertools
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from zhina_calc.cache import ResultCache
+from zhina_calc.sandbox import Budget
+
+# One cache per process (the parent when running inline, each worker otherwise).
+_cache = None
+
+
+def _init_worker(budget):
+    global _cache
+    _cache = ResultCache(maxsize=4096, budget=budget)
+
+
+def evaluate_chunk(lines, budget=None):
+    """Evaluates a list of input lines to a list of output lines.
+
+    Without `budget`, the process's existing cache (and its budget) is used;
+    pool workers get theirs from _init_worker, once, rather than from every
+    task, where the budget would arrive as a fresh unpickled copy.
+    """
+    global _cache
+    if _cache is None or (budget is not None and _cache.budget is not budget):
+        _cache = ResultCache(maxsize=4096, budget=budget)
+    calculate = _cache.calculate
+    return [calculate(line) if line.strip() else '' for line in lines]
+
+
+def _chunks(stream, chunk_size):
+    lines = (line.rstrip('\r\n') for line in stream)
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run(stream, out, jobs=1, chunk_size=1000, budget=None):
+    """Streams `stream` through the engine into `out`; returns the line count."""
+    count = 0
+    if jobs <= 1:
+        for chunk in _chunks(stream, chunk_size):
+            out.write('\n'.join(evaluate_chunk(chunk, budget)) + '\n')
+            count += len(chunk)
+        return count
+
+    # Keep a bounded window of chunks in flight and always write the oldest
+    # first, so output order matches input order.
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(budget,)) as executor:
+        pending = deque()
+        for chunk in _chunks(stream, chunk_size):
+            pending.append(executor.submit(evaluate_chunk, chunk))
+            if len(pending) >= jobs * 2:
+                results = pending.popleft().result()
+                out.write('\n'.join(results) + '\n')
+                count += len(results)
+        while pending:
+            results = pending.popleft().result()
+            out.write('\n'.join(results) + '\n')
+            count += len(results)
+    return count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m zhina_calc',
+        description="Evaluate one calculator expression per line.",
+    )
+    parser.add_argument('input', nargs='?', default='-', help="input file ('-' or omitted for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="output file ('-' for stdout)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="worker processes (default: 1, inline)")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="lines per work unit (default: 1000, or 100000 with --csv)")
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help="wall-clock budget per expression (default: 1.0)")
+    parser.add_argument('--csv', metavar='EXPRESSION',
+                        help="treat the input as CSV and append EXPRESSION over its columns to every row")
+    parser.add_argument('--column', default='result', help="header of the --csv result column (default: result)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not print the throughput summary")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.jobs < 1 or (args.chunk_size is not None and args.chunk_size < 1):
+        build_parser().error("--jobs and --chunk-size must be at least 1")
+    budget = Budget(max_seconds=args.max_seconds)
+
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    try:
+        if args.csv is not None:
+            from zhina_calc.columns import DEFAULT_CHUNK_ROWS, evaluate_csv  # loads NumPy
+            count = evaluate_csv(stream, out, args.csv, column=args.column,
+                                 chunk_rows=args.chunk_size or DEFAULT_CHUNK_ROWS, budget=budget).rows
+        else:
+            count = run(stream, out, jobs=args.jobs, chunk_size=args.chunk_size or 1000, budget=budget)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+        else:
+            out.flush()
+    elapsed = time.perf_counter() - start
+
+    if not args.quiet:
+        rate = count / elapsed if elapsed > 0 else 0.0
+        what, per = ('rows', 'rows/s') if args.csv is not None else ('expressions', 'expr/s')
+        print(f"{count} {what} in {elapsed:.2f}s ({rate:,.0f} {per})", file=sys.stderr)
+    return 0
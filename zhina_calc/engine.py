@@ -0,0 +1,556 @@
+"""
+Expression engine used by calculate() in place of eval().
+
+An expression is tokenized, parsed with a small Pratt parser into an AST and
+compiled once into a CompiledExpression. Only the operators and names listed
+in this module are understood, so input can never reach Python itself, and a
+compiled expression can be evaluated again without being parsed again.
+
+Operator precedence and number semantics follow Python (the same rules eval()
+used), with '^' accepted as an alias for '**'.
+"""
+import math
+import operator
+import random
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+from zhina_calc import sandbox, scientific
+from zhina_calc.errors import ExpressionError
+
+
+# --- 1. Whitelists ---
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': sandbox.checked_mul,
+    '/': operator.truediv,
+    '//': sandbox.checked_floordiv,
+    '%': sandbox.checked_mod,
+    '**': sandbox.checked_pow,
+}
+
+UNARY_OPERATORS = {
+    '-': operator.neg,
+    '+': operator.pos,
+}
+
+FUNCTIONS = {
+    'abs': abs,
+    'round': sandbox.checked_round,
+    'min': min,
+    'max': max,
+    'pow': sandbox.checked_pow,
+    'sqrt': math.sqrt,
+    'sin': scientific.sin,
+    'cos': scientific.cos,
+    'tan': scientific.tan,
+    'log': scientific.log,
+    'factorial': scientific.factorial,
+    'gamma': scientific.gamma,
+    'rand': random.random,
+}
+
+# Functions whose result changes from call to call. They are never folded at
+# compile time, and expressions using them are not result-cached.
+NONDETERMINISTIC_FUNCTIONS = frozenset({'rand'})
+
+CONSTANTS = {
+    'pi': math.pi,
+    'e': math.e,
+}
+
+
+# --- 2. Tokenizer ---
+
+# One alternative per token kind; the last group catches anything else so a
+# single findall() pass both splits and validates the input.
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        ((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)   # number
+      | ([A-Za-z_]\w*)                             # name
+      | (\*\*|//|[-+*/%^(),])                       # operator
+      | (\S)                                       # anything else
+    )""", re.VERBOSE)
+
+_END = ('end', None)
+
+
+def _number(text):
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    # Python rejects "07" but accepts "00"; keep the same rule.
+    if text[0] == '0' and len(text) > 1 and text.strip('0'):
+        raise ExpressionError(f"Leading zeros are not allowed in {text!r}")
+    return int(text)
+
+
+def tokenize(text, number=None):
+    """Splits an expression into (kind, value) pairs, ending with ('end', None).
+
+    `number`, if given, converts the text of each numeric literal instead of
+    int()/float(), once the literal has passed the usual checks.
+    """
+    tokens = []
+    append = tokens.append
+    for num, name, op, other in _TOKEN_RE.findall(text):
+        if num:
+            value = _number(num)
+            append(('num', value if number is None else number(num)))
+        elif op:
+            append(('op', '**' if op == '^' else op))
+        elif name:
+            append(('name', name))
+        else:
+            raise ExpressionError(f"Unexpected character {other!r}")
+    append(_END)
+    return tokens
+
+
+# --- 3. Parser ---
+
+Num = namedtuple('Num', 'value')
+Name = namedtuple('Name', 'id')
+Unary = namedtuple('Unary', 'op operand')
+BinOp = namedtuple('BinOp', 'op left right')
+Call = namedtuple('Call', 'func args')
+
+# Left binding powers. '**' is right-associative and binds tighter than a
+# unary sign on its left (-2**2 == -4), as in Python.
+_BINDING = {
+    '+': 10, '-': 10,
+    '*': 20, '/': 20, '//': 20, '%': 20,
+    '**': 40,
+}
+_UNARY_BINDING = 30
+_OPEN = ('op', '(')
+_CLOSE = ('op', ')')
+_COMMA = ('op', ',')
+
+
+class _Parser:
+    __slots__ = ('tokens', 'index', 'any_function')
+
+    def __init__(self, tokens, any_function=False):
+        self.tokens = tokens
+        self.index = 0
+        self.any_function = any_function
+
+    def expect(self, token):
+        found = self.tokens[self.index]
+        if found != token:
+            raise ExpressionError(f"Expected {token[1]!r}, found {found[1]!r}")
+        self.index += 1
+
+    def parse(self):
+        node = self.expression(0)
+        token = self.tokens[self.index]
+        if token is not _END:
+            raise ExpressionError(f"Unexpected {token[1]!r}")
+        return node
+
+    def expression(self, min_binding):
+        tokens = self.tokens
+        kind, value = tokens[self.index]
+        if kind == 'num':
+            # Fast path for the common case of a plain number operand.
+            self.index += 1
+            left = Num(value)
+        else:
+            left = self.prefix()
+        while True:
+            kind, value = tokens[self.index]
+            if kind != 'op':
+                break
+            binding = _BINDING.get(value)
+            if binding is None or binding <= min_binding:
+                break
+            self.index += 1
+            # Right-associative operators parse their right side one level lower.
+            right = self.expression(binding - 1 if value == '**' else binding)
+            left = BinOp(value, left, right)
+        return left
+
+    def prefix(self):
+        kind, value = self.tokens[self.index]
+        self.index += 1
+        if kind == 'num':
+            return Num(value)
+        if kind == 'name':
+            if self.tokens[self.index] == _OPEN:
+                return self.call(value)
+            return Name(value)
+        if kind == 'op':
+            if value in UNARY_OPERATORS:
+                return Unary(value, self.expression(_UNARY_BINDING))
+            if value == '(':
+                node = self.expression(0)
+                self.expect(_CLOSE)
+                return node
+        if kind == 'end':
+            raise ExpressionError("Unexpected end of expression")
+        raise ExpressionError(f"Unexpected {value!r}")
+
+    def call(self, func):
+        if func not in FUNCTIONS and not self.any_function:
+            raise ExpressionError(f"Unknown function {func!r}")
+        self.expect(_OPEN)
+        args = []
+        if self.tokens[self.index] != _CLOSE:
+            args.append(self.expression(0))
+            while self.tokens[self.index] == _COMMA:
+                self.index += 1
+                args.append(self.expression(0))
+        self.expect(_CLOSE)
+        return Call(func, tuple(args))
+
+
+def parse(text, any_function=False, number=None):
+    """Parses an expression string into an AST of Num/Name/Unary/BinOp/Call nodes.
+
+    Calls to names outside FUNCTIONS are rejected unless `any_function` is set
+    (user-defined functions, see zhina_calc.workspace); such trees cannot be
+    compiled as they are. `number` is passed on to tokenize().
+    """
+    return _Parser(tokenize(text, number), any_function).parse()
+
+
+# --- 4. Compiler ---
+
+_FOLD_ERRORS = (ArithmeticError, ValueError, TypeError)
+
+
+def left_chain(node):
+    """Splits a BinOp's left spine into its first operand and (op, right) steps.
+
+    1 + 2 - x * 3 parses as ((1 + 2) - (x * 3)); this returns
+    (Num(1), [('+', Num(2)), ('-', BinOp('*', ...))]). Applying the steps in
+    order gives the same result as the tree, and walking them in a loop keeps
+    long chains such as 1+1+...+1 from recursing once per operand.
+    """
+    steps = []
+    while type(node) is BinOp:
+        steps.append((node.op, node.right))
+        node = node.left
+    steps.reverse()
+    return node, steps
+
+
+def _fold_binop(op, left, right):
+    if type(left) is Num and type(right) is Num:
+        try:
+            return Num(BINARY_OPERATORS[op](left.value, right.value))
+        except _FOLD_ERRORS:
+            # Leave it for evaluate() so the error surfaces at run time.
+            pass
+    return BinOp(op, left, right)
+
+
+def fold_constants(node):
+    """Evaluates every sub-tree that does not depend on a variable."""
+    kind = type(node)
+    if kind is Name:
+        if node.id in CONSTANTS:
+            return Num(CONSTANTS[node.id])
+        return node
+    if kind is Unary:
+        operand = fold_constants(node.operand)
+        if type(operand) is Num:
+            return Num(UNARY_OPERATORS[node.op](operand.value))
+        return Unary(node.op, operand)
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        left = fold_constants(first)
+        for op, right in steps:
+            left = _fold_binop(op, left, fold_constants(right))
+        return left
+    if kind is Call:
+        args = tuple(fold_constants(arg) for arg in node.args)
+        if node.func not in NONDETERMINISTIC_FUNCTIONS and all(type(arg) is Num for arg in args):
+            try:
+                return Num(FUNCTIONS[node.func](*(arg.value for arg in args)))
+            except _FOLD_ERRORS:
+                pass
+        return Call(node.func, args)
+    return node
+
+
+def free_variables(node):
+    """Returns the set of names an AST reads from the caller's variables."""
+    kind = type(node)
+    if kind is Name:
+        return {node.id} if node.id not in CONSTANTS else set()
+    if kind is Unary:
+        return free_variables(node.operand)
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        names = free_variables(first)
+        for _, right in steps:
+            names |= free_variables(right)
+        return names
+    if kind is Call:
+        names = set()
+        for arg in node.args:
+            names |= free_variables(arg)
+        return names
+    return set()
+
+
+def functions_used(node):
+    """Returns the set of function names called anywhere in an AST."""
+    kind = type(node)
+    if kind is Unary:
+        return functions_used(node.operand)
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        names = functions_used(first)
+        for _, right in steps:
+            names |= functions_used(right)
+        return names
+    if kind is Call:
+        names = {node.func}
+        for arg in node.args:
+            names |= functions_used(arg)
+        return names
+    return set()
+
+
+def _lookup(name):
+    def run(env):
+        try:
+            return env[name]
+        except (KeyError, TypeError):
+            raise ExpressionError(f"Unknown name {name!r}") from None
+    return run
+
+
+# Chains with more steps than this run in a loop rather than as nested
+# closures, which would recurse once per operand when evaluated.
+_MAX_NESTED_STEPS = 64
+
+
+def _build_binop(op, left, right):
+    if type(right) is Num:
+        constant = right.value
+        return lambda env: op(left(env), constant)
+    right = _build(right)
+    return lambda env: op(left(env), right(env))
+
+
+def _build_chain(first, steps):
+    steps = tuple((BINARY_OPERATORS[op], _build(right)) for op, right in steps)
+
+    def run(env):
+        value = first(env)
+        for op, right in steps:
+            value = op(value, right(env))
+        return value
+    return run
+
+
+def _build(node):
+    """Turns an AST into a tree of closures taking the variable mapping."""
+    kind = type(node)
+    if kind is Num:
+        value = node.value
+        return lambda env: value
+    if kind is Name:
+        return _lookup(node.id)
+    if kind is Unary:
+        op = UNARY_OPERATORS[node.op]
+        operand = _build(node.operand)
+        return lambda env: op(operand(env))
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        run = _build(first)
+        if len(steps) > _MAX_NESTED_STEPS:
+            return _build_chain(run, steps)
+        for op, right in steps:
+            run = _build_binop(BINARY_OPERATORS[op], run, right)
+        return run
+    if kind is Call:
+        func = FUNCTIONS[node.func]
+        args = tuple(_build(arg) for arg in node.args)
+        return lambda env: func(*[arg(env) for arg in args])
+    raise ExpressionError(f"Cannot compile node {node!r}")
+
+
+class CompiledExpression:
+    """A parsed expression that can be evaluated any number of times."""
+    __slots__ = ('source', 'tree', 'variables', 'deterministic', '_run')
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = fold_constants(tree)
+        self.variables = frozenset(free_variables(self.tree))
+        self.deterministic = NONDETERMINISTIC_FUNCTIONS.isdisjoint(functions_used(self.tree))
+        self._run = _build(self.tree)
+
+    @property
+    def is_constant(self):
+        return type(self.tree) is Num
+
+    def evaluate(self, variables=None):
+        """Runs the expression, reading free names from the `variables` mapping."""
+        return self._run(variables)
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+def compile_expression(text):
+    """Parses and compiles `text` without consulting the compile cache."""
+    return CompiledExpression(text, parse(text))
+
+
+def constant_bits(node):
+    """Total bit length of the integer literals in an AST (what folding may have made huge)."""
+    kind = type(node)
+    if kind is Num:
+        return node.value.bit_length() if type(node.value) is int else 0
+    if kind is Unary:
+        return constant_bits(node.operand)
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        return constant_bits(first) + sum(constant_bits(right) for _, right in steps)
+    if kind is Call:
+        return sum(constant_bits(arg) for arg in node.args)
+    return 0
+
+
+class _Shard:
+    __slots__ = ('lock', 'data', 'maxsize', 'hits', 'misses', 'evictions', 'skipped')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.maxsize = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def trim(self):
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+
+class CompileCache:
+    """Thread-safe bounded LRU of CompiledExpressions, keyed by source text.
+
+    Entries are spread over `shards` independent LRU maps, each behind its own
+    lock, so concurrent reruns rarely touch the same lock. A hit never blocks:
+    its LRU bump is skipped (and not counted in `hits`) if the shard is busy,
+    which makes eviction order approximate under contention. Misses are
+    compiled outside any lock. Sources longer than `max_source_len` are
+    compiled but not kept, and neither are expressions whose folded constants
+    hold more than `max_constant_bits` bits in all ('2**999999+1' folds to a
+    125 KB integer from a 10-character source). With `maxsize` these bound
+    the memory held at about maxsize * (max_source_len + max_constant_bits / 8)
+    bytes plus the trees. Only compiled code is stored, never results or
+    per-session data, so one instance is shared by the whole process.
+    """
+
+    def __init__(self, maxsize=4096, shards=16, max_source_len=10_000, max_constant_bits=4096):
+        if shards < 1:
+            raise ValueError("shards must be >= 1")
+        self.max_source_len = max_source_len
+        self.max_constant_bits = max_constant_bits
+        self._shards = tuple(_Shard() for _ in range(shards))
+        self.resize(maxsize)
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self._shards)
+
+    def peek(self, text):
+        """The cached CompiledExpression for `text`, or None; never compiles or counts."""
+        return self._shards[hash(text) % len(self._shards)].data.get(text)
+
+    def get(self, text, tree=None):
+        """The CompiledExpression for `text`, compiling it on a miss.
+
+        `tree` is text's AST if the caller has already parsed it; a miss then
+        compiles that instead of parsing the text again.
+        """
+        shard = self._shards[hash(text) % len(self._shards)]
+        # Hits read without waiting: a single dict lookup is atomic, and the
+        # recency bump is skipped when another thread holds the shard lock.
+        compiled = shard.data.get(text)
+        if compiled is not None:
+            if shard.lock.acquire(blocking=False):
+                try:
+                    shard.data.move_to_end(text)
+                    shard.hits += 1
+                except KeyError:
+                    pass  # evicted since the lookup above
+                finally:
+                    shard.lock.release()
+            return compiled
+        with shard.lock:
+            shard.misses += 1
+        compiled = compile_expression(text) if tree is None else CompiledExpression(text, tree)
+        if shard.maxsize and len(text) <= self.max_source_len:
+            if constant_bits(compiled.tree) > self.max_constant_bits:
+                with shard.lock:
+                    shard.skipped += 1
+                return compiled
+            with shard.lock:
+                # Another thread may have stored the same text meanwhile; either copy will do.
+                shard.data[text] = compiled
+                shard.trim()
+        return compiled
+
+    def resize(self, maxsize):
+        """Changes the total size limit, evicting the oldest entries if needed."""
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        per_shard, extra = divmod(maxsize, len(self._shards))
+        for i, shard in enumerate(self._shards):
+            with shard.lock:
+                shard.maxsize = per_shard + (i < extra)
+                shard.trim()
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.data.clear()
+
+    def stats(self):
+        """Counters summed over all shards; hit_rate is hits / lookups."""
+        totals = {'size': 0, 'hits': 0, 'misses': 0, 'evictions': 0, 'skipped': 0}
+        for shard in self._shards:
+            with shard.lock:
+                totals['size'] += len(shard.data)
+                totals['hits'] += shard.hits
+                totals['misses'] += shard.misses
+                totals['evictions'] += shard.evictions
+                totals['skipped'] += shard.skipped
+        lookups = totals['hits'] + totals['misses']
+        totals['maxsize'] = self.maxsize
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        return totals
+
+
+# Process-wide: every session (and every thread) reuses the same compiled code.
+SHARED_COMPILE_CACHE = CompileCache()
+
+
+def compile_cached(text):
+    """Like compile_expression(), but reuses the result from SHARED_COMPILE_CACHE."""
+    return SHARED_COMPILE_CACHE.get(text)
+
+
+def evaluate(text, variables=None, budget=None):
+    """Compiles (or reuses) `text` and returns its value.
+
+    Compilation and evaluation run under `budget` (sandbox.DEFAULT_BUDGET by
+    default) and raise TooExpensive when it is exceeded.
+    """
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        return compile_cached(text).evaluate(variables)
@@ -0,0 +1,36 @@
+"""Exceptions raised by the zhina_calc engine."""
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression cannot be tokenized, parsed or evaluated."""
+
+
+class TooExpensive(ExpressionError):
+    """Raised when an evaluation would exceed, or has exceeded, its Budget.
+
+    `reason` is one of 'time', 'int_bits' or 'exponent'; `limit` is the budget
+    value that was hit and `estimate` what the evaluation would have needed
+    (None when the wall clock ran out).
+    """
+
+    def __init__(self, reason, limit, estimate=None):
+        self.reason = reason
+        self.limit = limit
+        self.estimate = estimate
+        if estimate is None:
+            message = f"Too expensive: {reason} budget of {limit} exhausted"
+        else:
+            message = f"Too expensive: needs {reason} ~{estimate:.4g}, limit is {limit}"
+        super().__init__(message)
+
+    def __reduce__(self):
+        # Keeps the structured fields when sent back from a worker process.
+        return (TooExpensive, (self.reason, self.limit, self.estimate))
+
+    def as_dict(self):
+        return {
+            'error': 'too_expensive',
+            'reason': self.reason,
+            'limit': self.limit,
+            'estimate': self.estimate,
+        }
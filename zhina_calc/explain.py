@@ -0,0 +1,284 @@
+"""
+Step-by-step solutions, worked out from the expression's AST.
+
+explain() parses an expression with the engine and returns the steps a
+student would write down:
+
+    >>> for step in explain('2 + 3 * 4 ^ 2'):
+    ...     print(step.text)
+    Read as: 2 + (3 * (4 ** 2))
+    Raise to a power: 4 ** 2 = 16
+    Multiply: 3 * 16 = 48
+    Add: 2 + 48 = 50
+    Result: 50
+
+Operations are reduced innermost first and left to right, the order Python
+(and calculate()) evaluates them in. Constants are replaced by their values,
+and identities such as x * 1 or x + 0 are simplified around names that have
+no value. rand() is left as it is.
+
+With an `arithmetic` from zhina_calc.arithmetic, the steps follow that
+number mode instead of the engine's floats, as the keypad chain does:
+literals are read exactly (0.1 + 0.2 = 3/10 in fraction mode) and only
++ - * / are worked out; anything else stops the trace with an error step.
+
+Each step describes one operation and every sub-expression it shows is cut
+to STEP_WIDTH characters, so a trace costs time and space linear in the size
+of the expression. Traces are memoized per normalized expression.
+"""
+import functools
+from collections import namedtuple
+
+from zhina_calc import sandbox
+from zhina_calc.engine import (
+    BINARY_OPERATORS,
+    CONSTANTS,
+    FUNCTIONS,
+    NONDETERMINISTIC_FUNCTIONS,
+    UNARY_OPERATORS,
+    BinOp,
+    Call,
+    Name,
+    Num,
+    Unary,
+    left_chain,
+    parse,
+)
+from zhina_calc.errors import ExpressionError, TooExpensive
+from zhina_calc.formatting import format_result
+
+Step = namedtuple('Step', 'rule text')
+
+STEP_WIDTH = 80
+
+OPERATION_NAMES = {
+    '+': 'Add',
+    '-': 'Subtract',
+    '*': 'Multiply',
+    '/': 'Divide',
+    '//': 'Floor-divide',
+    '%': 'Take the remainder',
+    '**': 'Raise to a power',
+}
+
+# What a keypad chain can do in the exact number modes.
+CHAIN_OPERATORS = ('+', '-', '*', '/')
+
+
+# --- Rendering ---
+
+class _Truncated(Exception):
+    pass
+
+
+def render(node, width=None):
+    """The expression as text, with every grouping made explicit by parentheses.
+
+    With `width`, rendering stops after about that many characters and the
+    text ends in '...', so the cost is bounded by `width` rather than the tree.
+    """
+    parts = []
+    used = [0]
+
+    def emit(text):
+        parts.append(text)
+        used[0] += len(text)
+        if width is not None and used[0] > width:
+            raise _Truncated
+
+    def walk(node, nested):
+        kind = type(node)
+        if kind is Num:
+            text = format_result(node.value)
+            # 2 * (1/2): a Fraction operand keeps its own grouping
+            emit(f'({text})' if nested and '/' in text else text)
+        elif kind is Name:
+            emit(node.id)
+        elif kind is Unary:
+            emit(node.op)
+            operand = node.operand
+            if type(operand) is Unary or (type(operand) is Num and str(operand.value)[0] == '-'):
+                # -(-x), not --x
+                emit('(')
+                walk(operand, False)
+                emit(')')
+            else:
+                walk(operand, True)
+        elif kind is BinOp:
+            # Every BinOp on the left spine is a nested operand of the next one.
+            first, steps = left_chain(node)
+            emit('(' * (len(steps) - 1 + nested))
+            walk(first, True)
+            for i, (op, right) in enumerate(steps, 1):
+                emit(f' {op} ')
+                walk(right, True)
+                if i < len(steps) or nested:
+                    emit(')')
+        elif kind is Call:
+            emit(f'{node.func}(')
+            for i, arg in enumerate(node.args):
+                if i:
+                    emit(', ')
+                walk(arg, False)
+            emit(')')
+
+    try:
+        walk(node, False)
+    except _Truncated:
+        return ''.join(parts)[:width] + '...'
+    return ''.join(parts)
+
+
+# --- Reduction ---
+
+def _is_number(node, value):
+    return type(node) is Num and type(node.value) is not complex and node.value == value
+
+
+def _simplify(op, left, right):
+    """The operand an identity reduces BinOp(op, left, right) to, or None."""
+    if op == '*':
+        if _is_number(left, 1):
+            return right
+        if _is_number(right, 1):
+            return left
+    elif op == '+':
+        if _is_number(left, 0):
+            return right
+        if _is_number(right, 0):
+            return left
+    elif op == '-' or op == '/' or op == '**':
+        if _is_number(right, 0 if op == '-' else 1):
+            return left
+    return None
+
+
+class _Explainer:
+    __slots__ = ('steps', 'arithmetic')
+
+    def __init__(self, arithmetic=None):
+        self.steps = []
+        self.arithmetic = arithmetic
+
+    def step(self, rule, text):
+        self.steps.append(Step(rule, text))
+
+    def show(self, node):
+        return render(node, STEP_WIDTH)
+
+    def unavailable(self, what):
+        return ExpressionError(f"{what} is not available in {self.arithmetic.mode} mode")
+
+    def negate(self, value):
+        if self.arithmetic is None:
+            return UNARY_OPERATORS['-'](value)
+        return self.arithmetic.apply('-', self.arithmetic.parse('0'), value)
+
+    def apply(self, op, left, right):
+        if self.arithmetic is None:
+            return BINARY_OPERATORS[op](left, right)
+        if op not in CHAIN_OPERATORS:
+            raise self.unavailable(f"'{op}'")
+        return self.arithmetic.apply(op, left, right)
+
+    def reduce_binop(self, op, left, right):
+        if type(left) is Num and type(right) is Num:
+            value = Num(self.apply(op, left.value, right.value))
+            self.step('evaluate', f"{OPERATION_NAMES[op]}: {self.show(BinOp(op, left, right))} "
+                                  f"= {self.show(value)}")
+            return value
+        reduced = BinOp(op, left, right)
+        simpler = _simplify(op, left, right)
+        if simpler is not None:
+            self.step('simplify', f"Simplify: {self.show(reduced)} = {self.show(simpler)}")
+            return simpler
+        return reduced
+
+    def reduce(self, node):
+        kind = type(node)
+        if kind is Num:
+            return node
+        if kind is Name:
+            if node.id in CONSTANTS:
+                if self.arithmetic is not None:
+                    raise self.unavailable(node.id)
+                value = Num(CONSTANTS[node.id])
+                self.step('constant', f"Replace {node.id} with {self.show(value)}")
+                return value
+            return node
+        if kind is Unary:
+            operand = self.reduce(node.operand)
+            if type(operand) is Num:
+                value = Num(self.negate(operand.value) if node.op == '-' else operand.value)
+                if node.op == '-' and type(node.operand) is not Num:
+                    # A literal such as -3 is just a negative number; no step for it.
+                    self.step('evaluate', f"Negate: -({self.show(operand)}) = {self.show(value)}")
+                return value
+            if node.op == '+':
+                return operand
+            if type(operand) is Unary and operand.op == '-':
+                self.step('simplify', f"Simplify: -(-{self.show(operand.operand)}) = {self.show(operand.operand)}")
+                return operand.operand
+            return Unary(node.op, operand)
+        if kind is BinOp:
+            first, steps = left_chain(node)
+            left = self.reduce(first)
+            for op, right in steps:
+                left = self.reduce_binop(op, left, self.reduce(right))
+            return left
+        if kind is Call:
+            args = tuple(self.reduce(arg) for arg in node.args)
+            call = Call(node.func, args)
+            if node.func in NONDETERMINISTIC_FUNCTIONS or not all(type(arg) is Num for arg in args):
+                return call
+            if self.arithmetic is not None:
+                raise self.unavailable(f"{node.func}()")
+            value = Num(FUNCTIONS[node.func](*(arg.value for arg in args)))
+            self.step('function', f"Apply {node.func}: {self.show(call)} = {self.show(value)}")
+            return value
+        return node
+
+
+@functools.lru_cache(maxsize=256)
+def _explain(text, arithmetic=None):
+    try:
+        tree = parse(text)
+        exact = tree if arithmetic is None else parse(text, number=arithmetic.parse)
+    except Exception as e:
+        return (Step('error', f"Cannot read the expression: {e}"),)
+    explainer = _Explainer(arithmetic)
+    grouped = render(tree, STEP_WIDTH * 4)
+    if grouped.replace(' ', '') != text.replace(' ', ''):
+        # Only worth a step when precedence added parentheses the input did not have.
+        explainer.step('precedence', f"Read as: {grouped}")
+    try:
+        result = explainer.reduce(exact)
+    except TooExpensive as e:
+        if e.reason == 'time':
+            raise  # depends on server load, so not memoized
+        explainer.step('error', f"Stopped: {e}")
+    except ZeroDivisionError:  # also decimal.DivisionByZero, whose message is its class
+        explainer.step('error', "Stopped: division by zero")
+    except Exception as e:
+        explainer.step('error', f"Stopped: {e or type(e).__name__}")
+    else:
+        if type(result) is Num:
+            explainer.step('result', f"Result: {render(result)}")
+        else:
+            explainer.step('result', f"Simplified: {render(result, STEP_WIDTH * 4)}")
+    return tuple(explainer.steps)
+
+
+def explain(expression, budget=None, arithmetic=None):
+    """The steps of a solution as a tuple of Step(rule, text).
+
+    `rule` is one of 'precedence', 'constant', 'evaluate', 'function',
+    'simplify', 'result' or 'error'. Evaluation runs under `budget`
+    (sandbox.DEFAULT_BUDGET by default); a budget timeout raises TooExpensive.
+    `arithmetic` selects a number mode (see zhina_calc.arithmetic); the
+    default, like 'standard', uses the engine's own operators.
+    """
+    if arithmetic is not None and arithmetic.mode == 'standard':
+        arithmetic = None
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        return _explain(expression.replace('^', '**').strip(), arithmetic)
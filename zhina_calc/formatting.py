@@ -0,0 +1,109 @@
+"""
+Display strings for results, including integers too large for str().
+
+str(int) takes time quadratic in the number of digits, and CPython refuses it
+altogether above sys.get_int_max_str_digits() (4300 by default), which used
+to turn results such as 2**20000 into "Error". format_result() shows
+integers exactly up to that limit, as before, and larger ones in scientific
+notation. The leading digits come from the top bits of the integer times a
+power of two evaluated in `decimal` at just the precision needed, so the
+cost does not depend on the number of decimal digits:
+
+    >>> format_result(2 ** 100_000)
+    '9.99002093014385e+30102'
+
+All digits are only produced on request. iter_digits() converts the integer
+to a Decimal by splitting it in binary (libmpdec multiplies large numbers in
+subquadratic time, str(Decimal) is linear) and yields the digits in chunks
+for export.
+"""
+import decimal
+import math
+import sys
+
+SIGNIFICANT_DIGITS = 15
+# Integers up to this many digits are shown in full, as str() always showed
+# them: CPython's int/str conversion limit (4300 digits unless configured),
+# past which str() raises. Below it the conversion takes microseconds.
+MAX_INT_DIGITS = getattr(sys, 'get_int_max_str_digits', lambda: 0)() or 4300
+DIGIT_CHUNK = 65536
+
+_GUARD_DIGITS = 10
+_LOG2_10 = math.log2(10)
+_TWO = decimal.Decimal(2)
+_SPLIT_BITS = 512
+
+
+def format_result(value, digits=SIGNIFICANT_DIGITS, max_int_digits=MAX_INT_DIGITS):
+    """The display string for a result; ints over `max_int_digits` use scientific notation."""
+    if type(value) is not int:
+        return str(value)
+    if value.bit_length() <= max_int_digits * _LOG2_10 + 1:
+        try:
+            text = str(value)
+        except ValueError:  # the limit was lowered at run time
+            return scientific(value, digits)
+        if len(text) - (value < 0) <= max_int_digits:
+            return text
+    return scientific(value, digits)
+
+
+def scientific(n, digits=SIGNIFICANT_DIGITS):
+    """An int as '<mantissa>e+<exponent>' with `digits` significant digits,
+    without converting all of it to decimal."""
+    sign = '-' if n < 0 else ''
+    n = abs(n)
+    precision = digits + _GUARD_DIGITS
+    context = decimal.Context(prec=precision, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+    # Keep enough top bits for `precision` digits; the rest is a power of two.
+    shift = max(0, n.bit_length() - int(precision * _LOG2_10) - 8)
+    approx = context.multiply(decimal.Decimal(n >> shift), context.power(_TWO, shift))
+    mantissa, exponent = format(approx, f'.{digits - 1}e').split('e')
+    if '.' in mantissa:
+        mantissa = mantissa.rstrip('0').rstrip('.')
+    if exponent[0] not in '+-':
+        exponent = '+' + exponent
+    return f"{sign}{mantissa}e{exponent}"
+
+
+def int_to_decimal(n):
+    """The exact Decimal for an int, by binary splitting."""
+    powers = {}
+
+    def power_of_two(bits):
+        result = powers.get(bits)
+        if result is None:
+            if bits <= _SPLIT_BITS:
+                result = _TWO ** bits
+            else:
+                half = bits >> 1
+                result = power_of_two(half) * power_of_two(bits - half)
+            powers[bits] = result
+        return result
+
+    def convert(n, bits):
+        if bits <= _SPLIT_BITS:
+            return decimal.Decimal(n)
+        half = bits >> 1
+        high = n >> half
+        low = n - (high << half)
+        return convert(low, half) + convert(high, bits - half) * power_of_two(half)
+
+    with decimal.localcontext() as context:
+        context.prec = decimal.MAX_PREC
+        context.Emax = decimal.MAX_EMAX
+        context.Emin = decimal.MIN_EMIN
+        context.traps[decimal.Inexact] = True
+        result = convert(abs(n), abs(n).bit_length())
+        # Negated inside the exact context; outside it the sign change would round.
+        return -result if n < 0 else result
+
+
+def iter_digits(n, chunk_size=DIGIT_CHUNK):
+    """Yields the full decimal representation of int `n` in chunks of `chunk_size` characters."""
+    if n.bit_length() <= 4 * _SPLIT_BITS:
+        yield str(n)
+        return
+    text = str(int_to_decimal(n))
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
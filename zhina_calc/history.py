@@ -0,0 +1,63 @@
+"""
+Per-session calculation history: the last few '=' results, in memory.
+
+HistoryRing is a fixed-capacity ring buffer. Its list grows up to `capacity`
+slots (so a session that never presses '=' pays for an empty list) and then
+the oldest entry is overwritten, so appending is O(1) and a session's history
+never grows past `capacity` entries however long the session runs.
+Everything older lives on disk in the HistoryStore (zhina_calc.history_db),
+which is written off the click path.
+"""
+from collections import namedtuple
+
+HistoryItem = namedtuple('HistoryItem', 'expression result')
+
+DEFAULT_CAPACITY = 50
+
+
+class HistoryRing:
+    """The newest `capacity` (expression, result) pairs of one session."""
+    __slots__ = ('capacity', '_slots', '_next')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._slots = []
+        self._next = 0
+
+    def append(self, expression, result):
+        item = HistoryItem(expression, result)
+        if len(self._slots) < self.capacity:
+            self._slots.append(item)
+        else:
+            self._slots[self._next] = item
+        self._next = (self._next + 1) % self.capacity
+
+    def clear(self):
+        self._slots = []
+        self._next = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        """Newest first."""
+        slots = self._slots
+        for i in range(1, len(slots) + 1):
+            yield slots[(self._next - i) % len(slots)]
+
+    def to_tuple(self):
+        # Oldest first, so from_tuple() can replay appends in order.
+        return self.capacity, tuple(tuple(item) for item in reversed(list(self)))
+
+    @classmethod
+    def from_tuple(cls, data):
+        capacity, items = data
+        ring = cls(capacity)
+        for expression, result in items:
+            ring.append(expression, result)
+        return ring
+
+    def __repr__(self):
+        return f"HistoryRing(capacity={self.capacity}, len={len(self._slots)})"
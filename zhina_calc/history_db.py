@@ -0,0 +1,262 @@
+"""
+Append-only on-disk calculation history in SQLite.
+
+    >>> store = HistoryStore('history.sqlite3')
+    >>> store.append('session-1', '2+3', '5')      # returns at once
+    >>> store.flush()
+    >>> store.page('session-1')
+    HistoryPage(entries=[HistoryEntry(id=1, session='session-1', ...)], cursor=None)
+
+append() only puts the entry on a queue; it never touches the disk, so it
+is safe to call from a button callback. A single writer thread drains the
+queue and inserts whatever has accumulated (up to BATCH_SIZE rows) in one
+transaction, at most FLUSH_INTERVAL seconds after the first entry arrived.
+The database runs in WAL mode, so reads do not wait for the writer and the
+writer does not wait for readers.
+
+Reads never load the whole history:
+
+    page()    newest first, keyset-paginated on the (session, id) index;
+              pass the returned cursor to get the next, older page
+    search()  entries whose expression starts with a prefix, as a range scan
+              on the (session, expression) index, in expression order
+
+Entries still on the queue are not visible to reads until the writer has
+committed them (flush() waits for that).
+
+Retention: the writer deletes entries older than `retention_days` and, past
+`max_rows` entries in all, the oldest ones, at start-up and then at most
+every PRUNE_INTERVAL seconds after a write. Both walk the table from its
+oldest rowid (ids grow with time), so pruning never scans what it keeps,
+and both delete PRUNE_BATCH rows per transaction. sqlite3 is imported with
+this module, which app.py loads on first use.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+HistoryEntry = namedtuple('HistoryEntry', 'id session expression result created')
+HistoryPage = namedtuple('HistoryPage', 'entries cursor')
+
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.5
+# Entries waiting for the writer; append() drops (and counts) entries beyond this.
+MAX_PENDING = 100_000
+DEFAULT_PAGE_SIZE = 20
+RETENTION_DAYS = 30
+MAX_ROWS = 1_000_000
+PRUNE_INTERVAL = 60.0
+# Rows deleted per statement, so a large prune does not hold the write lock for long.
+PRUNE_BATCH = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    expression TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_session_id ON history (session, id);
+CREATE INDEX IF NOT EXISTS history_session_expression ON history (session, expression, id);
+"""
+
+_COLUMNS = 'id, session, expression, result, created'
+
+_STOP = object()
+_FLUSH = object()
+
+
+def connect(path):
+    """A connection in WAL mode that any thread may use (callers serialize access)."""
+    connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only risks the last transactions on power loss, never corruption.
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def _prefix_end(prefix):
+    """The smallest string greater than every string starting with `prefix`, or None if none is."""
+    # U+10FFFF has no successor, so it carries into the character before it.
+    prefix = prefix.rstrip('\U0010ffff')
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000  # surrogates cannot be stored as UTF-8
+    return prefix[:-1] + chr(code)
+
+
+class HistoryStore:
+    """SQLite history shared by every session, written by one background thread."""
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 retention_days=RETENTION_DAYS, max_rows=MAX_ROWS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.pruned = 0
+        self._queue = queue.Queue(MAX_PENDING)
+        self._reader = connect(path)
+        self._reader.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='zhina-history-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # --- Writing ---
+
+    def append(self, session, expression, result):
+        """Queues one entry for the writer; never blocks."""
+        try:
+            self._queue.put_nowait((session, expression, str(result), time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until every entry appended so far is committed."""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        """Writes what is queued, stops the writer and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        with self._read_lock:
+            self._reader.close()
+
+    def _prune(self, connection):
+        """Deletes entries past the retention limits; returns how many."""
+        deleted = 0
+        if self.max_rows is not None:
+            newest = connection.execute('SELECT max(id) FROM history').fetchone()[0] or 0
+            while True:
+                with connection:
+                    count = connection.execute(
+                        'DELETE FROM history WHERE id IN (SELECT id FROM history ORDER BY id LIMIT ?) AND id <= ?',
+                        (PRUNE_BATCH, newest - self.max_rows)).rowcount
+                deleted += count
+                if count < PRUNE_BATCH:
+                    break
+        if self.retention_days is not None:
+            cutoff = time.time() - self.retention_days * 86400
+            while True:
+                with connection:
+                    count = connection.execute(
+                        'DELETE FROM history WHERE id IN (SELECT id FROM history ORDER BY id LIMIT ?) AND created < ?',
+                        (PRUNE_BATCH, cutoff)).rowcount
+                deleted += count
+                if count < PRUNE_BATCH:
+                    break
+        self.pruned += deleted
+        return deleted
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        self._prune(connection)
+        pruned_at = time.monotonic()
+        try:
+            while True:
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                batch, waiting, stop = [], [], False
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    if type(item) is tuple and item[0] is _FLUSH:
+                        waiting.append(item[1])
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    timeout = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    with connection:
+                        connection.execute('BEGIN')
+                        connection.executemany(
+                            'INSERT INTO history (session, expression, result, created) VALUES (?, ?, ?, ?)',
+                            batch)
+                    self.written += len(batch)
+                    self.batches += 1
+                    if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                        self._prune(connection)
+                        pruned_at = time.monotonic()
+                for done in waiting:
+                    done.set()
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    # --- Reading ---
+
+    def _query(self, sql, params):
+        with self._read_lock:
+            return [HistoryEntry(*row) for row in self._reader.execute(sql, params)]
+
+    def page(self, session, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """The `limit` newest entries of `session` older than `cursor` (None for the newest)."""
+        if cursor is None:
+            entries = self._query(
+                f'SELECT {_COLUMNS} FROM history WHERE session = ? ORDER BY id DESC LIMIT ?',
+                (session, limit + 1))
+        else:
+            entries = self._query(
+                f'SELECT {_COLUMNS} FROM history WHERE session = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                (session, cursor, limit + 1))
+        if len(entries) > limit:
+            return HistoryPage(entries[:limit], entries[limit - 1].id)
+        return HistoryPage(entries, None)
+
+    def search(self, session, prefix, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Entries of `session` whose expression starts with `prefix`, in expression order.
+
+        The cursor of the returned page continues the search after its last entry.
+        """
+        sql = f'SELECT {_COLUMNS} FROM history WHERE session = ?'
+        params = [session]
+        if prefix:
+            end = _prefix_end(prefix)
+            sql += ' AND expression >= ?' if end is None else ' AND expression >= ? AND expression < ?'
+            params += [prefix] if end is None else [prefix, end]
+        if cursor is not None:
+            sql += ' AND (expression, id) > (?, ?)'
+            params += list(cursor)
+        sql += ' ORDER BY expression, id LIMIT ?'
+        params.append(limit + 1)
+        entries = self._query(sql, params)
+        if len(entries) > limit:
+            last = entries[limit - 1]
+            return HistoryPage(entries[:limit], (last.expression, last.id))
+        return HistoryPage(entries, None)
+
+    def count(self, session=None):
+        with self._read_lock:
+            if session is None:
+                return self._reader.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+            return self._reader.execute('SELECT COUNT(*) FROM history WHERE session = ?', (session,)).fetchone()[0]
+
+    def stats(self):
+        return {'written': self.written, 'batches': self.batches, 'pending': self._queue.qsize(),
+                'dropped': self.dropped, 'pruned': self.pruned}
@@ -0,0 +1,111 @@
+"""
+Incremental evaluation of the + - * / chains typed on the keypad.
+
+handle_button() used to rebuild `expression + current_input` and re-parse the
+whole string on '='. RunningChain instead folds each operand in as soon as
+its operator key is pressed, keeping only:
+
+    total   the sum of all finished terms        (a + b*c ...)
+    add_op  the + or - waiting between total and the current term
+    term    the current product/quotient         (... d*e ...)
+    mul_op  the * or / waiting between term and the next operand
+
+so '=' and the live preview are O(1) however long the chain is. Operations
+are applied in exactly the order Python's precedence rules apply them to the
+flat string ((a + (b*c)) - d), so results are identical to evaluating the
+whole expression with calculate().
+
+Operands are parsed and combined by the chain's `arithmetic` (see
+zhina_calc.arithmetic): floats by default, or exact Fraction/Decimal values.
+"""
+from zhina_calc.arithmetic import FLOAT
+from zhina_calc.cache import ErrorResult
+from zhina_calc.errors import ExpressionError
+
+
+class RunningChain:
+    """Operand/operator state for a chain of + - * / typed one key at a time."""
+    __slots__ = ('total', 'add_op', 'term', 'mul_op', 'error', 'arithmetic')
+
+    def __init__(self, arithmetic=FLOAT):
+        self.arithmetic = arithmetic
+        self.reset()
+
+    def reset(self):
+        self.total = None
+        self.add_op = None
+        self.term = None
+        self.mul_op = None
+        self.error = None
+
+    def __bool__(self):
+        return self.total is not None or self.term is not None or self.error is not None
+
+    def _close_term(self, operand_text):
+        value = self.arithmetic.parse(operand_text)
+        if self.mul_op is None:
+            return value
+        return self.arithmetic.apply(self.mul_op, self.term, value)
+
+    def _with_total(self, term):
+        if self.total is None:
+            return term
+        return self.arithmetic.apply(self.add_op, self.total, term)
+
+    def push(self, operand_text, op):
+        """Records `operand_text` followed by the operator key `op`."""
+        if self.error is not None:
+            return
+        try:
+            term = self._close_term(operand_text)
+            if op in ('*', '/'):
+                self.term = term
+                self.mul_op = op
+            else:
+                self.total = self._with_total(term)
+                self.add_op = op
+                self.term = None
+                self.mul_op = None
+        except Exception as e:
+            # Remember the failure; '=' reports it like calculate() would.
+            self.error = e
+
+    def result(self, operand_text):
+        """Value of the whole chain ending in `operand_text` (raises on error)."""
+        if self.error is not None:
+            raise self.error
+        return self._with_total(self._close_term(operand_text))
+
+    def result_str(self, operand_text):
+        """result() as the display string calculate() would return."""
+        try:
+            return self.arithmetic.format(self.result(operand_text))
+        except Exception as e:
+            return ErrorResult(e)
+
+    def to_tuple(self):
+        """Plain-data form for CalculatorState snapshots (the error keeps its message only)."""
+        encode = self.arithmetic.encode
+        total = None if self.total is None else encode(self.total)
+        term = None if self.term is None else encode(self.term)
+        error = None if self.error is None else str(self.error)
+        return (total, self.add_op, term, self.mul_op, error)
+
+    @classmethod
+    def from_tuple(cls, data, arithmetic=FLOAT):
+        chain = cls(arithmetic)
+        total, chain.add_op, term, chain.mul_op, error = data
+        chain.total = None if total is None else arithmetic.decode(total)
+        chain.term = None if term is None else arithmetic.decode(term)
+        if error is not None:
+            chain.error = ExpressionError(error)
+        return chain
+
+    def preview(self, operand_text):
+        """Running result for the live display, or None if there is none."""
+        if not self or self.error is not None:
+            return None
+        try:
+            return self.arithmetic.format(self.result(operand_text))
+        except Exception:
+            return None
@@ -0,0 +1,169 @@
+"""
+Optional timers and counters for the calculator's hot paths.
+
+Instrumentation is off unless the ZHINA_METRICS environment variable is set
+(or REGISTRY.enabled is switched on). While it is off, timer() hands back one
+shared do-nothing context manager and inc() returns immediately, so the
+instrumented code pays for a single attribute check.
+
+    with timer('calculate'):
+        ...
+    with timer('handle_button', branch='digit'):
+        ...
+    inc('result_cache_errors')
+
+Collected data can be read as a JSON-ready dict (snapshot()) or in the
+Prometheus text exposition format (prometheus_text()). Timers are exported as
+summaries (_count/_sum in seconds) plus a _max gauge; collectors registered
+with add_collector() contribute extra gauges such as cache statistics.
+"""
+import os
+import re
+import threading
+import time
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('registry', 'key', 'start')
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Registry:
+    """Process-wide store of timer and counter values."""
+
+    def __init__(self, enabled=False, prefix='zhina_'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._timers = {}      # key -> [count, total_seconds, max_seconds]
+        self._counters = {}    # key -> count
+        self._collectors = []  # callables returning {gauge_name: value}
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, _key(name, labels))
+
+    def observe(self, key, seconds):
+        with self._lock:
+            entry = self._timers.get(key)
+            if entry is None:
+                self._timers[key] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        """Registers a callable returning {gauge_name: number}, read at export."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def _gauges(self):
+        gauges = {}
+        for collector in list(self._collectors):
+            gauges.update(collector())
+        return gauges
+
+    def snapshot(self):
+        """All values as a JSON-serializable dict."""
+        with self._lock:
+            timers = [
+                {'name': name, 'labels': dict(labels), 'count': count,
+                 'sum_seconds': total, 'max_seconds': longest}
+                for (name, labels), (count, total, longest) in sorted(self._timers.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {'enabled': self.enabled, 'timers': timers, 'counters': counters, 'gauges': self._gauges()}
+
+    def prometheus_text(self):
+        """All values in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        seen = set()
+
+        def header(metric, kind):
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for timer in snapshot['timers']:
+            metric = _metric_name(self.prefix + timer['name'] + '_seconds')
+            labels = _labels(timer['labels'])
+            header(metric, 'summary')
+            lines.append(f"{metric}_count{labels} {timer['count']}")
+            lines.append(f"{metric}_sum{labels} {timer['sum_seconds']:.9f}")
+        for timer in snapshot['timers']:
+            metric = _metric_name(self.prefix + timer['name'] + '_seconds_max')
+            header(metric, 'gauge')
+            lines.append(f"{metric}{_labels(timer['labels'])} {timer['max_seconds']:.9f}")
+        for counter in snapshot['counters']:
+            metric = _metric_name(self.prefix + counter['name'] + '_total')
+            header(metric, 'counter')
+            lines.append(f"{metric}{_labels(counter['labels'])} {counter['value']}")
+        for name, value in sorted(snapshot['gauges'].items()):
+            metric = _metric_name(self.prefix + name)
+            header(metric, 'gauge')
+            lines.append(f"{metric} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{_metric_name(k)}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+REGISTRY = Registry(enabled=bool(os.environ.get('ZHINA_METRICS')))
+
+timer = REGISTRY.timer
+inc = REGISTRY.inc
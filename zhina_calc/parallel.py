@@ -0,0 +1,235 @@
+"""
+Parallel vectorized evaluation over very large arrays, in shared memory.
+
+    >>> with ParallelEvaluator(workers=8) as evaluator:
+    ...     x = evaluator.empty(100_000_000)          # float64, in shared memory
+    ...     x[:] = np.linspace(0, 1, len(x))
+    ...     result = evaluator.evaluate('x * (1 + rate)', x=x, rate=0.07)
+    ...     result.values.sum()
+
+Inputs, results and error masks live in multiprocessing.shared_memory
+blocks. A task names its blocks and the bounds of its slice; the worker maps
+the blocks and evaluates straight from the input pages into the output pages
+(zhina_calc.vector), so no array is pickled or copied between processes.
+Each of the `workers` processes gets one contiguous slice, which it walks in
+BLOCK_ELEMENTS pieces: temporaries stay a few MB per worker, however large
+the arrays are.
+
+Arrays made with empty()/asarray() are shared as they are. Any other input
+array is first copied into a temporary shared block, once, on the calling
+process. Scalars are sent by value. Results are views of blocks owned by
+the evaluator: they stay valid until free() or close(), and must not be
+used after that.
+
+Inputs of fewer than MIN_PARALLEL_ELEMENTS elements are evaluated on the
+calling process; handing them to workers costs more than it saves. Workers
+are started with the 'spawn' method, on first use, and reused.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from zhina_calc import sandbox
+from zhina_calc.errors import ExpressionError
+from zhina_calc.vector import BatchResult, compile_vectorized
+
+BLOCK_ELEMENTS = 1 << 18
+MIN_PARALLEL_ELEMENTS = 1 << 20
+
+
+def _view(shm, dtype, count):
+    return np.ndarray((count,), dtype=dtype, buffer=shm.buf)
+
+
+def _evaluate_slice(expression, inputs, scalars, outputs, start, stop, budget=None):
+    """Worker task: evaluates elements [start, stop) from shared inputs into shared outputs.
+
+    `inputs` maps variable names and `outputs` maps 'values'/'errors' to
+    (block name, element count).
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name, _ in [*inputs.values(), *outputs.values()]]
+    try:
+        arrays = {name: _view(shm, np.float64, count) for (name, (_, count)), shm in zip(inputs.items(), blocks)}
+        values = _view(blocks[-2], np.float64, outputs['values'][1])
+        errors = _view(blocks[-1], np.bool_, outputs['errors'][1])
+        _evaluate_into(compile_vectorized(expression), arrays, scalars, values, errors, start, stop, budget)
+        del arrays, values, errors
+    finally:
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:
+                pass  # still viewed from a traceback; unmapped when that goes
+
+
+def _evaluate_into(compiled, arrays, scalars, values, errors, start, stop, budget):
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        for lo in range(start, stop, BLOCK_ELEMENTS):
+            hi = min(lo + BLOCK_ELEMENTS, stop)
+            env = {name: array[lo:hi] for name, array in arrays.items()}
+            env.update(scalars)
+            result = compiled.evaluate(env)
+            values[lo:hi] = result.values
+            errors[lo:hi] = result.errors
+
+
+class ParallelEvaluator:
+    """Worker processes evaluating one expression over shared-memory arrays."""
+
+    def __init__(self, workers=None, budget=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.budget = budget
+        self._executor = None
+        self._blocks = {}  # data address -> SharedMemory, for arrays handed out
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Shared arrays ---
+
+    def empty(self, count, dtype=np.float64):
+        """An uninitialized 1-D array of `count` elements in shared memory."""
+        dtype = np.dtype(dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(count * dtype.itemsize, 1))
+        array = _view(shm, dtype, count)
+        with self._lock:
+            self._blocks[array.ctypes.data] = shm
+        return array
+
+    def asarray(self, data):
+        """`data` as a float64 array in shared memory (copied once)."""
+        data = np.asarray(data, dtype=np.float64).ravel()
+        array = self.empty(len(data))
+        array[:] = data
+        return array
+
+    def _block(self, array, dtype=np.float64):
+        """The shared block `array` is exactly the start of, or None."""
+        if not isinstance(array, np.ndarray) or array.dtype != dtype or array.ndim != 1 \
+                or not array.flags.c_contiguous:
+            return None
+        with self._lock:
+            return self._blocks.get(array.ctypes.data)
+
+    def free(self, *arrays):
+        """Releases the shared blocks behind arrays from empty(), asarray() or evaluate()."""
+        for array in arrays:
+            with self._lock:
+                shm = self._blocks.pop(array.ctypes.data, None)
+            if shm is not None:
+                _release(shm)
+
+    # --- Evaluation ---
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'))
+            return self._executor
+
+    def evaluate(self, expression, variables=None, out=None, **arrays):
+        """BatchResult(values, errors) of `expression` over 1-D arrays of one length and scalars.
+
+        The result arrays are in shared memory; see free(). `out` may pass a
+        (values, errors) pair from an earlier call, or from empty(), to be
+        overwritten instead.
+        """
+        if variables:
+            arrays = {**variables, **arrays}
+        source = expression.replace('^', '**').strip()
+        with (self.budget or sandbox.DEFAULT_BUDGET).active():
+            compiled = compile_vectorized(source)
+        missing = compiled.variables - arrays.keys()
+        if missing:
+            raise ExpressionError(f"Missing values for {', '.join(sorted(missing))}")
+        scalars, inputs = {}, {}
+        for name in compiled.variables:
+            value = arrays[name]
+            if np.ndim(value) == 0:
+                scalars[name] = float(value)
+            else:
+                inputs[name] = value
+        lengths = {len(value) for value in inputs.values()}
+        if len(lengths) > 1 or any(np.ndim(value) != 1 for value in inputs.values()):
+            raise ValueError("Array inputs must be 1-D and of the same length")
+        count = lengths.pop() if lengths else 1
+
+        if out is None:
+            values, errors = self.empty(count), self.empty(count, np.bool_)
+        else:
+            values, errors = out
+            if len(values) != count or len(errors) != count or self._block(values) is None \
+                    or self._block(errors, np.bool_) is None:
+                raise ValueError("out must be float64 values and bool errors from this evaluator, "
+                                 "one element per input")
+        if count < MIN_PARALLEL_ELEMENTS or self.workers <= 1:
+            _evaluate_into(compiled, inputs, scalars, values, errors, 0, count, self.budget)
+            return BatchResult(values, errors)
+
+        temporary = []
+        try:
+            shared = {}
+            for name, value in inputs.items():
+                shm = self._block(value)
+                if shm is None:
+                    value = self.asarray(value)
+                    temporary.append(value)
+                    shm = self._block(value)
+                shared[name] = (shm.name, count)
+            with self._lock:
+                outputs = {'values': (self._blocks[values.ctypes.data].name, count),
+                           'errors': (self._blocks[errors.ctypes.data].name, count)}
+            executor = self._get_executor()
+            step = -(-count // self.workers)
+            futures = [executor.submit(_evaluate_slice, source, shared, scalars, outputs,
+                                       start, min(start + step, count), self.budget)
+                       for start in range(0, count, step)]
+            for future in futures:
+                future.result()
+        except BaseException:
+            if out is None:
+                self.free(values, errors)
+            raise
+        finally:
+            self.free(*temporary)
+        return BatchResult(values, errors)
+
+    def close(self):
+        """Stops the workers and releases every shared block."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            blocks, self._blocks = list(self._blocks.values()), {}
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for shm in blocks:
+            _release(shm)
+
+
+# Blocks released while arrays still viewed them; kept so their mapping outlives those arrays.
+_LINGERING = []
+
+
+def _release(shm):
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        _LINGERING.append(shm)
+
+
+def evaluate_parallel(expression, variables=None, workers=None, **arrays):
+    """calculate_many() on `workers` processes; returns a BatchResult of ordinary arrays.
+
+    Convenience for one-off calls: inputs and results are copied in and out of
+    shared memory. Use a ParallelEvaluator directly to avoid those copies.
+    """
+    with ParallelEvaluator(workers) as evaluator:
+        result = evaluator.evaluate(expression, variables, **arrays)
+        return BatchResult(result.values.copy(), result.errors.copy())
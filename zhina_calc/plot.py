@@ -0,0 +1,327 @@
+"""
+Server-side sampling and downsampling for plotting f(x).
+
+    >>> result = plot('sin(x)/x', -50, 50)
+    >>> len(result.x), result.sampled
+    (2001, 585936)
+
+plot() works in three stages:
+
+1. tiles: the x axis is cut into power-of-two wide tiles, sized so that a
+   view spans TILES_PER_VIEW of them. Each tile is sampled once and kept in
+   a PlotCache keyed by (expression, tile size, tile index). A pan or a zoom
+   that stays at the same tile size only evaluates the tiles it has not
+   seen yet. A zoom that changes the tile size reuses the level next to it:
+   zooming out merges the two cached halves of a tile, and zooming in
+   refines the cached samples of an enclosing tile (up to
+   MAX_ZOOM_LEVELS sizes up), evaluating only the points added between
+   them. Merging only looks one size down, so a zoom-out by more than 2x
+   in one step samples afresh.
+2. adaptive sampling: within a tile, a coarse uniform pass estimates the
+   curvature (second differences). The tile's remaining points are then
+   placed by inverse-CDF sampling of a density that grows with curvature, so
+   bends and steep parts get more points than straight runs. Both passes
+   are single vectorized evaluations (zhina_calc.vector).
+3. LTTB: the samples in view are reduced to `threshold` points with the
+   Largest-Triangle-Three-Buckets algorithm, run separately on every run of
+   finite values so gaps (poles, log of negatives) stay gaps.
+
+Evaluation and downsampling times are reported in the PlotResult.
+NumPy is only imported when this module is.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from zhina_calc import sandbox
+from zhina_calc.engine import NONDETERMINISTIC_FUNCTIONS, functions_used
+from zhina_calc.errors import ExpressionError
+from zhina_calc.vector import compile_vectorized
+
+PlotResult = namedtuple('PlotResult', 'x y sampled evaluate_ms downsample_ms tiles_computed tiles_cached '
+                                       'tiles_derived')
+
+TILES_PER_VIEW = 8
+DEFAULT_POINTS = 1_000_000
+MAX_POINTS = 1_000_000
+DEFAULT_THRESHOLD = 2000
+MAX_ZOOM_LEVELS = 4
+
+# Share of a tile's points spent on the uniform curvature-estimating pass.
+_COARSE_SHARE = 0.25
+# Highest density (relative to a straight run) that curvature can ask for.
+_MAX_DENSITY = 50.0
+
+
+# --- Sampling ---
+
+def _evaluate(compiled, variable, x):
+    # A constant expression evaluates to a scalar; plot it as a flat line.
+    return np.broadcast_to(compiled.evaluate({variable: x}).values, x.shape)
+
+
+def _split(points):
+    """(coarse, fine) sample counts of sample_adaptive(); only the fine samples are kept."""
+    coarse_n = max(16, int(points * _COARSE_SHARE))
+    return coarse_n, max(2, points - coarse_n)
+
+
+def sample_adaptive(compiled, variable, lo, hi, points):
+    """Samples [lo, hi] with about `points` points, denser where f bends."""
+    coarse_n, fine_n = _split(points)
+    coarse_x = np.linspace(lo, hi, coarse_n)
+    coarse_y = _evaluate(compiled, variable, coarse_x)
+
+    # Curvature per coarse interval from second differences; NaNs (gaps) and
+    # poles are capped by _MAX_DENSITY rather than swallowing every point.
+    bend = np.abs(np.diff(coarse_y, 2))
+    bend = np.concatenate(([bend[0]], np.maximum(bend[:-1], bend[1:]), [bend[-1]]))
+    finite = np.isfinite(bend)
+    scale = np.median(bend[finite]) if finite.any() else 0.0
+    density = np.ones_like(bend)
+    if scale > 0:
+        density += np.minimum(np.where(finite, bend, 0.0) / scale, _MAX_DENSITY)
+    density[~finite] = _MAX_DENSITY
+
+    cumulative = np.concatenate(([0.0], np.cumsum(density)))
+    quantiles = np.linspace(0.0, cumulative[-1], fine_n)
+    fine_x = np.interp(quantiles, cumulative, coarse_x)
+    return fine_x, _evaluate(compiled, variable, fine_x)
+
+
+def refine(compiled, variable, x, y, lo, hi, points):
+    """Samples [lo, hi] with about `points` points, keeping the sorted samples (x, y) inside it.
+
+    The new points are spread evenly over the gaps between neighbouring
+    samples. Samples from sample_adaptive() are closest where f bends, so
+    the result stays densest there too.
+    """
+    grid_x = np.concatenate(([lo], x, [hi]))
+    gaps = len(grid_x) - 1
+    new = max(0, points - len(grid_x))
+    position = (np.arange(new) + 0.5) * (gaps / new) if new else np.empty(0)
+    gap = position.astype(np.intp)
+    new_x = grid_x[gap] + np.diff(grid_x)[gap] * (position - gap)
+    values = _evaluate(compiled, variable, np.concatenate(([lo, hi], new_x)))
+    grid_y = np.concatenate((values[:1], y, values[1:2]))
+    # Interleave: new point k follows its gap's left sample and the k new points before it.
+    new_at = gap + np.arange(1, new + 1)
+    old_at = np.arange(len(grid_x))
+    old_at += np.searchsorted(gap, old_at)
+    out_x = np.empty(len(grid_x) + new)
+    out_y = np.empty(len(grid_x) + new)
+    out_x[old_at], out_x[new_at] = grid_x, new_x
+    out_y[old_at], out_y[new_at] = grid_y, values[2:]
+    return out_x, out_y
+
+
+def merge(tiles, points):
+    """Neighbouring tiles as one, thinned to about `points` samples evenly by index."""
+    x = np.concatenate([tile[0] for tile in tiles])
+    y = np.concatenate([tile[1] for tile in tiles])
+    if len(x) <= points:
+        return x, y
+    keep = np.linspace(0, len(x) - 1, points).round().astype(np.intp)
+    return x[keep], y[keep]
+
+
+# --- Downsampling ---
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of finite (x, y) to `threshold` points."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    # Bucket edges for the n-2 inner points; first and last points are always kept.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    counts = np.diff(edges)
+    starts = edges[:-1]
+    # Average of every bucket, used as the third triangle corner for the bucket before it.
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / np.maximum(counts, 1)
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / np.maximum(counts, 1)
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    keep = np.empty(threshold, dtype=np.intp)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if stop <= start:
+            keep[bucket + 1] = start
+            continue
+        ax, ay = x[a], y[a]
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((ax - avg_x[bucket]) * (by - ay) - (ax - bx) * (avg_y[bucket] - ay))
+        a = start + int(np.argmax(area))
+        keep[bucket + 1] = a
+    return x[keep], y[keep]
+
+
+def downsample(x, y, threshold):
+    """LTTB over each run of finite values, with a NaN between runs so gaps stay visible."""
+    finite = np.isfinite(y)
+    if finite.all():
+        return lttb(x, y, threshold)
+    # Runs of consecutive finite samples.
+    change = np.flatnonzero(np.diff(finite.astype(np.int8)))
+    bounds = np.concatenate(([0], change + 1, [len(y)]))
+    runs = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if finite[start]]
+    if not runs:
+        return x[:0], y[:0]
+    if len(runs) > threshold // 4:
+        # Too fragmented to keep every gap; plot the finite points as one series.
+        return lttb(x[finite], y[finite], threshold)
+    total = sum(stop - start for start, stop in runs)
+    out_x, out_y = [], []
+    for start, stop in runs:
+        share = max(3, threshold * (stop - start) // total)
+        run_x, run_y = lttb(x[start:stop], y[start:stop], share)
+        if out_x:
+            out_x.append(np.array([run_x[0]]))
+            out_y.append(np.array([np.nan]))
+        out_x.append(run_x)
+        out_y.append(run_y)
+    return np.concatenate(out_x), np.concatenate(out_y)
+
+
+# --- Tiles and caching ---
+
+class PlotCache:
+    """Thread-safe LRU of sampled tiles, bounded by the bytes it holds."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            tile = self._data.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return tile
+
+    def put(self, key, tile):
+        size = tile[0].nbytes + tile[1].nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0].nbytes + old[1].nbytes
+            self._data[key] = tile
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (x, y) = self._data.popitem(last=False)
+                self._bytes -= x.nbytes + y.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'tiles': len(self._data), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+SHARED_PLOT_CACHE = PlotCache()
+
+# Fewer samples of an enclosing tile than this are not worth refining.
+_MIN_REFINE_SAMPLES = 16
+
+
+def _derive_tile(cache, compiled, variable, source, exponent, index, per_tile):
+    """A tile built from cached tiles one size down or up to MAX_ZOOM_LEVELS up, or None."""
+    kept = _split(per_tile)[1]
+    lower = [cache.get((source, exponent - 1, 2 * index + half, per_tile)) for half in (0, 1)]
+    if None not in lower:
+        return merge(lower, kept)
+    width = 2.0 ** exponent
+    lo, hi = index * width, (index + 1) * width
+    for up in range(1, MAX_ZOOM_LEVELS + 1):
+        enclosing = cache.get((source, exponent + up, index >> up, per_tile))
+        if enclosing is not None:
+            x, y = enclosing
+            inside = slice(np.searchsorted(x, lo, 'right'), np.searchsorted(x, hi, 'left'))
+            if inside.stop - inside.start < _MIN_REFINE_SAMPLES:
+                return None
+            sandbox.check_deadline()
+            return refine(compiled, variable, x[inside], y[inside], lo, hi, kept)
+    return None
+
+
+def tile_layout(lo, hi, tiles_per_view=TILES_PER_VIEW):
+    """(tile_exponent, first_index, last_index) of the power-of-two tiles covering [lo, hi]."""
+    exponent = math.floor(math.log2((hi - lo) / tiles_per_view))
+    width = 2.0 ** exponent
+    return exponent, math.floor(lo / width), math.floor(hi / width)
+
+
+def plot(expression, lo, hi, points=DEFAULT_POINTS, threshold=DEFAULT_THRESHOLD, cache=None, budget=None):
+    """Samples f over [lo, hi] with about `points` points and downsamples it for display.
+
+    `expression` may use one variable (any name; a constant is plotted as a
+    flat line). Returns a PlotResult with the downsampled x and y arrays.
+    """
+    if not (math.isfinite(lo) and math.isfinite(hi) and lo < hi):
+        raise ExpressionError("The range must have lo < hi")
+    if not 2 <= points <= MAX_POINTS:
+        raise ExpressionError(f"points must be between 2 and {MAX_POINTS}")
+    cache = SHARED_PLOT_CACHE if cache is None else cache
+    source = expression.replace('^', '**').strip()
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        compiled = compile_vectorized(source)
+        if len(compiled.variables) > 1:
+            raise ExpressionError(f"Expected one variable, found {', '.join(sorted(compiled.variables))}")
+        variable = next(iter(compiled.variables), 'x')
+        # rand() gives new values on every call; its tiles are never reused.
+        cacheable = NONDETERMINISTIC_FUNCTIONS.isdisjoint(functions_used(compiled.tree))
+
+        start = time.perf_counter()
+        exponent, first, last = tile_layout(lo, hi)
+        width = 2.0 ** exponent
+        # A view covers between TILES_PER_VIEW and twice as many tiles, so this
+        # keeps the samples in view between points / 2 and points.
+        per_tile = max(32, points // (2 * TILES_PER_VIEW))
+        xs, ys = [], []
+        computed = cached = derived = 0
+        for index in range(first, last + 1):
+            key = (source, exponent, index, per_tile)
+            tile = cache.get(key) if cacheable else None
+            if tile is not None:
+                cached += 1
+            else:
+                if cacheable:
+                    tile = _derive_tile(cache, compiled, variable, source, exponent, index, per_tile)
+                if tile is not None:
+                    derived += 1
+                else:
+                    sandbox.check_deadline()
+                    tile = sample_adaptive(compiled, variable, index * width, (index + 1) * width, per_tile)
+                    computed += 1
+                if cacheable:
+                    cache.put(key, tile)
+            xs.append(tile[0])
+            ys.append(tile[1])
+    x = np.concatenate(xs)
+    y = np.concatenate(ys)
+    in_view = (x >= lo) & (x <= hi)
+    x, y = x[in_view], y[in_view]
+    evaluate_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    plot_x, plot_y = downsample(x, y, threshold)
+    downsample_ms = (time.perf_counter() - start) * 1000
+    return PlotResult(plot_x, plot_y, len(x), evaluate_ms, downsample_ms, computed, cached, derived)
@@ -0,0 +1,227 @@
+"""
+Optional process-pool backend for heavy expressions.
+
+Evaluation normally runs inline on the Streamlit script thread, so big integer
+work from one session holds the GIL for all of them. ProcessPoolBackend sends
+heavy expressions to a reusable concurrent.futures process pool instead and
+keeps cheap ones inline, where a round trip to a worker would cost more than
+the evaluation itself.
+
+The budget's deadline is enforced inside the worker, which evaluates under
+budget.active() from the moment it picks the task up, so time spent queued
+behind other sessions' work does not count against it. The parent only
+keeps a safety net for a task that has started and still not returned well
+after its deadline (a hung worker). A hung or crashed worker cannot be
+replaced on its own, because the executor breaks as a whole, so the
+executor is retired instead:
+
+1. new tasks go to a fresh executor at once;
+2. tasks still queued on the old one are handed back to their callers,
+   which submit them again to the new one;
+3. tasks already running there get one more limit's time to finish, then
+   the old workers are terminated.
+
+The caller whose task hung gets the usual "Error" result. Any other task
+that fails because its executor was retired is retried once on the new
+executor before it counts as a crash. The backend is meant to be created
+once per process (app.py holds it through st.cache_resource) and used as
+the `evaluator` of a ResultCache.
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures import wait as wait_futures
+from concurrent.futures.process import BrokenProcessPool
+
+from zhina_calc import sandbox
+from zhina_calc.cache import ErrorResult, calculate_uncached
+from zhina_calc.engine import SHARED_COMPILE_CACHE, BinOp, Call, Num, Unary, left_chain, parse
+from zhina_calc.errors import ExpressionError, TooExpensive
+
+# Operators and functions whose cost grows with the size of their result.
+HEAVY_OPERATORS = frozenset({'**'})
+HEAVY_FUNCTIONS = frozenset({'pow', 'factorial'})
+
+# How often a caller checks whether its queued task has started.
+_START_POLL = 0.05
+
+
+def is_heavy(node, max_literal_bits=4096):
+    """True when an (unfolded) AST may need big-integer work."""
+    kind = type(node)
+    if kind is Num:
+        return type(node.value) is int and node.value.bit_length() > max_literal_bits
+    if kind is Unary:
+        return is_heavy(node.operand, max_literal_bits)
+    if kind is BinOp:
+        first, steps = left_chain(node)
+        return (is_heavy(first, max_literal_bits)
+                or any(op in HEAVY_OPERATORS or is_heavy(right, max_literal_bits) for op, right in steps))
+    if kind is Call:
+        return node.func in HEAVY_FUNCTIONS or any(is_heavy(arg, max_literal_bits) for arg in node.args)
+    return False
+
+
+class ProcessPoolBackend:
+    """Evaluates heavy expressions in worker processes, cheap ones inline.
+
+    max_workers    -- pool size (None: one per CPU)
+    grace_seconds  -- extra wait on top of the budget's max_seconds before a
+                      started task's worker is considered hung and its
+                      executor is retired
+    max_source_len -- expressions longer than this are always sent to the pool
+    """
+
+    def __init__(self, max_workers=None, grace_seconds=0.5, max_source_len=500):
+        self.max_workers = max_workers
+        self.grace_seconds = grace_seconds
+        self.max_source_len = max_source_len
+        self._context = multiprocessing.get_context('spawn')
+        self._executor = None
+        self._lock = threading.Lock()  # guards the executor, the futures and the counters
+        self._futures = {}  # executor -> its unfinished futures
+        self.inline = 0
+        self.offloaded = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.retries = 0
+        self.recycles = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _submit(self, expression, budget):
+        """Submits to the current executor; returns (executor, future)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context)
+                self._futures[self._executor] = set()
+            executor = self._executor
+            try:
+                future = executor.submit(calculate_uncached, expression, budget)
+            except BrokenProcessPool as e:
+                # A worker died while the executor was idle.
+                broken = e
+            else:
+                broken = None
+                unfinished = self._futures[executor]
+                unfinished.add(future)
+        if broken is not None:
+            self._retire(executor, 0)
+            raise broken
+        future.add_done_callback(unfinished.discard)
+        return executor, future
+
+    def _retire(self, executor, drain_seconds):
+        """Stops sending tasks to `executor` (if still current) and winds it down in the background."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.recycles += 1
+        threading.Thread(target=self._drain, args=(executor, drain_seconds),
+                         name='zhina-pool-drain', daemon=True).start()
+
+    def _drain(self, executor, drain_seconds):
+        with self._lock:
+            unfinished = list(self._futures[executor])
+        # Tasks that have not left the queue are cancelled; their callers resubmit them.
+        for future in unfinished:
+            future.cancel()
+        wait_futures(unfinished, timeout=drain_seconds)
+        # A hung worker never returns from its task, so shutdown() alone would
+        # leave it running; terminate the processes directly.
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            del self._futures[executor]
+
+    def should_offload(self, expression):
+        if len(expression) > self.max_source_len:
+            return True
+        compiled = SHARED_COMPILE_CACHE.peek(expression)
+        if compiled is not None:
+            # Compiled here before, so its constants are already folded.
+            return is_heavy(compiled.tree)
+        try:
+            tree = parse(expression)
+        except ExpressionError:
+            return False
+        if is_heavy(tree):
+            return True
+        # Cheap to compile: do it now so the inline evaluation does not parse again.
+        SHARED_COMPILE_CACHE.get(expression, tree)
+        return False
+
+    def calculate_uncached(self, expression, budget=None):
+        """Same contract as zhina_calc.cache.calculate_uncached()."""
+        if not self.should_offload(expression):
+            self._count('inline')
+            return calculate_uncached(expression, budget)
+
+        budget = budget or sandbox.DEFAULT_BUDGET
+        self._count('offloaded')
+        limit = 2 * budget.max_seconds + self.grace_seconds if budget.max_seconds else 0
+        for retry in (False, True):
+            executor = None
+            try:
+                executor, future = self._submit(expression, budget)
+                return self._result(future, budget)
+            except FutureTimeout:
+                if not retry and self._executor is not executor:
+                    # Queued behind another task that hung; that one retired the executor.
+                    self._count('retries')
+                    continue
+                self._count('timeouts')
+                self._retire(executor, limit)
+                return ErrorResult(TooExpensive('time', budget.max_seconds)), False
+            except (BrokenProcessPool, CancelledError) as e:
+                # A worker died, possibly running another caller's task, or the
+                # executor was retired before this task ran.
+                if executor is not None:
+                    self._retire(executor, limit)
+                if not retry:
+                    self._count('retries')
+                    continue
+                self._count('crashes')
+                return ErrorResult(e), False
+
+    def _result(self, future, budget):
+        """future.result(), timing out only once the task has run far past its deadline."""
+        if not budget.max_seconds:
+            return future.result()
+        # A future counts as running from the moment it is handed to the pool's
+        # call queue, which holds one task beyond the busy workers; that task
+        # may still wait up to one budget for a free worker, hence the 2x.
+        limit = 2 * budget.max_seconds + self.grace_seconds
+        started = None
+        while True:
+            timeout = _START_POLL if started is None else max(started + limit - time.monotonic(), 0)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeout:
+                if started is not None:
+                    raise
+                if future.running():
+                    started = time.monotonic()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inline': self.inline,
+                'offloaded': self.offloaded,
+                'timeouts': self.timeouts,
+                'crashes': self.crashes,
+                'retries': self.retries,
+                'recycles': self.recycles,
+            }
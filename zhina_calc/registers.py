@@ -0,0 +1,118 @@
+"""
+Named memory registers: M1..M9 plus registers the user names.
+
+    >>> registers = MemoryRegisters()
+    >>> registers.add(2.5)            # M+ on the active register, M1
+    >>> registers.define('rate')
+    >>> registers.store(0.07, 'rate')
+    >>> registers.recall('rate')
+    0.07
+
+Values live in one array('d'), eight bytes per register, and names map to
+their slot through a dict. Sessions that never name a register share the
+module's tuple of default names and its index dict; define() and remove()
+build new ones, so the shared pair is never mutated.
+
+MR/M+/MC act on the `active` register. to_tuple()/from_tuple() give the
+plain form that CalculatorState snapshots and RegisterStore
+(zhina_calc.registers_db) persists.
+"""
+import re
+from array import array
+
+DEFAULT_NAMES = tuple(f'M{i}' for i in range(1, 10))
+MAX_REGISTERS = 64
+NAME_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{0,15}')
+
+_DEFAULT_INDEX = {name: i for i, name in enumerate(DEFAULT_NAMES)}
+
+
+class MemoryRegisters:
+    """Fixed-width float registers addressed by name; `active` is the one MR/M+/MC use."""
+    __slots__ = ('_names', '_index', '_values', 'active')
+
+    def __init__(self):
+        self._names = DEFAULT_NAMES
+        self._index = _DEFAULT_INDEX
+        self._values = array('d', bytes(8 * len(DEFAULT_NAMES)))
+        self.active = DEFAULT_NAMES[0]
+
+    def _slot(self, name):
+        try:
+            return self._index[self.active if name is None else name]
+        except KeyError:
+            raise KeyError(f"No memory register named {name!r}") from None
+
+    def recall(self, name=None):
+        return self._values[self._slot(name)]
+
+    def store(self, value, name=None):
+        self._values[self._slot(name)] = value
+
+    def add(self, value, name=None):
+        self._values[self._slot(name)] += value
+
+    def clear(self, name=None):
+        self._values[self._slot(name)] = 0.0
+
+    def select(self, name):
+        self._slot(name)
+        self.active = name
+
+    def define(self, name):
+        """Adds a register called `name` (holding 0); an existing name is left as it is."""
+        if name in self._index:
+            return
+        if not NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid register name {name!r}: use letters, digits and _, up to 16 characters")
+        if len(self._names) >= MAX_REGISTERS:
+            raise ValueError(f"At most {MAX_REGISTERS} memory registers")
+        self._names = self._names + (name,)
+        self._index = {**self._index, name: len(self._values)}
+        self._values.append(0.0)
+
+    def remove(self, name):
+        """Drops a user-named register; M1..M9 always exist."""
+        if name in DEFAULT_NAMES:
+            raise ValueError(f"{name} cannot be removed")
+        slot = self._slot(name)
+        names = self._names[:slot] + self._names[slot + 1:]
+        del self._values[slot]
+        self._names = names
+        self._index = {n: i for i, n in enumerate(names)}
+        if self.active == name:
+            self.active = DEFAULT_NAMES[0]
+
+    def names(self):
+        return self._names
+
+    def items(self):
+        return zip(self._names, self._values)
+
+    def to_tuple(self):
+        # Only the names beyond the defaults are stored.
+        return self.active, self._names[len(DEFAULT_NAMES):], tuple(self._values)
+
+    @classmethod
+    def from_tuple(cls, data):
+        active, extra, values = data
+        registers = cls()
+        for name in extra:
+            registers.define(name)
+        if len(values) != len(registers):
+            raise ValueError(f"Expected {len(registers)} register values, got {len(values)}")
+        registers._values = array('d', values)
+        registers.select(active)
+        return registers
+
+    def __len__(self):
+        return len(self._names)
+
+    def __eq__(self, other):
+        if not isinstance(other, MemoryRegisters):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __repr__(self):
+        used = ', '.join(f'{name}={value!r}' for name, value in self.items() if value)
+        return f"MemoryRegisters(active={self.active!r}{', ' if used else ''}{used})"
@@ -0,0 +1,123 @@
+"""
+Persistence for memory registers, written asynchronously and coalesced.
+
+    >>> store = RegisterStore('memory.sqlite3')
+    >>> store.save('alice', registers)       # returns at once
+    >>> store.load('alice')                  # what the next session starts with
+    MemoryRegisters(active='M1', M1=2.5)
+
+save() only records the latest snapshot for a profile in a dict; it never
+touches the disk, so M+ can call it on every press. A writer thread wakes on
+the first save, waits FLUSH_INTERVAL seconds for more and then writes every
+profile saved meanwhile in one transaction. However many times M+ is pressed
+in that window, each profile costs one row write. Rows are JSON, one per
+profile, in a SQLite database in WAL mode (see zhina_calc.history_db).
+
+load() is meant for session start; recalls are served by the session's own
+MemoryRegisters and never read the store. A profile is one row holding the
+whole register set: sessions saving the same profile overwrite each other,
+and the last save wins. app.py only saves sessions that name a profile.
+"""
+import atexit
+import json
+import threading
+import time
+
+from zhina_calc.history_db import connect
+from zhina_calc.registers import MemoryRegisters
+
+FLUSH_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS registers (
+    profile TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class RegisterStore:
+    """Latest MemoryRegisters per profile, flushed by one background thread."""
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._connection = connect(path)
+        self._connection.executescript(_SCHEMA)
+        # Guards the connection; the writer and flush()/load() share it.
+        self._db_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self.saves = 0
+        self.written = 0
+        self.batches = 0
+        self._writer = threading.Thread(target=self._write_loop, name='zhina-registers-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def save(self, profile, registers):
+        """Records `registers` as the latest state of `profile`; never blocks on disk."""
+        snapshot = registers.to_tuple()
+        with self._pending_lock:
+            self._pending[profile] = snapshot
+            self.saves += 1
+        self._wake.set()
+
+    def load(self, profile):
+        """The saved MemoryRegisters of `profile`, or None."""
+        with self._pending_lock:
+            snapshot = self._pending.get(profile)
+        if snapshot is None:
+            with self._db_lock:
+                row = self._connection.execute('SELECT data FROM registers WHERE profile = ?', (profile,)).fetchone()
+            if row is None:
+                return None
+            snapshot = json.loads(row[0])
+        return MemoryRegisters.from_tuple(snapshot)
+
+    def flush(self):
+        """Writes every pending save now."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [(profile, json.dumps(snapshot), time.time()) for profile, snapshot in pending.items()]
+        with self._db_lock:
+            with self._connection:
+                self._connection.execute('BEGIN')
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO registers (profile, data, updated) VALUES (?, ?, ?)', rows)
+        self.written += len(rows)
+        self.batches += 1
+
+    def close(self):
+        """Writes pending saves, stops the writer and closes the database."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._connection.close()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait()
+            # Saves arriving during this window are coalesced into the same write;
+            # close() cuts it short.
+            self._stop.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if self._closed:
+                return
+
+    def stats(self):
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {'saves': self.saves, 'written': self.written, 'batches': self.batches, 'pending': pending}
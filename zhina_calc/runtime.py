@@ -0,0 +1,54 @@
+"""
+Process-wide evaluation services behind calculate().
+
+An Engine bundles the state that must exist once per server process rather
+than once per session or per rerun: the shared result cache and, when enabled,
+the process pool for heavy expressions. It also sizes and reports on the
+process-wide compile cache (engine.SHARED_COMPILE_CACHE), which holds parsed
+and constant-folded expressions for every session. app.py creates it through
+st.cache_resource; the pool module (and with it multiprocessing) is only
+imported when workers are requested.
+"""
+from zhina_calc.cache import ResultCache
+from zhina_calc.engine import SHARED_COMPILE_CACHE
+
+
+class Engine:
+    """Result cache, compile cache and optional process pool, shared by every session."""
+
+    def __init__(self, cache_size=1024, workers=0, budget=None, compile_cache_size=None):
+        self.cache = ResultCache(maxsize=cache_size, budget=budget)
+        self.compile_cache = SHARED_COMPILE_CACHE
+        if compile_cache_size is not None:
+            self.compile_cache.resize(compile_cache_size)
+        self.workers = workers
+        self._pool = None
+
+    @property
+    def pool(self):
+        """The ProcessPoolBackend, created on first use (None without workers)."""
+        if self.workers <= 0:
+            return None
+        if self._pool is None:
+            from zhina_calc.pool import ProcessPoolBackend
+            self._pool = ProcessPoolBackend(max_workers=self.workers)
+        return self._pool
+
+    def calculate(self, expression):
+        """The display string for `expression`, as calculate() returns it."""
+        pool = self.pool
+        if pool is not None:
+            return self.cache.calculate(expression, pool.calculate_uncached)
+        return self.cache.calculate(expression)
+
+    def stats(self):
+        """Flat dict of cache (and pool) counters, e.g. for a metrics collector."""
+        stats = {f'result_cache_{k}': v for k, v in self.cache.stats().items()}
+        stats.update({f'compile_cache_{k}': v for k, v in self.compile_cache.stats().items()})
+        if self._pool is not None:
+            stats.update({f'eval_pool_{k}': v for k, v in self._pool.stats().items()})
+        return stats
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
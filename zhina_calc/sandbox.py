@@ -0,0 +1,173 @@
+"""
+Cost guard for expression evaluation.
+
+A single expression such as 9**9**9 used to keep the Streamlit script thread
+busy for minutes. The engine's multiplicative operators are the checked_*
+functions below: before doing any work they estimate the size of an integer
+result and raise TooExpensive if it is over the active Budget, and they cut
+an evaluation off once its wall-clock deadline has passed. Division, modulo
+and round() to tens make small results from big operands, so for them the
+estimate is of time instead: long division costs about quotient digits times
+divisor digits, modular pow() about one such multiply-and-reduce per exponent
+bit, and an operation that would end past the deadline is refused before it
+starts.
+
+The active budget is per thread, so sessions running on different Streamlit
+threads cannot see each other's limits:
+
+    with Budget(max_seconds=0.5).active():
+        compiled.evaluate()
+
+Outside of an `active()` block DEFAULT_BUDGET's size limits apply, without a
+deadline.
+"""
+import math
+import operator
+import threading
+import time
+from contextlib import contextmanager
+
+from zhina_calc.errors import TooExpensive
+
+
+class Budget:
+    """Limits for one evaluation.
+
+    max_seconds  -- wall-clock time for the whole evaluation
+    max_int_bits -- largest integer result any single operation may produce
+    max_exponent -- largest integer exponent accepted by '**' / pow()
+    """
+    __slots__ = ('max_seconds', 'max_int_bits', 'max_exponent')
+
+    def __init__(self, max_seconds=1.0, max_int_bits=1_000_000, max_exponent=1_000_000):
+        self.max_seconds = max_seconds
+        self.max_int_bits = max_int_bits
+        self.max_exponent = max_exponent
+
+    def __repr__(self):
+        return (f"Budget(max_seconds={self.max_seconds}, max_int_bits={self.max_int_bits}, "
+                f"max_exponent={self.max_exponent})")
+
+    @contextmanager
+    def active(self):
+        """Applies this budget, with a fresh deadline, to the current thread."""
+        previous = (_state.budget, _state.deadline)
+        _state.budget = self
+        _state.deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        try:
+            yield self
+        finally:
+            _state.budget, _state.deadline = previous
+
+
+DEFAULT_BUDGET = Budget()
+
+
+class _State(threading.local):
+    budget = DEFAULT_BUDGET
+    deadline = None
+
+
+_state = _State()
+
+
+def current_budget():
+    return _state.budget
+
+
+def check_deadline():
+    """Raises TooExpensive if the current thread's deadline has passed."""
+    deadline = _state.deadline
+    if deadline is not None and time.monotonic() > deadline:
+        raise TooExpensive('time', _state.budget.max_seconds)
+
+
+# Seconds per 30-bit digit step of CPython's long division (about 1.6e-9 on
+# the development machine; the lower figure errs towards letting work run).
+SECONDS_PER_DIGIT_OP = 1e-9
+
+
+def check_division_cost(dividend_bits, divisor_bits):
+    """Raises TooExpensive if dividing such integers would run past the deadline."""
+    deadline = _state.deadline
+    if deadline is None or dividend_bits < 100_000:
+        return
+    quotient_digits = max(dividend_bits - divisor_bits, 0) // 30 + 1
+    seconds = quotient_digits * (divisor_bits // 30 + 1) * SECONDS_PER_DIGIT_OP
+    if time.monotonic() + seconds > deadline:
+        raise TooExpensive('time', _state.budget.max_seconds)
+
+
+def check_modpow_cost(exponent_bits, modulus_bits):
+    """Raises TooExpensive if pow(base, exp, mod) on such integers would run past the deadline."""
+    deadline = _state.deadline
+    if deadline is None:
+        return
+    # One squaring or multiply per exponent bit, each followed by a reduction
+    # that costs about as much as long division of twice the modulus' digits.
+    modulus_digits = modulus_bits // 30 + 1
+    seconds = 2 * exponent_bits * modulus_digits * modulus_digits * SECONDS_PER_DIGIT_OP
+    if time.monotonic() + seconds > deadline:
+        raise TooExpensive('time', _state.budget.max_seconds)
+
+
+def check_bits(estimate):
+    """Raises TooExpensive if an integer of about `estimate` bits is over the budget."""
+    budget = _state.budget
+    if estimate > budget.max_int_bits:
+        raise TooExpensive('int_bits', budget.max_int_bits, estimate)
+
+
+# --- Checked operators (same results as the operator module) ---
+
+def checked_mul(a, b):
+    check_deadline()
+    if type(a) is int and type(b) is int:
+        check_bits(a.bit_length() + b.bit_length())
+    return a * b
+
+
+def checked_floordiv(a, b):
+    check_deadline()
+    if type(a) is int and type(b) is int:
+        check_division_cost(a.bit_length(), b.bit_length())
+    return operator.floordiv(a, b)
+
+
+def checked_mod(a, b):
+    check_deadline()
+    if type(a) is int and type(b) is int:
+        check_division_cost(a.bit_length(), b.bit_length())
+    return operator.mod(a, b)
+
+
+def checked_round(number, ndigits=None):
+    """round(); an int rounded to tens divides by 10**-ndigits, which is checked first."""
+    check_deadline()
+    if type(number) is int and type(ndigits) is int and ndigits < 0:
+        check_bits(-ndigits * math.log2(10))
+        check_division_cost(number.bit_length(), int(-ndigits * math.log2(10)) + 1)
+    if ndigits is None:
+        return round(number)
+    return round(number, ndigits)
+
+
+def checked_pow(a, b, mod=None):
+    check_deadline()
+    if mod is not None:
+        # Modular powers never grow past the modulus, but the time they take
+        # grows with the exponent's length and the square of the modulus'.
+        if type(a) is int and type(b) is int and type(mod) is int:
+            budget = _state.budget
+            if b.bit_length() > budget.max_exponent:
+                raise TooExpensive('exponent', budget.max_exponent, b.bit_length())
+            check_bits(mod.bit_length())
+            check_division_cost(a.bit_length(), mod.bit_length())
+            check_modpow_cost(b.bit_length(), mod.bit_length())
+        return pow(a, b, mod)
+    if type(a) is int and type(b) is int and b > 0 and abs(a) > 1:
+        budget = _state.budget
+        if b > budget.max_exponent:
+            raise TooExpensive('exponent', budget.max_exponent, b)
+        check_bits(b * math.log2(abs(a)))
+    return a ** b
@@ -0,0 +1,59 @@
+"""
+Scientific functions behind the keypad's sin/cos/tan/log/n!/Γ keys.
+
+The scalar functions here are the engine's builtins (engine.FUNCTIONS); the
+array versions in zhina_calc.vector follow the same rules element-wise. Both
+take radians and raise (or flag) where math does: log of a non-positive
+number, the gamma function at a pole, results too large for a float.
+
+factorial() is the only one whose cost grows with its input, so it has fast
+paths and a budget guard:
+
+    n <= 170        exact table lookup (every n! that fits in a float)
+    larger int n    math.factorial, CPython's binary-splitting product, after
+                    checking the result size (log2 n! from math.lgamma)
+                    against the active Budget
+    non-integer x   math.gamma(x + 1)
+"""
+import itertools
+import math
+import operator
+
+from zhina_calc import sandbox
+from zhina_calc.errors import ExpressionError
+
+# 170! is the largest factorial below the float64 limit.
+FACTORIAL_TABLE_MAX = 170
+FACTORIAL_TABLE = tuple(itertools.accumulate(range(1, FACTORIAL_TABLE_MAX + 1), operator.mul, initial=1))
+
+_LOG2_E = 1 / math.log(2)
+
+sin = math.sin
+cos = math.cos
+tan = math.tan
+gamma = math.gamma
+
+
+def log(x, base=None):
+    """Natural logarithm, or the logarithm to `base`."""
+    if base is None:
+        return math.log(x)
+    return math.log(x, base)
+
+
+def factorial_bits(n):
+    """Approximate bit length of n! for an int n >= 0."""
+    return math.lgamma(n + 1) * _LOG2_E
+
+
+def factorial(x):
+    """n! for ints (exact), gamma(x + 1) for other numbers."""
+    if type(x) is int:
+        if x < 0:
+            raise ExpressionError("factorial() of a negative integer")
+        if x <= FACTORIAL_TABLE_MAX:
+            return FACTORIAL_TABLE[x]
+        sandbox.check_deadline()
+        sandbox.check_bits(factorial_bits(x))
+        return math.factorial(x)
+    return math.gamma(x + 1)
@@ -0,0 +1,454 @@
+"""
+HTTP evaluation service: the engine behind calculate(), without Streamlit.
+
+    python -m zhina_calc.server --port 8765
+
+    POST /eval        {"expression": "2^10"}
+                      -> {"result": "1024", "error": null}
+                      {"expression": "x * (1 + r)", "variables": {"x": 100, "r": 0.07}}
+                      -> {"result": 107.0, "error": null}
+    POST /eval/batch  {"expressions": ["1+1", "1/0"]}
+                      -> {"results": ["2", "Error"], "errors": [null, "division by zero"]}
+                      {"expression": "x * 2", "variables": {"x": [1, 2, 3]}}
+                      -> {"results": [2.0, 4.0, 6.0], "errors": [null, null, null]}
+    GET  /stats       counters, including the shared caches'
+
+An expression on its own gets the display string calculate() would show
+("Error" included), through the same Engine (result cache, compile cache and
+optional process pool; zhina_calc.runtime). With variables the expression is
+evaluated element-wise on float64 (zhina_calc.vector) and results are JSON
+numbers, null where there is no value.
+
+Requests are not evaluated one by one. Handlers put them on a queue and one
+batcher task takes everything waiting, up to `max_batch` items (waiting at
+most `max_wait` seconds for more after the first), and evaluates the batch
+in one call on an evaluation thread. Within a batch, repeated expressions
+are evaluated once, and requests with variables that share an expression
+are concatenated and evaluated as one NumPy pass. Under load, the queue
+fills while the running batches run, so batches grow with the request rate.
+
+Every expression runs under the budget (Budget.max_seconds each), so a batch
+may take up to max_seconds per distinct expensive expression in it. Batches
+run on `eval_threads` threads (default 2) so that one such batch does not
+hold up the next. Evaluation holds the GIL, so more threads buy fairness
+rather than throughput, unless heavy expressions go to worker processes
+(--workers).
+
+Backpressure: at most `max_pending` items may be queued or running. A
+request that would go over the limit is answered at once with 503 and a
+Retry-After header instead of waiting in an unbounded queue.
+
+The HTTP layer is a small HTTP/1.1 implementation on asyncio streams
+(keep-alive, Content-Length bodies only); put a real proxy in front of it
+for anything beyond internal use. NumPy is imported with the first request
+that has variables.
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from zhina_calc import metrics, sandbox
+from zhina_calc.cache import ErrorResult
+from zhina_calc.errors import ExpressionError
+from zhina_calc.runtime import Engine
+
+MAX_BATCH = 1024
+MAX_WAIT = 0.001
+MAX_PENDING = 10_000
+EVAL_THREADS = 2
+# Largest request body, and most items in one /eval/batch request.
+MAX_BODY = 1 << 20
+MAX_BATCH_ITEMS = 10_000
+# Most header lines in one request; a single line is limited by the stream
+# reader's buffer (64 KiB).
+MAX_HEADERS = 100
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            411: 'Length Required', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+class Job:
+    """One request: `expressions` alone, or one expression with `variables` of length `size`."""
+    __slots__ = ('expressions', 'variables', 'size')
+
+    def __init__(self, expressions, variables=None, size=None):
+        self.expressions = expressions
+        self.variables = variables
+        self.size = len(expressions) if size is None else size
+
+
+# --- Evaluation (runs on the evaluation threads) ---
+
+def _calculate_all(engine, jobs, outcomes):
+    results = {}
+    for i, job in jobs:
+        values = []
+        for expression in job.expressions:
+            result = results.get(expression)
+            if result is None:
+                result = results[expression] = engine.calculate(expression)
+            values.append(result)
+        outcomes[i] = (values, [str(v.error) if type(v) is ErrorResult else None for v in values])
+
+
+def _vectorize_all(jobs, budget, outcomes):
+    import numpy as np
+
+    from zhina_calc.vector import compile_vectorized
+
+    groups = {}
+    for i, job in jobs:
+        groups.setdefault((job.expressions[0], frozenset(job.variables)), []).append((i, job))
+    for (expression, names), group in groups.items():
+        try:
+            with (budget or sandbox.DEFAULT_BUDGET).active():
+                compiled = compile_vectorized(expression.replace('^', '**').strip())
+                # Every request in the group becomes a slice of one set of input arrays.
+                arrays = {name: np.concatenate([np.broadcast_to(np.asarray(job.variables[name], dtype=np.float64),
+                                                                (job.size,)) for _, job in group])
+                          for name in names & compiled.variables}
+                result = compiled.evaluate(arrays)
+            values = np.broadcast_to(result.values, (sum(job.size for _, job in group),)).tolist()
+        except (ExpressionError, ArithmeticError, ValueError, TypeError) as e:
+            for i, job in group:
+                outcomes[i] = ([None] * job.size, [str(e)] * job.size)
+            continue
+        start = 0
+        for i, job in group:
+            chunk = [value if math.isfinite(value) else None for value in values[start:start + job.size]]
+            start += job.size
+            outcomes[i] = (chunk, [None if value is not None else "No finite value for these inputs"
+                                   for value in chunk])
+
+
+def evaluate_jobs(engine, jobs, budget=None):
+    """Evaluates a micro-batch of Jobs; returns (results, errors) for each, in order."""
+    outcomes = [None] * len(jobs)
+    _calculate_all(engine, [(i, job) for i, job in enumerate(jobs) if job.variables is None], outcomes)
+    vector = [(i, job) for i, job in enumerate(jobs) if job.variables is not None]
+    if vector:
+        _vectorize_all(vector, budget or engine.cache.budget, outcomes)
+    return outcomes
+
+
+# --- Request parsing ---
+
+def _expression(value):
+    if not isinstance(value, str) or not value.strip():
+        raise HttpError(400, "'expression' must be a non-empty string")
+    return value
+
+
+def _variables(value, batch):
+    if not isinstance(value, dict):
+        raise HttpError(400, "'variables' must be an object of name: number")
+    lengths = set()
+    for name, item in value.items():
+        if batch and isinstance(item, list):
+            if not all(_is_number(v) for v in item):
+                raise HttpError(400, f"'variables.{name}' must hold numbers only")
+            if len(item) != 1:
+                lengths.add(len(item))
+        elif not _is_number(item):
+            raise HttpError(400, f"'variables.{name}' must be a number" + (" or a list of numbers" if batch else ""))
+    if len(lengths) > 1:
+        raise HttpError(400, "Variable lists must all have the same length")
+    return value, lengths.pop() if lengths else 1
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_job(path, body):
+    """The Job for a request body sent to `path`; raises HttpError(400) when it is invalid."""
+    try:
+        request = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        raise HttpError(400, "The body must be JSON") from None
+    if not isinstance(request, dict):
+        raise HttpError(400, "The body must be a JSON object")
+    batch = path == '/eval/batch'
+    if batch and 'expressions' in request:
+        expressions = request['expressions']
+        if not isinstance(expressions, list):
+            raise HttpError(400, "'expressions' must be a list of strings")
+        return Job([_expression(e) for e in expressions])
+    expression = _expression(request.get('expression'))
+    if request.get('variables'):
+        variables, size = _variables(request['variables'], batch)
+        return Job([expression], variables, size)
+    return Job([expression])
+
+
+# --- Server ---
+
+class EvalServer:
+    """asyncio HTTP front end that micro-batches requests for one Engine."""
+
+    def __init__(self, engine=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_pending=MAX_PENDING,
+                 budget=None, eval_threads=EVAL_THREADS):
+        self.engine = engine or Engine(cache_size=4096, budget=budget)
+        self.budget = budget
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.eval_threads = eval_threads
+        self.pending = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.batched_items = 0
+        self.largest_batch = 0
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._running = set()
+        self._executor = ThreadPoolExecutor(max_workers=eval_threads, thread_name_prefix='zhina-eval')
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """Starts listening; returns the asyncio.Server."""
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.eval_threads)
+        self._batcher = asyncio.create_task(self._batch_loop())
+        return await asyncio.start_server(self._connection, host, port)
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+        for task in list(self._running):
+            task.cancel()
+        self._executor.shutdown(wait=True)
+        self.engine.shutdown()
+
+    async def submit(self, path, body):
+        """Queues one request body; returns its (results, errors) once its batch has run."""
+        job = parse_job(path, body)
+        if job.size > MAX_BATCH_ITEMS:
+            raise HttpError(413, f"At most {MAX_BATCH_ITEMS} items per request")
+        if self.pending + job.size > self.max_pending:
+            self.rejected += 1
+            raise HttpError(503, "Too many pending requests, retry shortly", (('Retry-After', '1'),))
+        future = asyncio.get_running_loop().create_future()
+        self.pending += job.size
+        self._queue.put_nowait((job, future))
+        try:
+            return await future
+        finally:
+            self.pending -= job.size
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Collect the next batch only once a thread is free for it, so
+            # requests keep queueing (and batches grow) while all are busy.
+            await self._slots.acquire()
+            waiting = [await self._queue.get()]
+            size = waiting[0][0].size
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                waiting.append(item)
+                size += item[0].size
+            self.batches += 1
+            self.batched_items += size
+            self.largest_batch = max(self.largest_batch, size)
+            task = asyncio.create_task(self._run_batch(waiting))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, waiting):
+        loop = asyncio.get_running_loop()
+        try:
+            with metrics.timer('server_batch'):
+                outcomes = await loop.run_in_executor(
+                    self._executor, evaluate_jobs, self.engine, [job for job, _ in waiting], self.budget)
+        except Exception as e:
+            outcomes = None
+            error = e
+        finally:
+            self._slots.release()
+        for i, (_, future) in enumerate(waiting):
+            if future.done():  # the client went away
+                continue
+            if outcomes is None:
+                future.set_exception(error)
+            else:
+                future.set_result(outcomes[i])
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as e:
+                    # The rest of the stream cannot be trusted after a malformed request.
+                    _write_response(writer, e.status, {'error': str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                try:
+                    status, payload, headers = 200, await self._route(method, path, body), ()
+                except HttpError as e:
+                    status, payload, headers = e.status, {'error': str(e)}, e.headers
+                except Exception as e:
+                    # A bug, not a bad request: answer it, and keep serving.
+                    self.failed += 1
+                    traceback.print_exception(e, file=sys.stderr)
+                    status, payload, headers = 500, {'error': "Internal server error"}, ()
+                _write_response(writer, status, payload, keep_alive, headers)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path in ('/eval', '/eval/batch'):
+            if method != 'POST':
+                raise HttpError(405, "Use POST")
+            self.requests += 1
+            results, errors = await self.submit(path, body)
+            if path == '/eval':
+                return {'result': results[0], 'error': errors[0]}
+            return {'results': results, 'errors': errors}
+        if path == '/stats':
+            if method != 'GET':
+                raise HttpError(405, "Use GET")
+            return self.stats()
+        raise HttpError(404, f"No route for {path}")
+
+    def stats(self):
+        stats = {'requests': self.requests, 'rejected': self.rejected, 'failed': self.failed,
+                 'pending': self.pending,
+                 'batches': self.batches, 'batched_items': self.batched_items,
+                 'largest_batch': self.largest_batch}
+        stats.update(self.engine.stats())
+        return stats
+
+
+async def _readline(reader):
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # The line does not fit the reader's buffer.
+        raise HttpError(431, "Request line or header field too large") from None
+
+
+async def _read_request(reader):
+    """(method, path, keep_alive, body) for the next request, or None at end of stream."""
+    line = await _readline(reader)
+    if not line.strip():
+        return None
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line") from None
+    headers = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await _readline(reader)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(431, f"More than {MAX_HEADERS} header fields")
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    body = b''
+    if method == 'POST':
+        if 'content-length' not in headers:
+            raise HttpError(411, "Content-Length is required")
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length") from None
+        if length > MAX_BODY:
+            raise HttpError(413, f"Body over {MAX_BODY} bytes")
+        body = await reader.readexactly(length)
+    return method, target.partition('?')[0], keep_alive, body
+
+
+def _write_response(writer, status, payload, keep_alive, headers=()):
+    body = json.dumps(payload).encode()
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            'Content-Type: application/json',
+            f'Content-Length: {len(body)}',
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+            *(f'{name}: {value}' for name, value in headers)]
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m zhina_calc.server',
+                                     description="Serve the calculator engine over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="port (default: 8765)")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH,
+                        help=f"items evaluated together at most (default: {MAX_BATCH})")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT * 1000,
+                        help=f"how long a batch waits for more requests (default: {MAX_WAIT * 1000:g})")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help=f"queued items before answering 503 (default: {MAX_PENDING})")
+    parser.add_argument('--eval-threads', type=int, default=EVAL_THREADS,
+                        help=f"batches evaluated at the same time (default: {EVAL_THREADS})")
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help="worker processes for heavy expressions (default: 0, inline)")
+    parser.add_argument('--max-seconds', type=float, default=1.0,
+                        help="wall-clock budget per expression (default: 1.0)")
+    return parser
+
+
+async def serve(args):
+    budget = sandbox.Budget(max_seconds=args.max_seconds)
+    server = EvalServer(Engine(cache_size=4096, workers=args.workers, budget=budget), max_batch=args.max_batch,
+                        max_wait=args.max_wait_ms / 1000, max_pending=args.max_pending, budget=budget,
+                        eval_threads=args.eval_threads)
+    listener = await server.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr, flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.max_batch < 1 or args.max_pending < 1 or args.eval_threads < 1:
+        build_parser().error("--max-batch, --max-pending and --eval-threads must be at least 1")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Real roots of an equation in one variable.
+
+    >>> solve('x^3 - 2*x = 5').roots
+    (2.0945514815423265,)
+
+The equation `lhs = rhs` becomes f(x) = lhs - rhs and is compiled once, both
+for NumPy (zhina_calc.vector) and as a scalar CompiledExpression. Root
+finding then takes two passes:
+
+1. scan: f is evaluated over a grid of `samples` points across [lo, hi] in
+   a single vectorized call; every adjacent pair where f changes sign
+   brackets a root (grid points where f is exactly 0 are roots already).
+2. refine: Brent's method narrows each bracket with the scalar compiled
+   expression, a few microseconds per step.
+
+Sign changes across a pole (tan(x), 1/x) also look like brackets; they are
+dropped when |f| at the converged point is not far below its value at the
+bracket's ends. A root where f touches zero without crossing it, such as
+x = 1 in (x-1)^2, is only found if it falls on a grid point.
+
+NumPy is only imported when this module is.
+"""
+import functools
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from zhina_calc import sandbox
+from zhina_calc.engine import BinOp, CompiledExpression, free_variables, parse
+from zhina_calc.errors import ExpressionError
+from zhina_calc.vector import VectorizedExpression
+
+SolveResult = namedtuple('SolveResult', 'variable roots brackets evaluations')
+
+DEFAULT_RANGE = (-100.0, 100.0)
+DEFAULT_SAMPLES = 4001
+
+
+class Equation:
+    """An equation compiled to f(x) = lhs - rhs, scalar and vectorized."""
+    __slots__ = ('source', 'variable', 'scalar', 'vectorized')
+
+    def __init__(self, source, variable=None):
+        self.source = source
+        sides = source.replace('==', '=').split('=')
+        if len(sides) > 2:
+            raise ExpressionError("An equation has at most one '='")
+        lhs = parse(sides[0])
+        tree = BinOp('-', lhs, parse(sides[1])) if len(sides) == 2 else lhs
+        names = free_variables(tree)
+        if variable is None:
+            if len(names) != 1:
+                found = ', '.join(sorted(names)) or 'none'
+                raise ExpressionError(f"Expected exactly one variable, found {found}")
+            variable = names.pop()
+        elif names - {variable}:
+            raise ExpressionError(f"Unknown names: {', '.join(sorted(names - {variable}))}")
+        self.variable = variable
+        self.scalar = CompiledExpression(source, tree)
+        self.vectorized = VectorizedExpression(source, tree)
+
+    def __call__(self, x):
+        """f(x) for one float; NaN where the expression has no value."""
+        try:
+            return float(self.scalar.evaluate({self.variable: x}))
+        except (ArithmeticError, ValueError, TypeError):
+            return math.nan
+
+    def __repr__(self):
+        return f"Equation({self.source!r})"
+
+
+@functools.lru_cache(maxsize=128)
+def compile_equation(source, variable=None):
+    return Equation(source, variable)
+
+
+def brent(f, a, b, fa, fb, xtol=1e-15, rtol=4 * np.finfo(float).eps, maxiter=100):
+    """Brent's method on a bracket [a, b] with f(a), f(b) of opposite signs.
+
+    Follows the classic formulation (as in SciPy's brentq): inverse quadratic
+    or secant steps while they shrink the bracket fast enough, bisection
+    otherwise. Returns (root, evaluations).
+    """
+    previous, current = a, b
+    f_previous, f_current = fa, fb
+    block = f_block = 0.0
+    step_before = step = 0.0
+    for evaluations in range(maxiter):
+        if f_previous != 0 and f_current != 0 and (f_previous < 0) != (f_current < 0):
+            block, f_block = previous, f_previous
+            step_before = step = current - previous
+        if abs(f_block) < abs(f_current):
+            previous, current, block = current, block, current
+            f_previous, f_current, f_block = f_current, f_block, f_current
+        delta = (xtol + rtol * abs(current)) / 2
+        bisect = (block - current) / 2
+        if f_current == 0 or abs(bisect) < delta:
+            return current, evaluations
+        if abs(step_before) > delta and abs(f_current) < abs(f_previous):
+            if previous == block:
+                # secant
+                trial = -f_current * (current - previous) / (f_current - f_previous)
+            else:
+                # inverse quadratic interpolation
+                d_previous = (f_previous - f_current) / (previous - current)
+                d_block = (f_block - f_current) / (block - current)
+                trial = -f_current * (f_block * d_block - f_previous * d_previous) / (
+                    d_block * d_previous * (f_block - f_previous))
+            if 2 * abs(trial) < min(abs(step_before), 3 * abs(bisect) - delta):
+                step_before, step = step, trial
+            else:
+                step_before = step = bisect
+        else:
+            step_before = step = bisect
+        previous, f_previous = current, f_current
+        current += step if abs(step) > delta else math.copysign(delta, bisect)
+        f_current = f(current)
+        if math.isnan(f_current):
+            break
+    return current, maxiter
+
+
+def solve(equation, lo=None, hi=None, samples=DEFAULT_SAMPLES, variable=None, budget=None):
+    """All real roots of `equation` in [lo, hi], as a SolveResult.
+
+    `roots` is sorted; `brackets` counts the sign changes found by the scan
+    and `evaluations` the scalar evaluations Brent's method needed.
+    """
+    if lo is None or hi is None:
+        lo, hi = DEFAULT_RANGE
+    if not lo < hi:
+        raise ExpressionError("The range must have lo < hi")
+    if samples < 2:
+        raise ExpressionError("At least 2 samples are needed")
+    with (budget or sandbox.DEFAULT_BUDGET).active():
+        f = compile_equation(equation.replace('^', '**').strip(), variable)
+        x = np.linspace(lo, hi, samples)
+        y = f.vectorized.evaluate({f.variable: x}).values
+
+        roots = x[y == 0].tolist()
+        left, right = y[:-1], y[1:]
+        crossing = np.flatnonzero((np.signbit(left) != np.signbit(right))
+                                  & np.isfinite(left) & np.isfinite(right)
+                                  & (left != 0) & (right != 0))
+        evaluations = 0
+        for i in crossing:
+            sandbox.check_deadline()
+            root, steps = brent(f, float(x[i]), float(x[i + 1]), float(y[i]), float(y[i + 1]))
+            evaluations += steps
+            value = abs(f(root))
+            # A pole makes |f| blow up instead of vanishing.
+            if value <= 1e-9 or value < 1e-3 * min(abs(y[i]), abs(y[i + 1])):
+                roots.append(root)
+    roots.sort()
+    unique = []
+    for root in roots:
+        if not unique or root - unique[-1] > 1e-9 * max(1.0, abs(root)):
+            unique.append(float(root))
+    return SolveResult(f.variable, tuple(unique), len(crossing), evaluations)
@@ -0,0 +1,116 @@
+"""
+Compact per-session calculator state.
+
+Everything a session needs lives in one CalculatorState instead of loose
+st.session_state keys plus a ZhinaScientificCalculator instance per user:
+
+    current_input  the number on the display (a string, as typed)
+    expression     the pending expression line shown above it
+    registers      the named memory registers (M1..M9 and user-named ones);
+                   `memory` is the active one, which M+/MR/MC use
+    mode           number mode, one of MODES (see zhina_calc.arithmetic)
+    precision      significant digits in 'decimal' mode
+    chain          the RunningChain behind the live preview and '='
+    history        the session's recent '=' results (a HistoryRing)
+
+The class uses __slots__, so an instance has no per-object __dict__.
+to_bytes()/from_bytes() snapshot and restore it with marshal, which is fast
+and compact. from_bytes() must only be given bytes that to_bytes() produced;
+marshal data is not safe to load from untrusted sources.
+"""
+import marshal
+
+from zhina_calc.arithmetic import DEFAULT_DECIMAL_PRECISION, MODES, arithmetic_for
+from zhina_calc.history import HistoryRing
+from zhina_calc.incremental import RunningChain
+from zhina_calc.registers import MemoryRegisters
+
+_FORMAT = 4
+
+
+class CalculatorState:
+    __slots__ = ('current_input', 'expression', 'registers', 'mode', 'precision', 'chain', 'history')
+
+    def __init__(self, current_input='0', expression='', memory=0, mode='standard',
+                 precision=DEFAULT_DECIMAL_PRECISION, chain=None, history=None, registers=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}")
+        self.current_input = current_input
+        self.expression = expression
+        self.registers = registers if registers is not None else MemoryRegisters()
+        if memory:
+            self.registers.store(memory)
+        self.mode = mode
+        self.precision = precision
+        self.chain = chain if chain is not None else RunningChain(arithmetic_for(mode, precision))
+        self.history = history if history is not None else HistoryRing()
+
+    @property
+    def memory(self):
+        """The active memory register's value."""
+        return self.registers.recall()
+
+    @memory.setter
+    def memory(self, value):
+        self.registers.store(value)
+
+    def set_mode(self, mode, precision=None):
+        """Switches the number mode; the chain in progress is cleared, since its
+        values belong to the old mode."""
+        precision = self.precision if precision is None else precision
+        arithmetic = arithmetic_for(mode, precision)  # validates both
+        self.mode = mode
+        self.precision = precision
+        self.chain = RunningChain(arithmetic)
+        self.current_input = '0'
+        self.expression = ''
+
+    def clear(self):
+        """The 'C' key: resets the display and pending expression, keeps memory, mode and history."""
+        self.current_input = '0'
+        self.expression = ''
+        self.chain.reset()
+
+    def to_bytes(self):
+        # str() drops ErrorResult's attached exception; the text is what matters.
+        return marshal.dumps((
+            _FORMAT,
+            str(self.current_input),
+            str(self.expression),
+            self.registers.to_tuple(),
+            self.mode,
+            self.precision,
+            self.chain.to_tuple(),
+            self.history.to_tuple(),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data):
+        fields = marshal.loads(data)
+        version = fields[0]
+        if version == 1:
+            # Format 1 predates number modes.
+            fields = fields[:5] + (DEFAULT_DECIMAL_PRECISION,) + fields[5:]
+        elif version not in (2, 3, _FORMAT):
+            raise ValueError(f"Unsupported CalculatorState format {version}")
+        if version < 3:
+            # Formats 1 and 2 predate the history.
+            fields = fields + (None,)
+        _, current_input, expression, memory, mode, precision, chain, history = fields
+        registers = None
+        if version >= 4:
+            registers = MemoryRegisters.from_tuple(memory)
+            memory = 0
+        # Formats 1-3 held one memory value, which becomes M1.
+        chain = RunningChain.from_tuple(chain, arithmetic_for(mode, precision))
+        history = HistoryRing.from_tuple(history) if history is not None else None
+        return cls(current_input, expression, memory, mode, precision, chain, history, registers)
+
+    def __eq__(self, other):
+        if not isinstance(other, CalculatorState):
+            return NotImplemented
+        return self.to_bytes() == other.to_bytes()
+
+    def __repr__(self):
+        return (f"CalculatorState(current_input={self.current_input!r}, expression={self.expression!r}, "
+                f"registers={self.registers!r}, mode={self.mode!r}, precision={self.precision!r})")
@@ -0,0 +1,352 @@
+"""
+Variables and user functions that recompute like a spreadsheet.
+
+    >>> ws = Workspace()
+    >>> ws.define('rate = 0.07')
+    ['rate']
+    >>> ws.define('f(x) = x * (1 + rate)')
+    ['f']
+    >>> ws.define('total = f(100) + f(50)')
+    ['total']
+    >>> ws.define('other = 2 * 21')
+    ['other']
+    >>> ws.define('rate = 0.25')          # only what depends on rate reruns
+    ['rate', 'f', 'total']
+    >>> ws.value('total')
+    187.5
+
+Every definition is a cell in a dependency graph. A cell's dependencies are
+the variables it reads and the user functions it calls; the graph also keeps
+the reverse edges, so a change walks only its dependents. define() and
+remove() return the names they recomputed, in the order they ran:
+
+1. invalidation collects the changed cell and everything downstream of it;
+2. those cells are sorted topologically (Kahn's algorithm over that subgraph
+   only) and recomputed in order, each from its dependencies' memoized
+   values. A cell whose inputs all came out unchanged is skipped, so the
+   walk stops early when a change makes no difference.
+
+An update therefore costs time proportional to the affected subgraph, not to
+the number of cells. A definition that would close a cycle (a = b + 1 with
+b = a * 2, or a function calling itself) is refused with an ExpressionError
+naming the cycle, and the workspace is left as it was.
+
+User functions are inlined: a call f(arg) is replaced by f's body with the
+argument substituted for the parameter, so every variable cell compiles to a
+plain engine CompiledExpression. Parameters are renamed to '$0', '$1', ...
+before substitution, which no user name can clash with. Cells are compiled
+again only when a function they call changes; new values of variables only
+re-evaluate them. Names may be used before they are defined; the cell shows
+an error until they are.
+"""
+from collections import deque
+
+from zhina_calc import sandbox
+from zhina_calc.engine import (
+    CONSTANTS,
+    FUNCTIONS,
+    BinOp,
+    Call,
+    CompiledExpression,
+    Name,
+    Unary,
+    free_variables,
+    functions_used,
+    left_chain,
+    parse,
+)
+from zhina_calc.errors import ExpressionError
+
+# Largest expression (in AST nodes) that inlining may produce; f(f(f(...)))
+# with a parameter used twice doubles in size at every level.
+MAX_INLINED_NODES = 10_000
+
+
+def _is_identifier(name):
+    return name.isidentifier() and name.isascii()
+
+
+def split_definition(line):
+    """'name = expr' -> (name, None, expr); 'f(x, y) = expr' -> ('f', ('x', 'y'), expr)."""
+    lhs, sep, rhs = line.partition('=')
+    if not sep or rhs.startswith('='):
+        raise ExpressionError("A definition looks like 'name = expression' or 'f(x) = expression'")
+    lhs = lhs.strip()
+    params = None
+    if lhs.endswith(')') and '(' in lhs:
+        lhs, _, inner = lhs[:-1].partition('(')
+        lhs = lhs.strip()
+        params = tuple(p.strip() for p in inner.split(',')) if inner.strip() else ()
+    return lhs, params, rhs.strip()
+
+
+class _Cell:
+    __slots__ = ('name', 'params', 'source', 'tree', 'deps', 'code', 'value', 'error')
+
+    def __init__(self, name, params, source, tree, deps):
+        self.name = name
+        self.params = params  # None for a variable, a tuple of names for a function
+        self.source = source
+        self.tree = tree
+        self.deps = deps
+        self.code = None  # CompiledExpression (variable) or inlined body (function)
+        self.value = None
+        self.error = None
+
+    @property
+    def is_function(self):
+        return self.params is not None
+
+    def definition(self):
+        if self.is_function:
+            return f"{self.name}({', '.join(self.params)}) = {self.source}"
+        return f"{self.name} = {self.source}"
+
+
+class Workspace:
+    """Named variables and functions with dependency-tracked recomputation."""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self._cells = {}
+        # name -> names of the cells that use it, including names not defined (yet)
+        self._dependents = {}
+
+    # --- Defining ---
+
+    def define(self, line):
+        """Adds or replaces the cell defined by `line`; returns the names recomputed."""
+        name, params, source = split_definition(line)
+        return self.set(name, source, params)
+
+    def set(self, name, source, params=None):
+        """Defines variable `name` (params None) or function `name(*params)` as `source`."""
+        if not _is_identifier(name):
+            raise ExpressionError(f"Invalid name {name!r}")
+        if name in CONSTANTS or name in FUNCTIONS:
+            raise ExpressionError(f"{name!r} is a built-in name")
+        if params is not None:
+            params = tuple(params)
+            for param in params:
+                if not _is_identifier(param) or param in CONSTANTS:
+                    raise ExpressionError(f"Invalid parameter {param!r}")
+            if len(set(params)) != len(params):
+                raise ExpressionError(f"Repeated parameter in {name}({', '.join(params)})")
+        tree = parse(source, any_function=True)
+        deps = frozenset((free_variables(tree) - set(params or ()))
+                         | (functions_used(tree) - FUNCTIONS.keys()))
+        cycle = self._path(deps, name)
+        if cycle is not None:
+            raise ExpressionError(f"Circular reference: {' -> '.join([name, *cycle])}")
+
+        old = self._cells.get(name)
+        cell = _Cell(name, params, source.strip(), tree, deps)
+        # A variable that became a function (or the reverse), or a function
+        # whose parameters changed, is a different cell to every user of it.
+        relink = old is not None and old.params != params
+        if old is not None:
+            self._unlink(old)
+            if not relink:
+                # Kept for comparison: an unchanged result does not propagate.
+                cell.code, cell.value, cell.error = old.code, old.value, old.error
+        self._cells[name] = cell
+        for dep in deps:
+            self._dependents.setdefault(dep, set()).add(name)
+        return self._propagate(name, relink)
+
+    def remove(self, name):
+        """Deletes a cell; cells using it show an error. Returns the names recomputed."""
+        cell = self._cells.pop(name)
+        self._unlink(cell)
+        return self._propagate(name)
+
+    def _unlink(self, cell):
+        for dep in cell.deps:
+            users = self._dependents.get(dep)
+            if users is not None:
+                users.discard(cell.name)
+                if not users:
+                    del self._dependents[dep]
+
+    def _path(self, starts, target):
+        """A dependency path from one of `starts` to `target`, or None (depth-first)."""
+        parents = {}
+        stack = list(starts)
+        for start in starts:
+            parents[start] = None
+        while stack:
+            name = stack.pop()
+            if name == target:
+                path = [name]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            cell = self._cells.get(name)
+            if cell is None:
+                continue
+            for dep in cell.deps:
+                if dep not in parents:
+                    parents[dep] = name
+                    stack.append(dep)
+        return None
+
+    # --- Recomputing ---
+
+    def _affected(self, source):
+        """`source` and every cell downstream of it, in topological order."""
+        seen = {source}
+        queue = deque([source])
+        while queue:
+            for user in self._dependents.get(queue.popleft(), ()):
+                if user not in seen:
+                    seen.add(user)
+                    queue.append(user)
+        # Kahn's algorithm, counting only edges inside the affected subgraph.
+        waiting = {}
+        for name in seen:
+            cell = self._cells.get(name)
+            waiting[name] = sum(dep in seen for dep in cell.deps) if cell is not None else 0
+        ready = deque(name for name, count in waiting.items() if count == 0)
+        order = []
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for user in self._dependents.get(name, ()):
+                if user in waiting:
+                    waiting[user] -= 1
+                    if waiting[user] == 0:
+                        ready.append(user)
+        return order
+
+    def _propagate(self, source, relink=False):
+        changed = set()   # cells whose value (or, for functions, result) may differ
+        relinked = set()  # functions whose inlined body differs, and removed or redefined names
+        if relink or source not in self._cells:
+            changed.add(source)
+            relinked.add(source)
+        recomputed = []
+        for name in self._affected(source):
+            cell = self._cells.get(name)
+            if cell is None or (name != source and cell.deps.isdisjoint(changed)):
+                continue
+            recomputed.append(name)
+            before = (cell.code if cell.is_function else cell.value, cell.error)
+            if name == source or any(dep in relinked or dep not in self._cells for dep in cell.deps):
+                self._compile(cell)
+            if not cell.is_function and cell.code is not None:
+                self._evaluate(cell)
+            after = (cell.code if cell.is_function else cell.value, cell.error)
+            if cell.is_function:
+                if after[0] != before[0] or after[1] is not before[1]:
+                    relinked.add(name)
+                    changed.add(name)
+                elif not cell.deps.isdisjoint(changed):
+                    # Callers also change when a variable the body reads changed.
+                    changed.add(name)
+            elif after[0] != before[0] or type(after[0]) is not type(before[0]) or after[1] is not before[1]:
+                changed.add(name)
+        return recomputed
+
+    def _compile(self, cell):
+        cell.error = None
+        try:
+            rename = {param: (Name(f'${i}'), 1) for i, param in enumerate(cell.params or ())}
+            inlined = self._inline(cell.tree, rename, [0])
+            cell.code = inlined if cell.is_function else CompiledExpression(cell.source, inlined)
+        except ExpressionError as e:
+            cell.code = cell.value = None
+            cell.error = e
+
+    def _inline(self, node, rename, size):
+        """`node` with user calls expanded; `rename` maps names to (replacement, its size)."""
+        kind = type(node)
+        replacement = rename.get(node.id) if kind is Name else None
+        size[0] += replacement[1] if replacement is not None else 1
+        if size[0] > MAX_INLINED_NODES:
+            raise ExpressionError(f"Expression too large after inlining functions (over {MAX_INLINED_NODES} nodes)")
+        if replacement is not None:
+            return replacement[0]
+        if kind is Name:
+            return node
+        if kind is Unary:
+            return Unary(node.op, self._inline(node.operand, rename, size))
+        if kind is BinOp:
+            # A chain a + b + ... is walked in a loop; its other BinOps count here.
+            first, steps = left_chain(node)
+            size[0] += len(steps) - 1
+            left = self._inline(first, rename, size)
+            for op, right in steps:
+                left = BinOp(op, left, self._inline(right, rename, size))
+            return left
+        if kind is Call:
+            args = []
+            for arg in node.args:
+                start = size[0]
+                args.append((self._inline(arg, rename, size), size[0] - start))
+            if node.func in FUNCTIONS:
+                return Call(node.func, tuple(arg for arg, _ in args))
+            callee = self._cells.get(node.func)
+            if callee is None or not callee.is_function:
+                raise ExpressionError(f"Unknown function {node.func!r}")
+            if callee.code is None:
+                raise ExpressionError(f"{node.func} has an error: {callee.error}")
+            if len(args) != len(callee.params):
+                raise ExpressionError(f"{node.func}() takes {len(callee.params)} argument(s), got {len(args)}")
+            # Arguments count once per use in the body, not for being built.
+            size[0] -= sum(count for _, count in args)
+            # One pass, so '$i' inside an argument is never substituted again.
+            return self._inline(callee.code, {f'${i}': arg for i, arg in enumerate(args)}, size)
+        return node
+
+    def _evaluate(self, cell):
+        env = {}
+        for name in cell.code.variables:
+            dep = self._cells.get(name)
+            if dep is None or dep.is_function:
+                continue  # evaluate() reports it as an unknown name
+            if dep.error is not None:
+                cell.value, cell.error = None, ExpressionError(f"{name} has an error")
+                return
+            env[name] = dep.value
+        try:
+            with (self.budget or sandbox.DEFAULT_BUDGET).active():
+                cell.value, cell.error = cell.code.evaluate(env), None
+        except (ExpressionError, ArithmeticError, ValueError, TypeError) as e:
+            cell.value, cell.error = None, e
+
+    # --- Reading ---
+
+    def value(self, name):
+        """The memoized value of variable `name`; raises its error if it has one."""
+        cell = self._cells.get(name)
+        if cell is None or cell.is_function:
+            raise ExpressionError(f"Unknown name {name!r}")
+        if cell.error is not None:
+            raise cell.error
+        return cell.value
+
+    def evaluate(self, text):
+        """Evaluates a one-off expression against the current values (nothing is stored)."""
+        cell = _Cell('', None, text, parse(text, any_function=True), frozenset())
+        self._compile(cell)
+        if cell.code is not None:
+            self._evaluate(cell)
+        if cell.error is not None:
+            raise cell.error
+        return cell.value
+
+    def cells(self):
+        """(name, definition, value, error) for every cell, in definition order."""
+        return [(cell.name, cell.definition(), cell.value, cell.error) for cell in self._cells.values()]
+
+    def dependents(self, name):
+        return frozenset(self._dependents.get(name, ()))
+
+    def __contains__(self, name):
+        return name in self._cells
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __repr__(self):
+        return f"Workspace({len(self._cells)} cells)"